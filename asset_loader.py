@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Class that runs asset loads (decoding sounds, building frame caches) on worker threads, so the window keeps drawing
+# while they happen - anything creating OpenGL objects still has to run on the main thread once the load is done
+class AssetLoader:
+    # Worker threads, created when the first load is submitted
+    executor = None
+    # Number of worker threads
+    worker_count = 2
+    # Dictionary whose keys are the names of the loads and the values are their futures (kept once done, so each
+    # asset is only loaded once)
+    loads = {}
+
+    # Class method to start loading an asset in the background, unless it's already loading or loaded
+    @classmethod
+    def submit(cls, name, function, *args, **kwargs):
+        if name not in cls.loads:
+            if cls.executor is None:
+                cls.executor = ThreadPoolExecutor(max_workers=cls.worker_count, thread_name_prefix="asset-loader")
+            cls.loads[name] = cls.executor.submit(function, *args, **kwargs)
+        return cls.loads[name]
+
+    # Class method to check whether an asset finished loading (False if it was never submitted)
+    @classmethod
+    def is_ready(cls, name):
+        load = cls.loads.get(name)
+        return load is not None and load.done()
+
+    # Class method to get a loaded asset, waiting for it if it's still loading (errors raised by the load are raised
+    # here, on the thread using the asset)
+    @classmethod
+    def get(cls, name):
+        return cls.loads[name].result()
+
+    # Class method to get the share of some assets that finished loading (from 0 to 1)
+    @classmethod
+    def get_progress(cls, names):
+        if not names:
+            return 1.0
+        return sum(1 for name in names if cls.is_ready(name)) / len(names)
+
+    # Class method to stop the worker threads once the loads they're running are done
+    @classmethod
+    def shutdown(cls):
+        if cls.executor is not None:
+            cls.executor.shutdown(wait=True, cancel_futures=True)
+            cls.executor = None
@@ -1,43 +1,56 @@
-from pyglet.media import load
+from pyglet.media import StaticSource, load
+from pyglet.media.synthesis import LinearDecayEnvelope, Square, Triangle
+
+from asset_loader import AssetLoader
 
 
 # Class that handles loading the audio from different resources
 class AudioLoad:
     # Variables to store the loaded audio resources
-    menu_bgm = None
     menu_click_sound = None
     menu_select_sound = None
-    # Flag to track whether menu sounds are loaded or not
-    menu_sounds_loaded = False
-
     stage_select_sound = None
-    stage1_bgm = None
-    stage2_bgm = None
-    stage3_bgm = None
-    # Flag to track whether stage sounds are loaded or not
-    stage_sounds_loaded = False
+    # Short tones played when a typed letter hits or misses (synthesized rather than read from a file)
+    hit_sound = None
+    miss_sound = None
+    # Flag to track whether the sound effects are loaded or not
+    sounds_loaded = False
+
+    # Paths of the background music tracks (streamed by the music player while they play, never loaded whole)
+    music_paths = {"menu": 'media/menu_bgm.mp3', "stage1": 'media/stage1_bgm.mp3', "stage2": 'media/stage2_bgm.mp3',
+                   "stage3": 'media/stage3_bgm.mp3'}
 
-    # Class method to load menu sounds (note to self: class methods can be called without instantiating the class)
+    # Class method to start loading the sound effects on a worker thread
+    # (note to self: class methods can be called without instantiating the class)
     @classmethod
-    def load_menu_sounds(cls):
-        # Check if menu sounds are not loaded yet
-        if not cls.menu_sounds_loaded:
-            # Load menu background music and sounds
-            cls.menu_bgm = load('media/menu_bgm.mp3', streaming=False)
-            cls.menu_click_sound = load('media/menu_click.wav', streaming=False)
-            cls.menu_select_sound = load('media/menu_select.wav', streaming=False)
-            cls.stage_select_sound = load('media/stage_select.wav', streaming=False)
-            # Set the flag to True indicating that menu sounds are loaded
-            cls.menu_sounds_loaded = True
-
-    # Class method to load stage sounds
+    def prefetch_sounds(cls):
+        AssetLoader.submit("sounds", cls.read_sounds)
+
+    # Method to load the sound effects, fully decoded so they play without delay (run on a worker thread)
+    @staticmethod
+    def read_sounds():
+        return (load('media/menu_click.wav', streaming=False), load('media/menu_select.wav', streaming=False),
+                load('media/stage_select.wav', streaming=False),
+                StaticSource(Triangle(0.06, 880, sample_rate=44100, envelope=LinearDecayEnvelope(0.4))),
+                StaticSource(Square(0.12, 140, sample_rate=44100, envelope=LinearDecayEnvelope(0.25))))
+
+    # Class method to check whether the sound effects finished loading
+    @classmethod
+    def sounds_ready(cls):
+        return cls.sounds_loaded or AssetLoader.is_ready("sounds")
+
+    # Class method to load the sound effects (waiting for them if they're still loading)
+    @classmethod
+    def load_sounds(cls):
+        # Check if the sound effects are not loaded yet
+        if not cls.sounds_loaded:
+            cls.prefetch_sounds()
+            (cls.menu_click_sound, cls.menu_select_sound, cls.stage_select_sound, cls.hit_sound,
+             cls.miss_sound) = AssetLoader.get("sounds")
+            # Set the flag to True indicating that the sound effects are loaded
+            cls.sounds_loaded = True
+
+    # Class method to open a background music track as a streaming source (decoded bit by bit while it plays)
     @classmethod
-    def load_stage_sounds(cls):
-        # Check if stage sounds are not loaded yet
-        if not cls.stage_sounds_loaded:
-            # Load stage background music
-            cls.stage1_bgm = load('media/stage1_bgm.mp3', streaming=False)
-            cls.stage2_bgm = load('media/stage2_bgm.mp3', streaming=False)
-            cls.stage3_bgm = load('media/stage3_bgm.mp3', streaming=False)
-            # Set the flag to True indicating that stage sounds are loaded
-            cls.stage_sounds_loaded = True
+    def open_music(cls, track):
+        return load(cls.music_paths[track], streaming=True)
@@ -0,0 +1,69 @@
+from pyglet.image import Animation
+from pyglet.sprite import Sprite
+
+from image_load import ImageLoad
+
+
+# Class that keeps one background sprite per stage, scaled to fill the window
+# (the sprites are only built once and rescaled when the window size changes, so drawing a background costs nothing
+# extra from one frame to the next - it's shared by the game and the stage select menu)
+class BackgroundLayer:
+    def __init__(self, batch=None, group=None):
+        # Batch and group the sprites are added to (the game's background layer)
+        self.batch = batch
+        self.group = group
+        # Dictionary whose keys are the stage numbers and the values are their background sprites
+        self.sprites = {}
+        # Dictionary with the window size each stage's sprite was last scaled for
+        self.sizes = {}
+        # Stage whose background is currently shown
+        self.stage = None
+        # Number of sprites built and rescaled so far (useful to check nothing happens per frame)
+        self.build_count = 0
+        self.scale_count = 0
+
+    # Method to show the background of a stage scaled to the given size, returning its sprite
+    def show(self, stage, width, height):
+        sprite = self.sprites.get(stage)
+
+        # Build the stage's sprite the first time it's needed
+        if sprite is None:
+            # Load the stage's image the first time it's shown
+            sprite = Sprite(ImageLoad.load_stage_image(stage), batch=self.batch, group=self.group)
+            self.sprites[stage] = sprite
+            self.build_count += 1
+
+        # Make it fit the window if its size changed since the last time
+        if self.sizes.get(stage) != (width, height):
+            # Animated backgrounds use the size of their biggest frame
+            image = sprite.image
+            if isinstance(image, Animation):
+                image_width, image_height = image.get_max_width(), image.get_max_height()
+            else:
+                image_width, image_height = image.width, image.height
+            sprite.update(scale_x=width / image_width, scale_y=height / image_height)
+            self.sizes[stage] = (width, height)
+            self.scale_count += 1
+
+        # Only the shown stage's sprite stays visible in the batch (and animated, so hidden animations don't keep
+        # scheduling frame changes - sprites of still images can't be paused)
+        if stage != self.stage:
+            if self.stage is not None:
+                self.sprites[self.stage].visible = False
+                if self.is_animated(self.stage):
+                    self.sprites[self.stage].paused = True
+            sprite.visible = True
+            if self.is_animated(stage):
+                sprite.paused = False
+            self.stage = stage
+
+        return sprite
+
+    # Method to check whether the background of a stage is animated (so it changes without any input)
+    def is_animated(self, stage):
+        return ImageLoad.is_stage_animated(stage)
+
+    # Method to draw the current background on its own (for screens that don't draw the game's batch)
+    def draw(self):
+        if self.stage is not None:
+            self.sprites[self.stage].draw()
@@ -0,0 +1,970 @@
+import argparse
+import gc
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Time the benchmark started, for the time to the first frame (taken before pyglet and the game are imported, like a
+# player launching the game would wait for them)
+START_TIME = time.perf_counter()
+
+import numpy
+import pyglet
+
+# The resource module (for the peak resident memory of the process) only exists on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Headless mode has to be chosen before any window module is imported (it renders through EGL, so it also works
+# with a software GL driver on a machine without a GPU)
+if "--headless" in sys.argv:
+    pyglet.options["headless"] = True
+
+from pyglet.gl import glFinish
+from pyglet.media import Player, load
+from pyglet.media.codecs.base import StaticMemorySource
+from pyglet.media.synthesis import Sine
+from pyglet.util import DecodeException
+
+from audio_load import AudioLoad
+from frame_cache import FrameCache
+from game_window import GameWindow
+from highscore_manager import FLUSH_INTERVAL, HighscoreManager
+from image_load import ImageLoad
+from key_stats import KeyStats
+from music import DEFAULT_BUDGET, MusicPlayer
+from particles import ParticlePool
+from render_layers import RenderLayers
+from session_log import SessionLog, SessionReplay
+from sfx import SfxMixer
+from starfield import LAYERS, Starfield
+from telemetry import SessionTelemetry
+from word_corpus import BAND_STEPS, WordCorpus
+from word_manager import WordManager
+
+# Length of the generated tone standing in for a music track that can't be opened, in seconds (a few minutes, like
+# the tracks)
+STAND_IN_SECONDS = 180
+
+
+# Method to set up the same in-game scene for every measurement: a word on screen and a bunch of hit particles
+def build_scene(window, stage, particle_bursts):
+    window.seed_random(stage)
+    window.update_stage(stage)
+    window.start()
+    for i in range(particle_bursts):
+        window.spawn_particles(200 + (i * 37) % 500, 150 + (i * 53) % 300)
+
+
+# Method to time a number of frames drawn with the given rendering path, returning the frame times in milliseconds
+def time_frames(window, batched_rendering, frames, warmup=30):
+    window.batched_rendering = batched_rendering
+    window.switch_to()
+    frame_times = []
+    for i in range(warmup + frames):
+        start_time = time.perf_counter()
+        window.on_draw()
+        # Wait for the GPU to finish so the time covers the whole frame and not only the calls issued
+        glFinish()
+        if i >= warmup:
+            frame_times.append((time.perf_counter() - start_time) * 1000)
+    return frame_times
+
+
+# Method to print a summary line for a list of frame times
+def report(name, frame_times):
+    frame_times = sorted(frame_times)
+    mean = statistics.mean(frame_times)
+    p95 = frame_times[int(len(frame_times) * 0.95) - 1]
+    print(f"  {name:<10} mean {mean:7.3f} ms   p50 {statistics.median(frame_times):7.3f} ms   "
+          f"p95 {p95:7.3f} ms   ({1000 / mean:7.1f} FPS)")
+    return mean
+
+
+# Method to compare the immediate-mode (one draw per object) and batched rendering paths on the same scene, first on
+# crowded scenes (waves of many words and many particle bursts), where the draw calls batching saves add up, and then
+# on every stage
+def compare_render_modes(window, frames, particle_bursts, crowds=((30, 50), (100, 300), (300, 1000))):
+    print("Rendering paths (same scene, frame time including glFinish):")
+    for wave_size, crowd_bursts in crowds:
+        window.wave_size = wave_size
+        window.particles.clear()
+        build_scene(window, 1, crowd_bursts)
+        compare_scene(window, f"Stage 1, {wave_size} words per wave", frames)
+    window.wave_size = 1
+    window.particles.clear()
+    for stage in (1, 2, 3):
+        build_scene(window, stage, particle_bursts)
+        compare_scene(window, f"Stage {stage}", frames)
+
+
+# Method to print the frame times of both rendering paths on the scene set up in the window
+def compare_scene(window, name, frames):
+    print(f" {name}: {window.get_character_count()} characters, {window.dust.count} dust, "
+          f"{window.particles.live_count} particles")
+    immediate = report("immediate", time_frames(window, False, frames))
+    batched = report("batched", time_frames(window, True, frames))
+    print(f"  speedup    {immediate / batched:.2f}x")
+
+
+# Method to check how many HUD text layouts happen per second while the score doesn't change, and after it does
+def measure_hud_layouts(window, seconds=2.0):
+    print("HUD text layouts:")
+    build_scene(window, 1, 0)
+    window.batched_rendering = True
+    window.switch_to()
+    for name in ("unchanged score", "score +1 per frame"):
+        start_count = window.hud.layout_count
+        start_time = time.perf_counter()
+        while time.perf_counter() - start_time < seconds:
+            if name != "unchanged score":
+                window.score += 1
+            window.on_draw()
+        elapsed_time = time.perf_counter() - start_time
+        print(f"  {name:<20} {(window.hud.layout_count - start_count) / elapsed_time:8.1f} layouts/s "
+              f"(last second: {window.hud.layouts_per_second:.1f})")
+
+
+# Method to report how long the animated backgrounds take to load with and without their decoded frames cached
+def measure_background_loading():
+    print("Animated background loading:")
+    paths = [path for stage, path in enumerate(ImageLoad.stage_paths, 1) if ImageLoad.is_stage_animated(stage)]
+    if ImageLoad.frame_cache is not None:
+        for path, (seconds, load_type) in ImageLoad.frame_cache.load_times.items():
+            print(f"  {path:<20} {seconds * 1000:8.1f} ms  (this launch, {load_type})")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for load_type in ("cold", "warm"):
+            # A new cache object starts with empty texture atlases, like a new launch would
+            frame_cache = FrameCache(cache_dir)
+            for path in paths:
+                frame_cache.load_animation(path)
+                seconds = frame_cache.load_times[path][0]
+                print(f"  {path:<20} {seconds * 1000:8.1f} ms  ({load_type} start)")
+
+
+# Method to time the launch of the game: the first frame, the main menu (once the sound effects are loaded) and
+# starting a stage (once its background is loaded), with the resident memory at each point - it has to run
+# in a new process, since the assets are only loaded once per process
+def measure_startup(stage=1):
+    print("Startup (from the benchmark's start):")
+    # (the player's highscores database is left alone, and a music track missing or not decodable here is stood in
+    # for, since the music is streamed and never waited for)
+    window = GameWindow(WordManager(1), 1, visible=False, database=False)
+    window.music.open_track = open_benchmark_music
+    window.on_draw()
+    glFinish()
+    report_startup("first frame", time.perf_counter() - START_TIME)
+    while not window.in_game and window.current_menu == window.loading_screen:
+        window.on_update(1 / 60)
+        window.on_draw()
+        time.sleep(0.001)
+    report_startup("main menu", time.perf_counter() - START_TIME)
+    start_time = time.perf_counter()
+    window.start_stage(stage)
+    while not window.in_game:
+        window.on_update(1 / 60)
+        window.on_draw()
+        time.sleep(0.001)
+    window.on_draw()
+    glFinish()
+    report_startup(f"stage {stage} started", time.perf_counter() - start_time)
+    if resource is not None:
+        print(f"  process peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+    window.close()
+
+
+# Method to print a startup time with the resident memory at that point
+def report_startup(name, seconds):
+    memory = get_resident_memory()
+    memory_text = f"   RSS {memory:7.1f} MiB" if memory is not None else ""
+    print(f"  {name:<20} {seconds * 1000:8.1f} ms{memory_text}")
+
+
+# Method to check the streamed background music stays within its memory budget while going through every track
+# (the audio is pulled in 20 ms pieces at four times the playback speed, the way an audio driver would pull it), and
+# compare it with the memory the tracks take when loaded whole
+def measure_music(budgets=(512 * 1024, DEFAULT_BUDGET, 8 * 1024 * 1024), pieces=100):
+    print("Streaming music (menu -> every stage -> menu):")
+    tracks = ["menu", "stage1", "stage2", "stage3", "menu"]
+    stand_ins = set()
+    for budget in budgets:
+        memory_before = get_resident_memory()
+        music = MusicPlayer(lambda track: open_benchmark_music(track, stand_ins), budget=budget, fade_time=0)
+        peak_buffered = 0
+        underruns = {}
+        for track in tracks:
+            music.play(track)
+            stream = music.current.stream
+            piece_bytes = stream.audio_format.bytes_per_second // 50
+            for i in range(pieces):
+                stream.get_audio_data(piece_bytes)
+                peak_buffered = max(peak_buffered, music.get_buffered_bytes())
+                time.sleep(0.005)
+            underruns[track] = stream.underruns
+        memory_text = ""
+        if memory_before is not None:
+            memory_text = f"   RSS {get_resident_memory() - memory_before:+7.1f} MiB"
+        print(f"  budget {budget / 1024:6.0f} KiB   peak buffered {peak_buffered / 1024:6.0f} KiB   "
+              f"underruns {sum(underruns.values())}{memory_text}")
+        music.delete()
+
+    if stand_ins:
+        print(f"  (generated tones stood in for {', '.join(sorted(stand_ins))}: missing or not decodable here)")
+
+    memory_before = get_resident_memory()
+    sources = [load(path, streaming=False) for track, path in AudioLoad.music_paths.items() if track not in stand_ins]
+    if memory_before is not None:
+        print(f"  {len(sources)} tracks loaded whole             RSS {get_resident_memory() - memory_before:+7.1f} MiB")
+    del sources
+
+
+# Method to open a music track for the benchmarks, or a generated tone standing in for it if its file is missing or
+# can't be decoded here (so the measurements after it still run), adding the track to a set of the ones stood in for
+def open_benchmark_music(track, stand_ins=None):
+    try:
+        return AudioLoad.open_music(track)
+    except (OSError, DecodeException):
+        if stand_ins is not None:
+            stand_ins.add(track)
+        return Sine(STAND_IN_SECONDS, 220, sample_rate=44100)
+
+
+# Class timing how long after a trigger the audio driver first pulls the start of a sound (audio data at timestamp 0,
+# so the sounds still playing don't count), by wrapping the decoded sounds' get_audio_data while it's in a with block:
+# that's as close to the sound being heard as can be seen from here, the driver's own output buffer coming on top
+class FirstPullTimer:
+    def __init__(self):
+        self.trigger_time = 0.0
+        # Time from the last trigger to the first pull of a sound's start (None until the driver pulls it)
+        self.latency = None
+        self.get_audio_data = StaticMemorySource.get_audio_data
+
+    def __enter__(self):
+        timer = self
+
+        def get_audio_data(source, *args, **kwargs):
+            audio_data = timer.get_audio_data(source, *args, **kwargs)
+            if audio_data is not None and audio_data.timestamp == 0 and timer.latency is None:
+                timer.latency = time.perf_counter() - timer.trigger_time
+            return audio_data
+
+        StaticMemorySource.get_audio_data = get_audio_data
+        return self
+
+    def __exit__(self, *exception):
+        StaticMemorySource.get_audio_data = self.get_audio_data
+
+    # Method to note the time of a trigger
+    def start(self):
+        self.latency = None
+        self.trigger_time = time.perf_counter()
+
+
+# Method to time triggering sound effects the way the menus used to (a new player queued and rewound for every key
+# press) and through the mixer's voice pool: the cost of the call triggering the sound, and the time until the audio
+# driver pulls the sound's first buffer (the silent driver used without an audio device never pulls any), with the
+# players each way leaves behind
+def measure_sfx(triggers=2000, interval=0.01):
+    print(f"Sound effects ({triggers} triggers, one every {interval * 1000:.0f} ms):")
+    AudioLoad.load_sounds()
+    sounds = {"click": AudioLoad.menu_click_sound, "select": AudioLoad.menu_select_sound,
+              "hit": AudioLoad.hit_sound, "miss": AudioLoad.miss_sound}
+    names = [random.Random(1).choice(["hit", "hit", "hit", "miss", "click", "select"]) for i in range(triggers)]
+
+    with FirstPullTimer() as timer:
+        players = []
+        memory_before = get_resident_memory()
+        call_times = []
+        pull_latencies = []
+        for name in names:
+            timer.start()
+            player = Player()
+            player.queue(sounds[name])
+            player.seek(0)
+            player.play()
+            call_times.append(time.perf_counter() - timer.trigger_time)
+            players.append(player)
+            time.sleep(interval)
+            pull_latencies.append(timer.latency)
+        report_sfx("new player per sound", call_times, pull_latencies, memory_before,
+                   f"players created {len(players)}")
+        for player in players:
+            player.delete()
+        del players
+
+        mixer = SfxMixer()
+        for name, sound in sounds.items():
+            mixer.add(name, sound)
+        memory_before = get_resident_memory()
+        call_times = []
+        pull_latencies = []
+        for name in names:
+            timer.start()
+            mixer.play(name)
+            call_times.append(time.perf_counter() - timer.trigger_time)
+            time.sleep(interval)
+            pull_latencies.append(timer.latency)
+        stats = mixer.get_stats()
+        report_sfx("mixer voice pool", call_times, pull_latencies, memory_before,
+                   f"voices {stats['voices']}, rewound {stats['hits']}, swapped {stats['swaps']}, "
+                   f"cut off {stats['steals']}")
+        mixer.delete()
+
+
+# Method to print the call times and first pull latencies of a way of triggering sound effects (the latencies of the
+# triggers whose sound was never pulled within the interval are None)
+def report_sfx(name, call_times, pull_latencies, memory_before, details):
+    call_times = sorted(call_times)
+    memory_text = ""
+    if memory_before is not None:
+        memory_text = f"   RSS {get_resident_memory() - memory_before:+6.1f} MiB"
+    print(f"  {name:<22} call median {statistics.median(call_times) * 1e6:7.1f} us   "
+          f"p99 {call_times[int(len(call_times) * 0.99)] * 1e6:7.1f} us   max {call_times[-1] * 1e6:8.1f} us"
+          f"{memory_text}   {details}")
+    pulled = sorted(latency for latency in pull_latencies if latency is not None)
+    if pulled:
+        print(f"  {'':<22} first pull median {statistics.median(pulled) * 1e3:6.2f} ms   "
+              f"p99 {pulled[int(len(pulled) * 0.99)] * 1e3:6.2f} ms   max {pulled[-1] * 1e3:7.2f} ms   "
+              f"({len(pulled)} of {len(pull_latencies)} triggers pulled)")
+    else:
+        print(f"  {'':<22} first pull: the audio driver never pulled a sound (no audio device)")
+
+
+# Method to time the highscore queries on databases with millions of scores: the leaderboard of a stage and saving a
+# score, first with the original layout (no index, rollback journal), then once the game upgraded the same database
+# (covering index, write-ahead log), and the leaderboard kept in memory
+def measure_highscores(sizes=(100000, 1000000, 4000000), queries=200, saves=50):
+    print("Highscores database:")
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as db_dir:
+        for size in sizes:
+            db_file = os.path.join(db_dir, f"highscores{size}.db")
+            connection = sqlite3.connect(db_file)
+            connection.execute('''
+                CREATE TABLE highscores (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    stage INTEGER,
+                    player_name TEXT,
+                    score INTEGER
+                )
+            ''')
+            connection.executemany("INSERT INTO highscores (stage, player_name, score) VALUES (?, ?, ?)",
+                                   ((rng.randint(1, 3), f"player{rng.randrange(1000)}", rng.randrange(500))
+                                    for i in range(size)))
+            connection.commit()
+
+            query_times = []
+            for i in range(queries):
+                start_time = time.perf_counter()
+                connection.execute("SELECT player_name, score FROM highscores WHERE stage = ? "
+                                   "ORDER BY score DESC LIMIT 10", (i % 3 + 1,)).fetchall()
+                query_times.append(time.perf_counter() - start_time)
+            save_times = []
+            for i in range(saves):
+                start_time = time.perf_counter()
+                connection.execute("INSERT INTO highscores (stage, player_name, score) VALUES (?, ?, ?)",
+                                   (i % 3 + 1, "benchmark", i))
+                connection.commit()
+                save_times.append(time.perf_counter() - start_time)
+            connection.close()
+            report_highscores(f"{size} rows, original", query_times, save_times)
+
+            start_time = time.perf_counter()
+            highscore_manager = HighscoreManager(db_file)
+            upgrade_time = time.perf_counter() - start_time
+            query_times = []
+            for i in range(queries):
+                start_time = time.perf_counter()
+                highscore_manager.read_highscores(i % 3 + 1)
+                query_times.append(time.perf_counter() - start_time)
+            print(f"  {f'{size} rows, indexed':<26} leaderboard {statistics.median(query_times) * 1000:9.3f} ms   "
+                  f"(upgrade {upgrade_time * 1000:.0f} ms)")
+
+            query_times = []
+            for i in range(queries):
+                start_time = time.perf_counter()
+                highscore_manager.get_highscores(i % 3 + 1)
+                query_times.append(time.perf_counter() - start_time)
+            save_times = []
+            for i in range(saves):
+                start_time = time.perf_counter()
+                highscore_manager.save_highscore(i % 3 + 1, "benchmark", 400 + i)
+                save_times.append(time.perf_counter() - start_time)
+            highscore_manager.close()
+            report_highscores(f"{size} rows, in memory", query_times, save_times)
+
+
+# Method to time saving scores from the game loop, committing each one there (the way they used to be saved, with
+# the database's normal and full syncs) and queueing them for the writer thread, and to count the scores an abrupt
+# exit loses with the writer thread
+def measure_score_saving(saves=500, interval=0.002, crash_saves=200):
+    print(f"Saving scores ({saves} scores, one every {interval * 1000:.0f} ms, main thread time):")
+    with tempfile.TemporaryDirectory() as db_dir:
+        for synchronous in ("NORMAL", "FULL"):
+            db_file = os.path.join(db_dir, f"commit_{synchronous}.db")
+            HighscoreManager(db_file).close()
+            connection = sqlite3.connect(db_file)
+            connection.execute(f"PRAGMA synchronous={synchronous}")
+            save_times = []
+            for i in range(saves):
+                start_time = time.perf_counter()
+                connection.execute("INSERT INTO highscores (stage, player_name, score) VALUES (?, ?, ?)",
+                                   (i % 3 + 1, "benchmark", i))
+                connection.commit()
+                save_times.append(time.perf_counter() - start_time)
+                time.sleep(interval)
+            connection.close()
+            report_score_saving(f"commit each ({synchronous.lower()} sync)", save_times, f"commits {saves}")
+
+        highscore_manager = HighscoreManager(os.path.join(db_dir, "write_behind.db"))
+        save_times = []
+        for i in range(saves):
+            start_time = time.perf_counter()
+            highscore_manager.save_highscore(i % 3 + 1, "benchmark", i)
+            save_times.append(time.perf_counter() - start_time)
+            time.sleep(interval)
+        start_time = time.perf_counter()
+        highscore_manager.close()
+        writer = highscore_manager.writer
+        report_score_saving("write-behind queue", save_times,
+                            f"commits {writer.commits}, written {writer.written}, dropped {writer.dropped}, "
+                            f"failed {writer.failed}, close {(time.perf_counter() - start_time) * 1000:.1f} ms")
+
+        # Abrupt exit: a process saves scores for a while and is killed without closing the database
+        db_file = os.path.join(db_dir, "crash.db")
+        HighscoreManager(db_file).close()
+        process = multiprocessing.Process(target=save_and_crash, args=(db_file, crash_saves, 0.01))
+        process.start()
+        process.join()
+        connection = sqlite3.connect(db_file)
+        saved = connection.execute("SELECT COUNT(*) FROM highscores").fetchone()[0]
+        connection.close()
+        print(f"  abrupt exit after {crash_saves} scores (one every 10 ms, flush interval "
+              f"{FLUSH_INTERVAL * 1000:.0f} ms): {saved} committed, {crash_saves - saved} lost")
+
+
+# Method run by the process of the abrupt exit benchmark: save scores and exit without closing anything
+def save_and_crash(db_file, saves, interval):
+    highscore_manager = HighscoreManager(db_file)
+    for i in range(saves):
+        highscore_manager.save_highscore(i % 3 + 1, "benchmark", i)
+        time.sleep(interval)
+    os._exit(0)
+
+
+# Method to print the time the game loop spends saving a score
+def report_score_saving(name, save_times, details):
+    save_times = sorted(save_times)
+    print(f"  {name:<26} median {statistics.median(save_times) * 1e6:8.1f} us   "
+          f"max {save_times[-1] * 1e6:9.1f} us   {details}")
+
+
+# Method to print the median times of the leaderboard query and of saving a score
+def report_highscores(name, query_times, save_times, details=""):
+    print(f"  {name:<26} leaderboard {statistics.median(query_times) * 1000:9.3f} ms   "
+          f"save {statistics.median(save_times) * 1000:7.3f} ms{details}")
+
+
+# Method to time recording the keystrokes of a session (kept in memory and saved in batches, against committing each
+# one from the game loop), and the analytics over months of sessions read from the rollups and the letters' totals
+# against the same figures computed from the raw keystrokes
+def measure_telemetry(keystrokes=5000, sessions=3000, session_keystrokes=200, days=180, queries=20):
+    print(f"Keystroke telemetry ({keystrokes} keystrokes, main thread time per keystroke):")
+    rng = random.Random(1)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    with tempfile.TemporaryDirectory() as db_dir:
+        db_file = os.path.join(db_dir, "commit_each.db")
+        HighscoreManager(db_file).close()
+        connection = sqlite3.connect(db_file)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        record_times = []
+        for i in range(keystrokes):
+            start_time = time.perf_counter()
+            connection.execute("INSERT INTO keystrokes (session_id, number, stage, word, expected, typed, latency) "
+                               "VALUES (?, ?, ?, ?, ?, ?, ?)", (1, i, 1, "BENCHMARK", "B", "B", 180.0))
+            connection.commit()
+            record_times.append(time.perf_counter() - start_time)
+        connection.close()
+        report_score_saving("commit each", record_times, f"commits {keystrokes}")
+
+        highscore_manager = HighscoreManager(os.path.join(db_dir, "batched.db"))
+        telemetry = SessionTelemetry(highscore_manager, 1, "benchmark")
+        record_times = []
+        timestamp = 0.0
+        for i in range(keystrokes):
+            letter = rng.choice(letters)
+            timestamp += 0.18
+            start_time = time.perf_counter()
+            telemetry.record(letter, letter, "BENCHMARK", True, timestamp)
+            record_times.append(time.perf_counter() - start_time)
+        start_time = time.perf_counter()
+        telemetry.finish(keystrokes // 8)
+        finish_time = time.perf_counter() - start_time
+        highscore_manager.close()
+        writer = highscore_manager.writer
+        report_score_saving("batched", record_times,
+                            f"commits {writer.commits}, written {writer.written}, dropped {writer.dropped}, "
+                            f"rollup {finish_time * 1000:.2f} ms")
+
+        # Months of kiosk sessions saved through the telemetry path, spread evenly over the days
+        db_file = os.path.join(db_dir, "months.db")
+        highscore_manager = HighscoreManager(db_file)
+        start_time = time.perf_counter()
+        first_day = time.time() - days * 86400
+        for session in range(sessions):
+            telemetry = SessionTelemetry(highscore_manager, session % 3 + 1, "benchmark")
+            telemetry.started = first_day + session * days * 86400 / sessions
+            timestamp = 0.0
+            for i in range(session_keystrokes):
+                letter = rng.choice(letters)
+                timestamp += max(0.05, rng.gauss(0.2, 0.05))
+                correct = rng.random() > 0.05
+                telemetry.record(letter, letter if correct else "Q", "BENCHMARK", correct, timestamp)
+            telemetry.finish(session_keystrokes // 8)
+            # (the writer thread is given time to keep up, so no batch is dropped)
+            if session % 100 == 99:
+                highscore_manager.writer.flush()
+        highscore_manager.writer.flush()
+        build_time = time.perf_counter() - start_time
+        rows = sessions * session_keystrokes
+        print(f"  {days} days, {sessions} sessions, {rows} keystrokes saved in {build_time:.1f} s "
+              f"({rows / build_time:.0f} keystrokes/s, {highscore_manager.writer.commits} commits)")
+
+        last_month = time.time() - 30 * 86400
+        raw_times = []
+        for i in range(queries):
+            start_time = time.perf_counter()
+            highscore_manager.connection.execute('''
+                SELECT COUNT(DISTINCT session_id), COUNT(*), AVG(expected = typed)
+                FROM keystrokes
+                WHERE stage = ? AND session_id IN (SELECT id FROM sessions WHERE started >= ?)
+            ''', (i % 3 + 1, last_month)).fetchall()
+            raw_times.append(time.perf_counter() - start_time)
+        rollup_times = []
+        for i in range(queries):
+            start_time = time.perf_counter()
+            highscore_manager.get_session_summary(i % 3 + 1, since=last_month)
+            rollup_times.append(time.perf_counter() - start_time)
+        print(f"  last month of a stage      raw keystrokes {statistics.median(raw_times) * 1000:9.3f} ms   "
+              f"rollups {statistics.median(rollup_times) * 1000:7.3f} ms")
+
+        raw_times = []
+        for i in range(queries):
+            start_time = time.perf_counter()
+            highscore_manager.connection.execute('''
+                SELECT expected, COUNT(*), AVG(expected != typed), AVG(latency)
+                FROM keystrokes
+                WHERE stage = ?
+                GROUP BY expected
+            ''', (i % 3 + 1,)).fetchall()
+            raw_times.append(time.perf_counter() - start_time)
+        totals_times = []
+        for i in range(queries):
+            start_time = time.perf_counter()
+            highscore_manager.get_letter_totals(i % 3 + 1)
+            totals_times.append(time.perf_counter() - start_time)
+        print(f"  letters of a stage         raw keystrokes {statistics.median(raw_times) * 1000:9.3f} ms   "
+              f"totals  {statistics.median(totals_times) * 1000:7.3f} ms")
+        highscore_manager.close()
+
+
+# Method to get the resident memory of the process right now, in MiB (only on Linux, None elsewhere)
+def get_resident_memory():
+    try:
+        with open("/proc/self/statm") as statm_file:
+            return int(statm_file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+# Method to time compiling (first launch) and opening (later launches) word corpora of growing sizes, and picking
+# words from them
+def measure_corpus(sizes=(10000, 100000, 1000000), picks=10000):
+    print("Word corpus (compiled index, memory-mapped):")
+    rng = random.Random(1)
+    letters = "ETAOINSHRDLCUMWFGYPBVKJXQZ"
+    weights = [13, 9, 8, 8, 7, 7, 6, 6, 6, 4, 4, 3, 3, 2, 2, 2, 2, 2, 2, 1, 1, 1, 1, 1, 1, 1]
+    # Typing statistics of a player slow and error-prone on K, J and X, for timing the weak key selection
+    key_stats = KeyStats()
+    for i in range(5000):
+        letter = rng.choice(letters)
+        weak = letter in "KJX"
+        if weak and rng.random() < 0.2:
+            key_stats.record_miss(letter, "E")
+        else:
+            key_stats.record_hit(letter, "E", rng.gauss(0.35 if weak else 0.18, 0.03))
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        for size in sizes:
+            source_path = os.path.join(corpus_dir, f"words{size}.txt")
+            with open(source_path, "w") as source_file:
+                for i in range(size):
+                    source_file.write("".join(rng.choices(letters, weights, k=rng.randint(3, 14))) + "\n")
+            # Compile with a single process too when there are more cores, to see what scoring in parallel saves
+            process_counts = sorted({1, os.cpu_count() or 1})
+            for processes in process_counts:
+                cache_dir = os.path.join(corpus_dir, f"cache{processes}")
+                for load_type in ("cold", "warm"):
+                    memory_before = get_resident_memory()
+                    corpus = WordCorpus(source_path, cache_dir=cache_dir, rng=random.Random(1), processes=processes)
+                    memory_after = get_resident_memory()
+                    start_time = time.perf_counter()
+                    for i in range(picks):
+                        corpus.pick(i % 3 + 1)
+                    pick_time = (time.perf_counter() - start_time) / picks * 1000000
+                    start_time = time.perf_counter()
+                    for i in range(picks):
+                        corpus.pick_band(*corpus.get_band(i % 3 + 1, i % BAND_STEPS))
+                    band_time = (time.perf_counter() - start_time) / picks * 1000000
+                    memory_text = ""
+                    if memory_before is not None:
+                        memory_text = f"   RSS {memory_after - memory_before:+7.1f} MiB"
+                    print(f"  {size:>8} words  {corpus.load_type:<4} open {corpus.load_time * 1000:9.1f} ms "
+                          f"({processes} processes)   pick {pick_time:5.2f} us   band pick {band_time:5.2f} us"
+                          f"{memory_text}")
+                    corpus.close()
+
+            # Time picking words weighted towards the weak keys, and check how many more of them have weak keys
+            corpus = WordCorpus(source_path, cache_dir=os.path.join(corpus_dir, "cache1"), rng=random.Random(1))
+            weak_words = {}
+            for name, stats in (("uniform", None), ("weak keys", key_stats)):
+                word_manager = WordManager(2, corpus=corpus, key_stats=stats)
+                start_time = time.perf_counter()
+                words = [word_manager.grab_new_word() for _ in range(picks)]
+                weak_words[name] = (sum(1 for word in words if any(letter in word for letter in "KJX")) / picks,
+                                    (time.perf_counter() - start_time) / picks * 1000000)
+            print(f"  {size:>8} words  grab_new_word {weak_words['weak keys'][1]:6.2f} us   words with weak keys "
+                  f"{weak_words['weak keys'][0] * 100:4.1f}% (uniform {weak_words['uniform'][0] * 100:4.1f}%, "
+                  f"{weak_words['uniform'][1]:5.2f} us)")
+            corpus.close()
+
+
+# Method to check the particle pool keeps up with thousands of live particles, timing the simulation (spawning
+# into the freed slots and updating) apart from the draw, which is bound by fill rate on software GL
+def measure_particle_pool(window, counts=(1000, 5000, 10000, 20000), frames=300):
+    print("Particle pool (pool refilled every frame):")
+    window.switch_to()
+    for count in counts:
+        render_layers = RenderLayers()
+        pool = ParticlePool(capacity=count, batch=render_layers.batch, group=render_layers.particles,
+                            rng=numpy.random.default_rng(count))
+        update_times = []
+        frame_times = []
+        for i in range(frames):
+            start_time = time.perf_counter()
+            # Keep the pool full by spawning bursts into every free slot
+            while pool.free_count:
+                pool.spawn(100 + (pool.free_count * 7) % 600, 100 + (pool.free_count * 13) % 400)
+            pool.update(1 / 60)
+            pool.interpolate(1.0)
+            update_time = time.perf_counter()
+            window.clear()
+            render_layers.draw()
+            glFinish()
+            update_times.append((update_time - start_time) * 1000)
+            frame_times.append((time.perf_counter() - start_time) * 1000)
+        pool.delete()
+        print(f" {count} live particles:")
+        report("update", update_times)
+        report("frame", frame_times)
+
+
+# Method to check the frame cost of the background dust as the number of dust shapes grows, next to the cost of the
+# original 20 dust shapes alone (the nearest layer)
+def measure_starfield(window, multipliers=(0.1, 1, 4, 10), frames=200):
+    print("Starfield (update + batched draw):")
+    window.switch_to()
+    for stage in (1, 3):
+        for multiplier in (None, *multipliers):
+            render_layers = RenderLayers()
+            if multiplier is None:
+                layers = LAYERS[-1:]
+            else:
+                layers = [(max(1, int(count * multiplier)), speed, size, opacity)
+                          for count, speed, size, opacity in LAYERS]
+            starfield = Starfield(window.width, window.height, batch=render_layers.batch, group=render_layers.dust,
+                                  layers=layers, rng=numpy.random.default_rng(stage))
+            starfield.set_stage(stage)
+            frame_times = []
+            for i in range(frames):
+                start_time = time.perf_counter()
+                starfield.update(1 / 60)
+                starfield.interpolate(1.0)
+                window.clear()
+                render_layers.draw()
+                glFinish()
+                frame_times.append((time.perf_counter() - start_time) * 1000)
+            report(f"stage {stage} {starfield.count:>5}" if multiplier is not None else f"stage {stage} near",
+                   frame_times)
+
+
+# Method to time how long starting a round takes (getting the new word's character sprites on screen)
+def measure_word_spawn(window, rounds=500):
+    print("Word spawn (GameWindow.start):")
+    build_scene(window, 3, 0)
+    spawn_times = []
+    for i in range(rounds):
+        start_time = time.perf_counter()
+        window.start()
+        spawn_times.append((time.perf_counter() - start_time) * 1000)
+    report("stage 3", spawn_times)
+
+
+# Method to play many rounds and check how many objects get reused instead of allocated, and how much memory grows
+def measure_pools(window, rounds=500):
+    print("Object pools over {} rounds:".format(rounds))
+    build_scene(window, 3, 0)
+    window.reset_game(True)
+    tracemalloc.start()
+    start_memory = tracemalloc.get_traced_memory()[0]
+    for i in range(rounds):
+        # Type the whole word (without ever losing), then let a retry reset everything every 100 rounds
+        score = window.score
+        while window.score == score:
+            window.on_text(window.game.get_expected_key())
+            window.on_update(1 / 60)
+            window.health = window.max_health
+        if i % 100 == 99:
+            window.reset_game(True)
+    memory_growth = tracemalloc.get_traced_memory()[0] - start_memory
+    tracemalloc.stop()
+    for name, stats in window.get_pool_stats().items():
+        print(f"  {name:<11} hits {stats['hits']:>7}   misses {stats['misses']:>5}   live {stats['live']:>5}   "
+              f"free {stats['free']:>5}")
+    print(f"  memory growth {memory_growth / 1024:.1f} KiB ({memory_growth / rounds:.0f} bytes per round)")
+
+
+# Method to check the cost of a keystroke and of an update stays flat as the number of words falling at once grows
+def measure_waves(window, wave_sizes=(1, 10, 100, 500), keystrokes=2000):
+    print("Word waves (time per keystroke and per update):")
+    build_scene(window, 1, 0)
+    for wave_size in wave_sizes:
+        window.seed_random(wave_size)
+        window.wave_size = wave_size
+        window.health = window.max_health
+        window.start()
+        key_times = []
+        update_times = []
+        for i in range(keystrokes):
+            # Every tenth keystroke is wrong (a letter no word on screen is expecting is hard to find, so use a digit)
+            window.on_text("1" if i % 10 == 9 else window.game.get_expected_key())
+            start_time = time.perf_counter()
+            window.process_input()
+            update_time = time.perf_counter()
+            window.on_update(1 / 600)
+            key_times.append((update_time - start_time) * 1000000)
+            update_times.append((time.perf_counter() - update_time) * 1000000)
+            window.health = window.max_health
+        print(f" {wave_size} words per wave ({window.get_character_count()} characters on screen at the end):")
+        print(f"  keystroke  mean {statistics.mean(key_times):7.1f} us   p50 {statistics.median(key_times):7.1f} us")
+        print(f"  update     mean {statistics.mean(update_times):7.1f} us   "
+              f"p50 {statistics.median(update_times):7.1f} us")
+    window.wave_size = 1
+    window.start()
+
+
+# Method to compare the cost per character of processing typed characters one update at a time and in bursts
+def measure_input_bursts(window, burst_sizes=(1, 5, 20), characters=2000):
+    print("Typed character bursts (time per character):")
+    build_scene(window, 1, 0)
+    window.wave_size = 50
+    for burst_size in burst_sizes:
+        window.seed_random(burst_size)
+        window.health = window.max_health
+        window.start()
+        character_times = []
+        for i in range(characters // burst_size):
+            # The whole burst types the target word's next letters (a correct burst of the same letter is unlikely)
+            for j in range(burst_size):
+                window.input_queue.push(window.game.get_expected_key() if j == 0 else "1")
+            start_time = time.perf_counter()
+            window.process_input()
+            character_times.append((time.perf_counter() - start_time) * 1000000 / burst_size)
+        print(f"  burst of {burst_size:>2}  mean {statistics.mean(character_times):7.1f} us   "
+              f"p50 {statistics.median(character_times):7.1f} us")
+    stats = window.input_queue.get_stats()
+    print(f"  {stats['processed']} characters processed, {stats['dropped']} dropped")
+    window.wave_size = 1
+    window.start()
+
+
+# Class that types like a player: one keystroke every 60 / (5 * WPM) seconds (a word being five characters), pressing
+# a wrong letter instead of the expected one with the given probability
+class KeystrokeScript:
+    def __init__(self, wpm, error_rate, seed):
+        self.key_interval = 60 / (wpm * 5)
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        # Time of the next keystroke, in seconds of game time
+        self.next_key_time = self.key_interval
+
+    # Method to get the characters typed up to the given game time, typing the expected character of a word
+    def get_keys(self, game_time, expected_character):
+        keys = []
+        while self.next_key_time <= game_time:
+            character = expected_character
+            if self.rng.random() < self.error_rate:
+                character = self.rng.choice([letter for letter in "ABCDEFGHIJKLMNOPQRSTUVWXYZ" if letter != character])
+            keys.append(character)
+            self.next_key_time += self.key_interval
+        return keys
+
+
+# Method to play a stage with scripted keystrokes, stepping the game with a fixed elapsed time and timing the update
+# (keystrokes included) apart from the draw
+def play_stage(window, stage, seconds, wpm, error_rate, seed, dt, draw=True):
+    # Start a session with a fixed seed, so each run plays exactly the same words and effects
+    window.update_stage(stage)
+    window.score = 0
+    window.health = window.max_health
+    window.clear_particles()
+    window.begin_session(seed + stage)
+    window.switch_to()
+
+    script = KeystrokeScript(wpm, error_rate, seed + stage)
+    update_times = []
+    draw_times = []
+    game_overs = 0
+    keystrokes = 0
+    for step in range(int(seconds / dt)):
+        start_time = time.perf_counter()
+        for character in script.get_keys((step + 1) * dt, window.game.get_expected_key()):
+            window.on_text(character)
+            keystrokes += 1
+        window.on_update(dt)
+        # Keep playing after a game over (without resetting, which would save a highscore)
+        if window.is_game_over():
+            window.health = window.max_health
+            game_overs += 1
+        update_time = time.perf_counter()
+        update_times.append((update_time - start_time) * 1000)
+        if draw:
+            window.on_draw()
+            glFinish()
+            draw_times.append((time.perf_counter() - update_time) * 1000)
+    return update_times, draw_times, {"score": window.score, "game_overs": game_overs, "keystrokes": keystrokes}
+
+
+# Method to benchmark whole game sessions driven by scripted keystrokes, reporting for each stage the update and
+# draw throughput, and (on a second, identical run traced by tracemalloc) the allocations and peak memory
+def measure_gameplay(window, seconds, wpm, error_rate, seed, dt):
+    print(f"Gameplay ({seconds:g} s of game time per stage, {wpm} WPM, {error_rate:.0%} errors, seed {seed}, "
+          f"dt {dt * 1000:.2f} ms):")
+    for stage in (1, 2, 3):
+        update_times, draw_times, result = play_stage(window, stage, seconds, wpm, error_rate, seed, dt)
+        print(f" Stage {stage}: score {result['score']}, {result['game_overs']} game overs, "
+              f"{result['keystrokes']} keystrokes")
+        print(f"  throughput update {1000 * len(update_times) / sum(update_times):9.1f}/s   "
+              f"draw {1000 * len(draw_times) / sum(draw_times):7.1f}/s")
+        report("update", update_times)
+        report("draw", draw_times)
+
+        # Same session again without drawing, counting the allocations it leaves behind and the collections it causes
+        gc.collect()
+        collections = sum(generation["collections"] for generation in gc.get_stats())
+        tracemalloc.start()
+        start_snapshot = tracemalloc.take_snapshot()
+        play_stage(window, stage, seconds, wpm, error_rate, seed, dt, draw=False)
+        end_snapshot = tracemalloc.take_snapshot()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        collections = sum(generation["collections"] for generation in gc.get_stats()) - collections
+        new_blocks = sum(stat.count_diff for stat in end_snapshot.compare_to(start_snapshot, "lineno"))
+        print(f"  allocations {new_blocks:+d} live blocks   {collections} gc collections   "
+              f"peak traced {peak_memory / 1024:.1f} KiB")
+    if resource is not None:
+        print(f"  process peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+
+
+# Method to time a recorded session played again as a workload (the player's own keystrokes and pauses instead of a
+# script), reporting the update and draw times and whether it ended the way it was recorded
+def measure_replay(path, words=None, draw=True):
+    log = SessionLog(path)
+    corpus = WordCorpus(words) if words else None
+    key_stats = None
+    if log.key_stats is not None:
+        key_stats = KeyStats()
+        key_stats.set_data(log.key_stats)
+    window = GameWindow(WordManager(log.stage, corpus=corpus, key_stats=key_stats), log.stage, visible=False,
+                        audio=False, database=False)
+    replay = SessionReplay(window, log)
+    replay.start()
+    window.switch_to()
+
+    update_times = []
+    draw_times = []
+    start_time = time.perf_counter()
+    while True:
+        update_start = time.perf_counter()
+        if not replay.step():
+            break
+        update_time = time.perf_counter()
+        update_times.append((update_time - update_start) * 1000)
+        if draw:
+            window.on_draw()
+            glFinish()
+            draw_times.append((time.perf_counter() - update_time) * 1000)
+    elapsed_time = time.perf_counter() - start_time
+
+    game_time = window.session_steps * log.step_time
+    print(f"Replay of {os.path.basename(path)} (stage {log.stage}, {len(log.events)} events, {game_time:.1f} s of game "
+          f"time in {elapsed_time:.2f} s, {game_time / elapsed_time if elapsed_time else 0:.1f}x real time):")
+    report("update", update_times)
+    if draw:
+        report("draw", draw_times)
+    print(f"  score {window.score}, health {window.health}, matches the recording: {replay.matches()}")
+    window.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Space Words performance benchmarks")
+    parser.add_argument("--headless", action="store_true", help="render offscreen without a display")
+    parser.add_argument("--frames", type=int, default=600, help="frames measured per rendering path")
+    parser.add_argument("--particles", type=int, default=50, help="particle bursts present in the scene")
+    parser.add_argument("--gameplay", action="store_true", help="only run the scripted gameplay benchmark")
+    parser.add_argument("--seconds", type=float, default=60, help="game time played per stage in the gameplay run")
+    parser.add_argument("--wpm", type=int, default=60, help="typing speed of the scripted player")
+    parser.add_argument("--error-rate", type=float, default=0.05, help="share of wrong keystrokes")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random number generators")
+    parser.add_argument("--dt", type=float, default=1 / 60, help="fixed elapsed time of every update, in seconds")
+    parser.add_argument("--startup", action="store_true", help="only time the launch of the game")
+    parser.add_argument("--replay", help="only time the replay of a session recorded by the game")
+    parser.add_argument("--words", help="word file the replayed session was played with")
+    parser.add_argument("--no-draw", action="store_true", help="don't draw the replayed session")
+    args = parser.parse_args()
+
+    if args.startup:
+        measure_startup()
+        sys.exit()
+    if args.replay:
+        measure_replay(args.replay, args.words, draw=not args.no_draw)
+        sys.exit()
+
+    benchmark_window = GameWindow(WordManager(1), 1, visible=False, audio=False, database=False)
+    if args.gameplay:
+        measure_gameplay(benchmark_window, args.seconds, args.wpm, args.error_rate, args.seed, args.dt)
+        benchmark_window.close()
+        sys.exit()
+    compare_render_modes(benchmark_window, args.frames, args.particles)
+    measure_hud_layouts(benchmark_window)
+    measure_word_spawn(benchmark_window)
+    measure_waves(benchmark_window)
+    measure_input_bursts(benchmark_window)
+    measure_pools(benchmark_window)
+    measure_particle_pool(benchmark_window)
+    measure_starfield(benchmark_window)
+    measure_background_loading()
+    measure_music()
+    measure_sfx()
+    measure_highscores()
+    measure_score_saving()
+    measure_telemetry()
+    measure_corpus()
+    benchmark_window.close()
@@ -0,0 +1,130 @@
+import hashlib
+import mmap
+import os
+import struct
+import time
+
+from PIL import Image
+from pyglet import resource
+from pyglet.image import Animation, AnimationFrame, ImageData
+from pyglet.image.atlas import AllocatorException, TextureBin
+
+# Folder where the decoded frames are kept between launches
+CACHE_DIR = os.path.join(".cache", "frames")
+# Header of a cache file: magic bytes, format version, frame width, frame height and number of frames
+# (followed by one float32 duration per frame and then the raw RGBA frames, bottom row first)
+HEADER = struct.Struct("<4sIIII")
+MAGIC = b"SWFC"
+VERSION = 1
+
+
+# Class that decodes animated GIFs once, stores their frames as raw RGBA in a cache file keyed by the source file's
+# hash, and loads them back into a texture atlas by memory-mapping that file on later launches
+class FrameCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_width=800, max_height=600):
+        # Folder for the cache files
+        self.cache_dir = cache_dir
+        # Frames bigger than this are scaled down when decoded (backgrounds are stretched to the window anyway)
+        self.max_width = max_width
+        self.max_height = max_height
+        # Texture atlases shared by the frames of every cached animation
+        self.texture_bin = TextureBin()
+        # Dictionary whose keys are the source paths and the values are the load time and "cold" or "warm"
+        self.load_times = {}
+
+    # Method to get the cache file path for a source file (changes whenever the file's contents change)
+    def get_cache_path(self, path):
+        file_hash = hashlib.sha1()
+        with resource.file(path, "rb") as source_file:
+            for chunk in iter(lambda: source_file.read(1 << 20), b""):
+                file_hash.update(chunk)
+        name = os.path.splitext(os.path.basename(path))[0]
+        return os.path.join(self.cache_dir,
+                            f"{name}-{file_hash.hexdigest()[:16]}-{self.max_width}x{self.max_height}.rgba")
+
+    # Method to load an animated image, decoding it only if there's no cache file for it yet
+    def load_animation(self, path):
+        start_time = time.perf_counter()
+        cache_path = self.get_cache_path(path)
+        load_type = "warm"
+        try:
+            animation = self.read_cache_file(cache_path)
+        except (OSError, ValueError, struct.error):
+            # No usable cache file yet (or a damaged one), so decode the source and cache it
+            load_type = "cold"
+            self.build_cache_file(path, cache_path)
+            animation = self.read_cache_file(cache_path)
+        self.load_times[path] = (time.perf_counter() - start_time, load_type)
+        return animation
+
+    # Method to make sure an animated image has a cache file, decoding it if there's none yet (this doesn't touch
+    # OpenGL, so it can run on a worker thread before load_animation is called on the main thread)
+    def prepare(self, path):
+        cache_path = self.get_cache_path(path)
+        try:
+            with open(cache_path, "rb") as cache_file:
+                magic, version, width, height, frame_count = HEADER.unpack(cache_file.read(HEADER.size))
+                cache_file.seek(0, os.SEEK_END)
+                if (magic != MAGIC or version != VERSION
+                        or cache_file.tell() != HEADER.size + frame_count * (4 + width * height * 4)):
+                    raise ValueError(f"Invalid frame cache file: {cache_path}")
+        except (OSError, ValueError, struct.error):
+            self.build_cache_file(path, cache_path)
+        return cache_path
+
+    # Method to decode every frame of a GIF and write them to a cache file
+    def build_cache_file(self, path, cache_path):
+        with resource.file(path, "rb") as source_file:
+            source_image = Image.open(source_file)
+            width = min(source_image.width, self.max_width)
+            height = min(source_image.height, self.max_height)
+            frame_count = getattr(source_image, "n_frames", 1)
+
+            durations = []
+            frames = []
+            for i in range(frame_count):
+                source_image.seek(i)
+                # GIFs store durations in milliseconds (a missing duration means the usual 100 ms)
+                durations.append((source_image.info.get("duration") or 100) / 1000)
+                frame = source_image.convert("RGBA")
+                if frame.size != (width, height):
+                    frame = frame.resize((width, height), Image.BILINEAR)
+                # OpenGL textures start with the bottom row
+                frames.append(frame.transpose(Image.FLIP_TOP_BOTTOM).tobytes())
+
+        # Write to a temporary file first so an interrupted write never leaves a broken cache file behind
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temporary_path = cache_path + ".tmp"
+        with open(temporary_path, "wb") as cache_file:
+            cache_file.write(HEADER.pack(MAGIC, VERSION, width, height, frame_count))
+            cache_file.write(struct.pack(f"<{frame_count}f", *durations))
+            for frame in frames:
+                cache_file.write(frame)
+        os.replace(temporary_path, cache_path)
+
+    # Method to memory-map a cache file and upload its frames into the texture atlas
+    def read_cache_file(self, cache_path):
+        with open(cache_path, "rb") as cache_file, \
+                mmap.mmap(cache_file.fileno(), 0, access=mmap.ACCESS_READ) as cache_map:
+            magic, version, width, height, frame_count = HEADER.unpack_from(cache_map, 0)
+            frame_size = width * height * 4
+            offset = HEADER.size + frame_count * 4
+            if magic != MAGIC or version != VERSION or len(cache_map) != offset + frame_count * frame_size:
+                raise ValueError(f"Invalid frame cache file: {cache_path}")
+            durations = struct.unpack_from(f"<{frame_count}f", cache_map, HEADER.size)
+
+            frames = []
+            for duration in durations:
+                image_data = ImageData(width, height, "RGBA", cache_map[offset:offset + frame_size])
+                frames.append(AnimationFrame(self.add_to_atlas(image_data), duration))
+                offset += frame_size
+
+        return Animation(frames)
+
+    # Method to add a frame to the texture atlas (frames too big for an atlas page get their own texture)
+    def add_to_atlas(self, image_data):
+        try:
+            # The border keeps neighbouring frames from bleeding in when the frame is stretched
+            return self.texture_bin.add(image_data, border=1)
+        except AllocatorException:
+            return image_data.get_texture()
@@ -0,0 +1,137 @@
+import csv
+import os
+import time
+
+import numpy as np
+from pyglet.text import Label
+
+# Phases of a frame, in the order they run: the game update (typed input, word movement, particle update, dust update
+# and shake) followed by the draw (background, dust, limit line, words, particles and HUD)
+UPDATE_PHASES = ["update_input", "update_words", "update_particles", "update_dust", "update_shake"]
+DRAW_PHASES = ["draw_background", "draw_dust", "draw_limit_line", "draw_words", "draw_particles", "draw_hud"]
+PHASES = UPDATE_PHASES + DRAW_PHASES
+
+# Environment variable holding the path of a CSV file to dump the timings to (setting it also turns profiling on)
+CSV_ENVIRONMENT_VARIABLE = "SPACEWORDS_PROFILE_CSV"
+
+
+# Class that times the phases of every frame into a fixed-size ring buffer, and shows their percentiles on an overlay
+# (while it's off, marking a phase is a single attribute check, so it can stay wired into the game loop)
+class FrameProfiler:
+    def __init__(self, window, capacity=600, batch=None, group=None, csv_path=None):
+        # Reference to the main window
+        self.window = window
+        # Number of frames kept in the ring buffer
+        self.capacity = capacity
+        # CSV file the timings are dumped to (the environment variable is used when none is given)
+        self.csv_path = csv_path if csv_path is not None else os.environ.get(CSV_ENVIRONMENT_VARIABLE)
+        # Profiling is off unless a CSV dump was asked for (the overlay hotkey turns it on as well)
+        self.enabled = bool(self.csv_path)
+
+        # Ring buffer with one row per frame: the milliseconds spent in each phase, and the whole frame time
+        # (from the end of the previous frame to the end of this one)
+        self.phase_times = np.zeros((capacity, len(PHASES)), dtype=np.float64)
+        self.frame_times = np.zeros(capacity, dtype=np.float64)
+        self.phase_columns = {phase: column for column, phase in enumerate(PHASES)}
+        # Next row to write, number of frames recorded so far, and number of them already written to the CSV file
+        self.next_row = 0
+        self.frame_count = 0
+        self.dumped_count = 0
+
+        # Time the current phase started at, and the time the previous frame ended at
+        self.phase_start = 0.0
+        self.frame_start = None
+
+        # Overlay showing the percentiles (its text is only laid out again twice per second)
+        self.overlay_visible = False
+        self.overlay_interval = 0.5
+        self.overlay_refresh_time = 0.0
+        self.overlay_label = Label("", font_name="Courier New", font_size=10, x=10, y=window.height - 60,
+                                   width=300, multiline=True, anchor_y="top", color=(120, 255, 120, 255),
+                                   batch=batch, group=group)
+        self.overlay_label.visible = False
+
+    # Method to show or hide the overlay (profiling stays on while it's shown)
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        self.overlay_label.visible = self.overlay_visible
+        if self.overlay_visible:
+            self.enabled = True
+            self.overlay_refresh_time = 0.0
+        elif not self.csv_path:
+            self.enabled = False
+            self.frame_start = None
+
+    # Method to start timing the first phase of an update or a draw
+    def begin(self):
+        if self.enabled:
+            self.phase_start = time.perf_counter()
+
+    # Method to add the time since the previous mark (or the begin) to a phase of the current frame
+    def mark(self, phase):
+        if self.enabled:
+            now = time.perf_counter()
+            self.phase_times[self.next_row, self.phase_columns[phase]] += (now - self.phase_start) * 1000
+            self.phase_start = now
+
+    # Method to close the current frame's row, moving on to the next one in the ring buffer
+    def end_frame(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.frame_start is not None:
+            self.frame_times[self.next_row] = (now - self.frame_start) * 1000
+            self.next_row = (self.next_row + 1) % self.capacity
+            self.frame_count += 1
+            # Dump the whole buffer before its oldest rows get overwritten
+            if self.csv_path and self.frame_count - self.dumped_count == self.capacity:
+                self.dump_csv()
+        self.phase_times[self.next_row] = 0
+        self.frame_start = now
+
+        if self.overlay_visible and now - self.overlay_refresh_time >= self.overlay_interval:
+            self.overlay_label.text = self.get_overlay_text()
+            self.overlay_refresh_time = now
+
+    # Method to get the rows of the ring buffer holding recorded frames, from the oldest to the newest
+    def get_rows(self):
+        count = min(self.frame_count, self.capacity)
+        rows = [(self.next_row - count + i) % self.capacity for i in range(count)]
+        return self.frame_times[rows], self.phase_times[rows]
+
+    # Method to get the 50th, 95th and 99th percentiles of the frame time and of each phase
+    def get_percentiles(self):
+        frame_times, phase_times = self.get_rows()
+        if len(frame_times) == 0:
+            return None
+        percentiles = {"frame": np.percentile(frame_times, (50, 95, 99))}
+        for phase, column in self.phase_columns.items():
+            percentiles[phase] = np.percentile(phase_times[:, column], (50, 95, 99))
+        return percentiles
+
+    # Method to build the text of the overlay
+    def get_overlay_text(self):
+        percentiles = self.get_percentiles()
+        if percentiles is None:
+            return "Profiling..."
+        lines = [f"{'ms':<17}{'p50':>8}{'p95':>8}{'p99':>8}"]
+        for name, (p50, p95, p99) in percentiles.items():
+            lines.append(f"{name:<17}{p50:8.2f}{p95:8.2f}{p99:8.2f}")
+        return "\n".join(lines)
+
+    # Method to append the frames recorded since the last dump to the CSV file
+    def dump_csv(self):
+        count = self.frame_count - self.dumped_count
+        if not self.csv_path or count == 0:
+            return
+        frame_times, phase_times = self.get_rows()
+        # The first dump of the session starts a new file
+        write_header = self.dumped_count == 0
+        with open(self.csv_path, "w" if write_header else "a", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            if write_header:
+                writer.writerow(["frame", "frame_ms"] + PHASES)
+            for i in range(len(frame_times) - count, len(frame_times)):
+                frame_number = self.frame_count - len(frame_times) + i
+                writer.writerow([frame_number, f"{frame_times[i]:.4f}"] + [f"{t:.4f}" for t in phase_times[i]])
+        self.dumped_count = self.frame_count
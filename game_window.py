@@ -1,84 +1,142 @@
-import pyglet
+import getpass
+import heapq
 import random
 import math
 import os
+import time
+
+from collections import deque
+
+import numpy as np
 
-from pyglet.media import Player
 from pyglet.window import Window, key
-from pyglet.text import Label
-from pyglet.shapes import Line, Rectangle, Star, Circle
+from pyglet.shapes import Line
 from pyglet.resource import image
 
+from asset_loader import AssetLoader
 from audio_load import AudioLoad
+from background_layer import BackgroundLayer
+from frame_profiler import FrameProfiler
+from input_queue import InputQueue
+from glyph_atlas import GlyphAtlas
 from highscore_manager import HighscoreManager
 from highscore_menu import HighscoreMenu
+from hud import Hud
 from image_load import ImageLoad
+from loading_screen import LoadingScreen
 from main_menu import MainMenu
-from particles import Particles
+from music import DEFAULT_BUDGET, MusicPlayer
+from sfx import DEFAULT_VOICES, SfxMixer
+from particles import ParticlePool
+from render_layers import RenderLayers
+from session_log import SessionRecorder
+from starfield import Starfield
 from stage_select_menu import StageSelectMenu
+from telemetry import SessionTelemetry
+
+# Color of the words' characters (bright yellow)
+WORD_COLOR = (255, 255, 0, 255)
+# Name the scores are saved under when the player's name can't be found
+DEFAULT_PLAYER_NAME = "Player"
+
+
+# Function to get the player's name: their login name, or the name of the user running the game when there's no
+# controlling terminal to get the login name from (desktop launchers, services and kiosks)
+def get_player_name():
+    try:
+        return os.getlogin()
+    except OSError:
+        pass
+    try:
+        return getpass.getuser()
+    except (OSError, KeyError):
+        return DEFAULT_PLAYER_NAME
 
 
 # Class that handles the main game window
 class GameWindow(Window):
-    def __init__(self, game, stage):
+    def __init__(self, game, stage, batched_rendering=True, visible=True, wave_size=1, music_budget=DEFAULT_BUDGET,
+                 session_dir=None, audio=True, database=True):
         # Call to the super constructor (window), setting the dimensions and title
-        super().__init__(width=800, height=600, caption="Space Words")
+        super().__init__(width=800, height=600, caption="Space Words", visible=visible)
+        # Flags to turn off the music and sound effects, and the highscores database (replays and benchmarks play
+        # without them, so they need no audio device or decoder and leave the player's scores alone)
+        self.audio = audio
+        self.database = database
+        # Start loading the sound effects on a worker thread right away (the loading screen is shown until they're
+        # loaded, and each stage's background only loads once the stage is picked)
+        if audio:
+            AudioLoad.prefetch_sounds()
+        # Layered batch that holds every in-game visual
+        self.render_layers = RenderLayers(self)
+        # Flag to choose between drawing the whole game with one batch or drawing each object on its own
+        self.batched_rendering = batched_rendering
+        # Scaled stage backgrounds, shared with the stage select menu
+        self.background_layer = BackgroundLayer(batch=self.render_layers.batch, group=self.render_layers.background)
         # Initialize the game words (instance of WordManager)
         self.game = game
+        # Initialize the HighscoreManager to handle highscores (its connection is shared with the highscore menu, and
+        # it's None without the database)
+        self.highscore_manager = HighscoreManager('highscores.db') if database else None
+        # Name of the player the scores and typing telemetry are saved under (found once, when the game starts)
+        self.player_name = get_player_name()
         # Initialize the main menu
         self.main_menu = MainMenu(self)
         # Initialize the stage select menu
         self.stage_select_menu = StageSelectMenu(self)
         # Initialize the highscore menu
         self.highscore_menu = HighscoreMenu(self)
-        # Set the initial menu to the main menu
-        self.current_menu = self.main_menu
+        # Show the loading screen until the sound effects are loaded (right away without audio), and then the main
+        # menu
+        self.loading_screen = LoadingScreen(self)
+        self.loading_screen.show(AudioLoad.sounds_ready if audio else lambda: True,
+                                 lambda: AssetLoader.get_progress(["sounds"]), self.show_main_menu)
         # Flag to track if the game is currently in progress
         self.in_game = False
         # Flag to track if the game is currently paused
         self.paused = False
-        # Flag to check if the background image is loaded
-        self.background_loaded = False
 
-        # Initialize the HighscoreManager to handle highscores
-        self.highscore_manager = HighscoreManager('highscores.db')
-
-        # Load the stage-specific background music player
-        AudioLoad.load_stage_sounds()
-        self.stage_bgm_player = Player()
+        # Background music of the menus and the stages, streamed within a memory budget and crossfaded from one
+        # track to the next (None without audio)
+        self.music = MusicPlayer(AudioLoad.open_music, budget=music_budget) if audio else None
+        # Sound effects of the menus and the game, played through a fixed pool of voices shared by all of them
+        # (without audio the mixer has no voices and is never given a sound, so playing one does nothing)
+        self.sfx = SfxMixer(voices=DEFAULT_VOICES if audio else 0)
 
         # Current stage of the game
         self.stage = stage
         # Initial speed of the words falling
         self.word_speed = 100
-
-        # First pause label
-        self.pause_label = Label("Pause", font_size=36, x=self.width // 2, y=self.height // 2,
-                                 anchor_x="center", anchor_y="center", color=(255, 0, 0, 255))
-
-        # Second pause label
-        self.resume_label = Label("Press Esc to resume or Enter to return to main menu", font_size=12, x=self.width // 2,
-                             y=self.height // 2 - 50,
-                             anchor_x="center", anchor_y="center", color=(255, 255, 255, 255))
+        # Distance the words moved in the last update (used to draw them between the last two updates)
+        self.word_step_distance = 0
+        # Distance the words moved since their wave appeared (the character sprites stay where they appeared and the
+        # whole words layer is shifted back by this distance, so moving every word costs the same as moving one)
+        self.travelled = 0.0
+
+        # Number of words falling at the same time (a new wave comes when every word of the previous one is gone)
+        self.wave_size = wave_size
+        # Horizontal distance between the words of a wave
+        self.wave_spacing = 160
+        # Share of an update the simulation clock is into the next one (1 draws everything where the last update
+        # left it)
+        self.interpolation = 1.0
 
         # Player's score
         self.score = 0
 
-        # Load health images for displaying player's health
+        # Player's health (the game is over when it reaches zero)
+        self.max_health = 3
+        self.health = self.max_health
+
+        # Load the health image and create the HUD (score, health and pause labels) along with the game over overlay
         self.health_image = image('images/health.png')
-        self.health_images = []
-        health_width = 25
-        health_height = 25
-        # Create sprites from the images, and then fill an array with them
-        for i in range(3):
-            health_sprite = pyglet.sprite.Sprite(self.health_image,
-                                                 x=(self.width - health_width * (i + 1)) // 2 + health_width * i,
-                                                 y=self.height - health_height - 20)
-            self.health_images.append(health_sprite)
+        self.hud = Hud(self, self.health_image, self.max_health, batch=self.render_layers.batch,
+                       group=self.render_layers.hud, overlay_group=self.render_layers.overlay)
 
         # Initialize the limitLine line (makes words disappear when they reach it and the player lose one health unit)
         self.limitLine_x = self.width / 5
-        self.limitLine = Line(self.limitLine_x, 0, self.limitLine_x, self.height, width=4, color=(214, 93, 177, 255))
+        self.limitLine = Line(self.limitLine_x, 0, self.limitLine_x, self.height, width=4, color=(214, 93, 177, 255),
+                              batch=self.render_layers.batch, group=self.render_layers.limit_line)
 
         # Time for shake animation when a word character is missed
         self.shake_time = 0.0
@@ -86,8 +144,64 @@ class GameWindow(Window):
         # Initialize time for the limitLine's pulsating effect
         self.pulsate_time = 0.0
 
-        # Background dust
-        self.dust = None
+        # Background dust (parallax layers scrolling behind the words)
+        self.dust = Starfield(self.width, self.height, batch=self.render_layers.batch, group=self.render_layers.dust)
+
+        # Letters of the words rendered once into a texture atlas, drawn on screen as pooled sprites
+        self.glyph_atlas = GlyphAtlas(font_name="Impact", font_size=30, batch=self.render_layers.batch,
+                                      group=self.render_layers.words)
+        # Dictionary whose keys are the ids of the words on screen and the values are deques with the sprites of their
+        # characters (so typed letters are removed from the front in O(1))
+        self.word_sprites = {}
+        # Heap of the x positions (before shifting) of the words' first characters with the word ids, so the word
+        # closest to the limit line is always at its front - typing a letter pushes the word's new position, and
+        # the old entries, which no longer match word_fronts, are skipped when they reach the front
+        self.word_queue = []
+        self.word_fronts = {}
+        # Character sprite shaking after a wrong key
+        self.shaken_sprite = None
+        # Characters typed since the last update
+        self.input_queue = InputQueue()
+        # Flag set while the text of the key press that restarted the game is still to come (it's skipped)
+        self.skip_text = False
+        # Time of the last correct keystroke, for the player's typing statistics
+        self.last_keystroke_time = None
+        # Pool of hit particles, kept for the whole session and recycled between rounds
+        self.particles = ParticlePool(batch=self.render_layers.batch, group=self.render_layers.particles,
+                                      width=self.width)
+
+        # Frame profiler timing each phase of the update and the draw (F3 shows its overlay)
+        self.profiler = FrameProfiler(self, batch=self.render_layers.batch, group=self.render_layers.overlay)
+        self.render_layers.set_profiler(self.profiler)
+
+        # Random number generator of the word positions (every session seeds it again, along with the ones of the
+        # words, the dust and the particles)
+        self.rng = random.Random()
+        # Recorder of the current session's keystrokes and pauses (None outside of a game), the folder the sessions
+        # are saved to (None to keep them in memory only) and the number of game updates run in the session
+        self.session = None
+        self.session_dir = session_dir
+        self.session_steps = 0
+        # Typing telemetry of the current session, saved to the highscores database (None outside of a game or
+        # without the database)
+        self.telemetry = None
+
+    # Write the frame timings that are still pending to the profiler's CSV file before the window closes
+    def on_close(self):
+        self.profiler.dump_csv()
+        self.end_session()
+        # Stop the loads that haven't started yet, the music and the sound effects, and close the highscores database
+        # (committing the scores still queued) once the session files are written
+        SessionRecorder.shutdown()
+        AssetLoader.shutdown()
+        if self.music is not None:
+            self.music.delete()
+        self.sfx.delete()
+        if self.highscore_manager is not None:
+            self.highscore_manager.close()
+        if self.game.key_stats is not None:
+            self.game.key_stats.save()
+        super().on_close()
 
     # Method to update the current stage, both in this class and the word manager
     def update_stage(self, stage):
@@ -108,86 +222,97 @@ class GameWindow(Window):
             self.highscore_menu.draw()
         elif self.current_menu == self.stage_select_menu and not self.in_game:
             self.stage_select_menu.draw()
+        elif self.current_menu == self.loading_screen and not self.in_game:
+            self.loading_screen.draw()
         elif self.in_game:
             if self.is_game_over():
                 self.draw_game_over()
             else:
+                self.profiler.begin()
+                self.interpolate()
                 self.load_background()
                 self.draw_game()
-                if self.paused:
-                    self.pause_label.draw()
-                    self.resume_label.draw()
+                # When batching, the pause labels and the profiler overlay are drawn along with the rest of the batch
+                if not self.batched_rendering:
+                    if self.paused:
+                        self.hud.draw_pause()
+                    if self.profiler.overlay_visible:
+                        self.profiler.overlay_label.draw()
+                    self.profiler.mark("draw_hud")
+                self.profiler.end_frame()
+
+    # Method to check whether the window's contents change without any input (the game, or an animated menu)
+    def is_animated(self):
+        return self.in_game or self.current_menu.is_animated()
 
     # Method to draw the background based on the stage
     def load_background(self):
         if self.stage == 1 or self.stage == 2 or self.stage == 3:
-            # Check whether the images have not been loaded yet - load them if so
-            if not ImageLoad.loaded:
-                ImageLoad.load_images()
-
-            # Create a sprite with the background image, make it fit the window and draw it
-            stage_background = pyglet.sprite.Sprite(ImageLoad.stage_images[self.stage - 1])
-            stage_background.scale_x = self.width / stage_background.width
-            stage_background.scale_y = self.height / stage_background.height
-            stage_background.draw()
+            # Show the stage's cached background sprite (only built or rescaled when the stage or window size change)
+            stage_background = self.background_layer.show(self.stage, self.width, self.height)
+            # When batching, the sprite is drawn along with the rest of the batch
+            if not self.batched_rendering:
+                stage_background.draw()
+                self.profiler.mark("draw_background")
         # Don't load an image if it's stage 1
         else:
             pass
 
     # Method that draws the different methods of the game on screen
     def draw_game(self):
-        # Load the background if not yet loaded
-        if not self.background_loaded:
-            self.load_background()
-            self.background_loaded = True
+        # Draw every layer of the game at once when batching
+        # (the layers report their own draw times to the profiler)
+        if self.batched_rendering:
+            self.hud.set_state(self.score, self.health, self.paused)
+            self.hud.refresh()
+            self.profiler.mark("draw_hud")
+            self.render_layers.draw()
+            return
 
         # Draw the limit line
         self.limitLine.draw()
+        self.profiler.mark("draw_limit_line")
 
         # Draw the dust, characters, and hit particles
-        for dust_particle in self.dust:
-            dust_particle.draw()
-
-        for character in self.characters:
-            character.draw()
-
-        for particle in self.particles:
-            particle.draw()
+        self.dust.draw()
+        self.profiler.mark("draw_dust")
 
-        # Draw the player's score
-        score_label = Label(f"Score: {self.score}", font_size=18, x=10, y=self.height - 40,
-                            anchor_x="left", color=(255, 255, 255, 255))
-        score_label.draw()
+        for sprites in self.word_sprites.values():
+            for character in sprites:
+                character.draw()
+        self.profiler.mark("draw_words")
 
-        # Draw the player's remaining health
-        for health_sprite in self.health_images:
-            health_sprite.draw()
+        self.particles.draw()
+        self.profiler.mark("draw_particles")
 
-        pause_label = Label("Esc → Pause", font_size=14, x=self.width - 10, y=self.height - 15,
-                            anchor_x="right",
-                            anchor_y="top", color=(210, 255, 80, 255))
-        pause_label.draw()
+        # Draw the player's score, remaining health and the pause hint
+        self.hud.set_state(self.score, self.health, self.paused)
+        self.hud.draw()
+        self.profiler.mark("draw_hud")
 
     # Method to draw the game over screen
     def draw_game_over(self):
         # Draw the game over labels
-        game_over_label = Label("GAME OVER", font_size=48, x=self.width // 2, y=self.height // 2,
-                                anchor_x="center", anchor_y="center", color=(255, 0, 0, 255))
-        game_over_label.draw()
-
-        retry_label = Label("Press R to retry", font_size=24, x=self.width // 2, y=self.height // 2 - 50,
-                            anchor_x="center", anchor_y="center", color=(255, 255, 255, 255))
-        retry_label.draw()
-
-        main_menu_label = Label("Press Esc to return to the main menu", font_size=24,
-                                x=self.width // 2, y=self.height // 2 - 100, anchor_x="center", anchor_y="center",
-                                color=(255, 255, 255, 255))
-        main_menu_label.draw()
+        self.hud.set_state(self.score, self.health, self.paused)
+        self.hud.draw_game_over()
 
     # Method to update the game state during each frame
     def on_update(self, elapsed_time):
+        # Move on from the loading screen once the assets it waits for are loaded
+        if self.current_menu == self.loading_screen and not self.in_game:
+            self.loading_screen.update()
+
         # Check if the game is in progress and not paused
         if self.in_game and not self.paused:
+            self.profiler.begin()
+            self.session_steps += 1
+            if self.session is not None:
+                self.session.update(self.session_steps, elapsed_time)
+
+            # Process the characters typed since the last update
+            self.process_input()
+            self.profiler.mark("update_input")
+
             # Adjust the word speed multiplier based on the current stage
             self.word_speed_multiplier = 1.0
             if self.stage == 2:
@@ -203,64 +328,89 @@ class GameWindow(Window):
             limitLine_color = (238, 75, 43, int(255 * alpha_multiplier))
             self.limitLine.color = limitLine_color
 
-            # Move each character (word) on the screen based on the word speed and multiplier
-            for particle in self.characters:
-                particle.x -= self.word_speed * self.word_speed_multiplier * elapsed_time
-
-            # Check if the first character (word) has reached the limitLine line
-            if self.characters[0].x < self.limitLine_x + 12:
-                # Start a new round
+            # Move the words on the screen based on the word speed and multiplier
+            self.word_step_distance = self.word_speed * self.word_speed_multiplier * elapsed_time
+            self.travelled += self.word_step_distance
+
+            # Check if the first character of the words closest to the limitLine line has reached it
+            while self.word_queue:
+                front_x, word_id = self.word_queue[0]
+                # Skip the positions of words that were typed into or are gone
+                if self.word_fronts.get(word_id) != front_x:
+                    heapq.heappop(self.word_queue)
+                elif front_x - self.travelled < self.limitLine_x + 12:
+                    heapq.heappop(self.word_queue)
+                    self.remove_word(word_id)
+                    # Remove one unit of health
+                    self.remove_health()
+                else:
+                    break
+            # Start a new round once the whole wave is gone
+            if not self.word_sprites:
                 self.start()
-                # Remove one unit of health
-                self.remove_health()
+            self.profiler.mark("update_words")
 
             # Update particle effects
-            for particle in self.particles:
-                particle.update(elapsed_time)
+            self.particles.update(elapsed_time)
+            self.profiler.mark("update_particles")
 
             # Move dust in the background to create a scrolling effect
-            for dust_particle in self.dust:
-                dust_particle.x += elapsed_time * 20
-                # Reset dust to the left side when they go beyond the screen width
-                if dust_particle.x > self.width:
-                    dust_particle.x = 0
+            self.dust.update(elapsed_time)
+            self.profiler.mark("update_dust")
 
             # Handle shake animation when the player misses a word
             if self.shake_time > 0:
                 self.shake_time -= elapsed_time
                 # Apply rotation to the first character for a shaking effect
-                self.characters[0].rotation = math.sin(self.shake_time * 50) * 20
+                if self.shaken_sprite is not None:
+                    self.shaken_sprite.rotation = math.sin(self.shake_time * 50) * 20
             # Reset rotation if shake animation time is over
-            else:
-                self.characters[0].rotation = 0
+            elif self.shaken_sprite is not None:
+                self.shaken_sprite.rotation = 0
+                self.shaken_sprite = None
+            self.profiler.mark("update_shake")
 
         # If not in-game or paused, do nothing during this update frame
         else:
             pass
 
+    # Method to draw the moving objects between the last two updates, as far as the simulation clock is into the
+    # next one (a new word or a paused game is drawn where it is)
+    def interpolate(self):
+        alpha = 1.0 if self.paused else self.interpolation
+        self.render_layers.words.offset_x = (1 - alpha) * self.word_step_distance - self.travelled
+        self.dust.interpolate(alpha)
+        self.profiler.mark("draw_dust")
+        self.particles.interpolate(alpha)
+        self.profiler.mark("draw_particles")
+
     # Method to remove one unit of health
     def remove_health(self):
-        if self.health_images:
-            self.health_images.pop()
+        if self.health > 0:
+            self.health -= 1
 
     # Handle key presses based on the game state and menu
     def on_key_press(self, symbol, modifiers):
+        # The text of an earlier key press that started a round was skipped, or never came
+        self.skip_text = False
+        # Show or hide the frame profiler overlay with F3, wherever the player is
+        if symbol == key.F3:
+            self.profiler.toggle_overlay()
         # Check if the game is currently in progress
-        if self.in_game:
+        elif self.in_game:
             # Check if the game is over
             if self.is_game_over():
                 # Allow the player to restart the game by pressing R
                 if symbol == key.R:
                     self.reset_game(True)
+                    # The platform sends this key press' "r" through on_text next, which isn't typing
+                    self.skip_text = True
                 # Allow the player to return to the main menu by pressing Esc
                 elif symbol == key.ESCAPE:
                     self.return_to_main_menu()
-            # Check if the game is not paused to pause it
+            # Check if the game is not paused to pause it (the characters typed while playing arrive through on_text)
             elif symbol == key.ESCAPE:
                 self.toggle_pause()
-            # Check if the game is not paused and handle key presses for gameplay
-            elif not self.paused:
-                self.handle_game_key_press(symbol, modifiers)
             # Check if the game is paused and the player presses Enter to return to the main menu
             elif self.paused and symbol == key.ENTER:
                 self.return_to_main_menu()
@@ -271,22 +421,25 @@ class GameWindow(Window):
 
     # Method to toggle the game pause state
     def toggle_pause(self):
-        # Switch the flag's value
+        # Characters typed before pausing still count
+        if not self.paused:
+            self.process_input()
+        if self.session is not None:
+            self.session.record_pause(self.session_steps, time.perf_counter())
+        # Switch the flag's value (the HUD shows or hides the pause labels accordingly)
         self.paused = not self.paused
-        # Switch the pause label's text
-        if self.paused:
-            self.pause_label.text = "Pause"
-        else:
-            self.pause_label.text = ""
 
     # Method to check the game state based on the player's health
     def is_game_over(self):
-        return not self.health_images
+        return self.health <= 0
 
     # Method to reset the game state
     def reset_game(self, start_game):
-        # Save the player's highscore
+        # End the session, and save the player's highscore (and typing statistics, on a background thread)
+        self.end_session()
         self.save_highscore()
+        if self.game.key_stats is not None:
+            self.game.key_stats.save_in_background()
 
         # Set in_game and paused based on the specified values
         self.in_game = start_game
@@ -295,28 +448,27 @@ class GameWindow(Window):
         # Reset the player's score to zero
         self.score = 0
 
-        # Initialize the player's health images
-        self.health_images = []
-        for i in range(3):
-            health_sprite = pyglet.sprite.Sprite(self.health_image,
-                                                 x=(self.width - 25 * (i + 1)) // 2 + 25 * i,
-                                                 y=self.height - 25 - 20)
-            self.health_images.append(health_sprite)
+        # Restore the player's health
+        self.health = self.max_health
 
-        # Clear the characters, particles, and other game elements
-        self.characters = []
-        self.particles = []
+        # Clear the characters, particles, typed characters still waiting and other game elements
+        self.input_queue.clear()
+        self.clear_characters()
+        self.clear_particles()
 
-        # Reset the limitLine and draw it on the screen
+        # Reset the limitLine's position and color (the same line is kept for the whole session)
         self.limitLine_x = self.width / 5
-        self.limitLine = Line(self.limitLine_x, 0, self.limitLine_x, self.height, width=4, color=(214, 93, 177, 255))
-
-        # Clear and generate dust once again
-        self.initialize_dust()
+        self.limitLine.position = (self.limitLine_x, 0)
+        self.limitLine.x2 = self.limitLine_x
+        self.limitLine.y2 = self.height
+        self.limitLine.color = (214, 93, 177, 255)
 
-        # Start the game immediately if in_game is True
+        # Start a new session immediately if in_game is True (which scatters the dust again), or just clear and
+        # generate the dust once again
         if self.in_game:
-            self.start()
+            self.begin_session()
+        else:
+            self.initialize_dust()
 
     # Method to return to the main menu
     def return_to_main_menu(self):
@@ -324,58 +476,135 @@ class GameWindow(Window):
         self.in_game = False
         self.paused = False
 
-        # Set the current menu to the main menu
-        self.current_menu = self.main_menu
-
         # Reset the game state without starting the game immediately after doing so
         self.reset_game(start_game=False)
 
-        # Pause the stage background music player and reset it
-        self.stage_bgm_player.pause()
-        self.stage_bgm_player = Player()
-
-        # Play the background music again (it picks up from where it left off)
-        self.main_menu.play_menu_bgm()
+        # Set the current menu to the main menu and crossfade back to the menu background music (it picks up from
+        # where it left off)
+        self.show_main_menu()
 
     # Method to save the player's score to the highscores database
     def save_highscore(self):
-        # Save the player's score to the highscores database
-        self.highscore_manager.save_highscore(self.stage, os.getlogin(), self.score)
-
-    # Method to handle key presses during gameplay
-    def handle_game_key_press(self, symbol, modifiers):
-        try:
-            # (DEBUGGING) Print the uppercase character corresponding to the pressed key
-            # print(f"Da key: {chr(symbol).upper()}")
-
-            # Get the uppercase character corresponding to the pressed key
-            key_char = chr(symbol).upper()
-
-            # Check if the pressed key matches the current game word
-            if self.game.verify_key(key_char):
-                # Get the character label at the front of the character labels list
-                character = self.characters[0]
-
-                # Check if the game word is not empty
-                if self.game.word:
-                    # Remove the first character label from the characters list
-                    self.characters = self.characters[1:]
-                else:
-                    # Start a new round and increase the score if the game word is empty
-                    self.start()
-                    self.score += 1
-
-                # Add particles at the position of the removed character label
-                self.particles.append(Particles(character.x, character.y))
+        # Save the player's score to the highscores database (it's written on the database's writer thread, and a
+        # round without a single word typed isn't a score)
+        if self.score > 0 and self.highscore_manager is not None:
+            self.highscore_manager.save_highscore(self.stage, self.player_name, self.score)
+
+    # Queue the characters typed during gameplay, with the time they were typed, until the next game update
+    def on_text(self, text):
+        if self.skip_text:
+            self.skip_text = False
+            return
+        if self.in_game and not self.paused and not self.is_game_over():
+            timestamp = time.perf_counter()
+            for character in text:
+                # Enter and other control characters aren't typing, and neither are the characters whose capital is
+                # more than one character ("ß" is "SS"), which no word has
+                character = character.upper()
+                if character.isprintable() and len(character) == 1:
+                    self.push_character(character, timestamp)
+
+    # Method to queue a typed character until the next game update, recording it in the session
+    def push_character(self, character, timestamp):
+        # (characters that don't fit in the queue are dropped, so they aren't recorded either)
+        if self.input_queue.push(character, timestamp) and self.session is not None:
+            self.session.record_key(self.session_steps, character, timestamp)
+
+    # Method to process every character typed since the last update in one pass
+    def process_input(self):
+        queue = self.input_queue
+        if queue.count == 0:
+            return
+        # Positions of the typed character sprites, where hit particles are added once the whole burst is processed
+        hit_xs = []
+        hit_ys = []
+        missed = False
+        for i in range(queue.count):
+            position = self.type_character(queue.characters[i], queue.timestamps[i])
+            if position is not None:
+                hit_xs.append(position[0])
+                hit_ys.append(position[1])
             else:
-                # Set shake animation time to create a visual shake effect
-                self.shake_time = 0.1
+                missed = True
+        queue.consume()
+
+        # Add particles at the positions of the removed character sprites, and play the hit and miss sounds once for
+        # the whole burst
+        if hit_xs:
+            self.spawn_particles(hit_xs, hit_ys)
+            self.sfx.play("hit")
+        if missed:
+            self.sfx.play("miss")
+
+    # Method to handle one typed character during gameplay, returning the position of the character sprite it
+    # removed (None if it was wrong)
+    def type_character(self, key_char, timestamp=None):
+        # Letter the player was expected to type (only known once a word was locked onto) and the letter before it
+        game = self.game
+        expected = game.active_words[game.target][game.typed_count] if game.target is not None else None
+        previous = game.active_words[game.target][game.typed_count - 1] if game.typed_count else None
+
+        # Check if the typed character matches the target word (or starts a word on screen), getting the word's id
+        target, typed_count = game.target, game.typed_count
+        word_id = game.verify_key(key_char)
+        if word_id is not None and target is not None and word_id != target:
+            # The lock moved to another word starting with the typed prefix: the old target gets its typed characters
+            # back, and the new one loses the ones typed before this key
+            self.restore_characters(target, typed_count)
+            sprites = self.word_sprites[word_id]
+            for i in range(typed_count):
+                self.release_character(sprites.popleft())
+        if game.key_stats is not None:
+            self.record_keystroke(key_char, expected, previous, word_id is not None, timestamp)
+        if self.telemetry is not None:
+            if word_id is not None:
+                self.telemetry.record(key_char, key_char, game.active_words[word_id], True, timestamp)
+            else:
+                word = game.active_words[game.target] if game.target is not None else None
+                self.telemetry.record(expected, key_char, word, False, timestamp)
+        if word_id is not None:
+            # Remove the first character sprite from the word's sprites
+            sprites = self.word_sprites[word_id]
+            character = sprites.popleft()
+
+            # Keep the position of the character sprite on screen, since it's given back to the glyph atlas below
+            character_x, character_y = character.x - self.travelled, character.y
+            self.release_character(character)
+
+            # Check if the word still has characters left
+            if sprites:
+                # Queue the word's new first character for the limit line check
+                self.word_fronts[word_id] = sprites[0].x
+                heapq.heappush(self.word_queue, (sprites[0].x, word_id))
+            else:
+                # Increase the score if the word is complete, and start a new round once the whole wave is gone
+                self.remove_word(word_id)
+                self.score += 1
+                if not self.word_sprites:
+                    self.start()
 
-        # Handle the cases when chr() fails to convert the symbol to a character
-        except ValueError:
-            print("Invalid key pressed.")
-        except OverflowError:
-            print("Invalid key pressed.")
+            return character_x, character_y
+
+        # Set shake animation time to create a visual shake effect on the first character of the target word
+        # (or of the word closest to the limit line)
+        self.shake_time = 0.1
+        if self.shaken_sprite is not None:
+            self.shaken_sprite.rotation = 0
+        self.shaken_sprite = self.get_front_character()
+        return None
+
+    # Method to add a keystroke to the player's typing statistics (the time since the previous keystroke only counts
+    # between letters of the same word, since reaching for a new word's first letter includes reading it)
+    def record_keystroke(self, key_char, expected, previous, correct, timestamp):
+        key_stats = self.game.key_stats
+        if correct:
+            interval = None
+            if previous is not None and timestamp is not None and self.last_keystroke_time is not None:
+                interval = timestamp - self.last_keystroke_time
+            key_stats.record_hit(key_char, previous, interval)
+            self.last_keystroke_time = timestamp
+        elif expected is not None:
+            key_stats.record_miss(expected, previous)
 
     # Method to handle key presses in the menus
     def handle_menu_key_press(self, symbol, modifiers):
@@ -383,120 +612,184 @@ class GameWindow(Window):
         if symbol == key.ENTER:
             # If the Enter key is pressed, inform the main menu to handle the key press
             self.main_menu.handle_key_press(key.ENTER)
-            self.main_menu.get_menu_select_player().play()
+            self.sfx.play("select")
         elif symbol == key.UP:
             # If the Up key is pressed, update the menu selection to the previous option
             self.main_menu.update_selection(-1)
             # Play the menu click sound
-            self.main_menu.get_menu_click_player().play()
+            self.sfx.play("click")
         elif symbol == key.DOWN:
             # If the Down key is pressed, update the menu selection to the next option
             self.main_menu.update_selection(1)
-            self.main_menu.get_menu_click_player().play()
+            self.sfx.play("click")
+
+    # Method to show the main menu and play its music (once the sound effects are loaded, which are then handed to
+    # the mixer)
+    def show_main_menu(self):
+        if self.audio and not AudioLoad.sounds_loaded:
+            AudioLoad.load_sounds()
+            self.sfx.add("click", AudioLoad.menu_click_sound)
+            self.sfx.add("select", AudioLoad.menu_select_sound)
+            self.sfx.add("hit", AudioLoad.hit_sound)
+            self.sfx.add("miss", AudioLoad.miss_sound)
+        self.current_menu = self.main_menu
+        self.main_menu.play_menu_bgm()
+
+    # Method to check whether a stage's background finished loading (its music is streamed, so it's never waited for)
+    def is_stage_loaded(self, stage):
+        return ImageLoad.stage_image_ready(stage)
+
+    # Method to start the game at a stage, showing the loading screen first if the stage isn't loaded yet
+    def start_stage(self, stage):
+        self.update_stage(stage)
+        ImageLoad.prefetch_stage_image(stage)
+        if self.is_stage_loaded(stage):
+            self.begin_session()
+        else:
+            self.loading_screen.show(lambda: self.is_stage_loaded(stage),
+                                     lambda: AssetLoader.get_progress([f"stage{stage}_image"]), self.begin_session)
+
+    # Method to start a session of the current stage: every random number generator of the game is seeded (with a
+    # new seed, unless one is given to play a recorded session again) and the keystrokes and pauses start being
+    # recorded
+    def begin_session(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(63)
+        self.seed_random(seed)
+        key_stats = self.game.key_stats.get_data() if self.game.key_stats is not None else None
+        word_file_hash = self.game.corpus.source_hash if self.game.corpus is not None else None
+        self.session = SessionRecorder(seed, self.stage, self.wave_size, key_stats=key_stats,
+                                       word_file_hash=word_file_hash, session_dir=self.session_dir)
+        self.session_steps = 0
+        self.last_keystroke_time = None
+        if self.highscore_manager is not None:
+            self.telemetry = SessionTelemetry(self.highscore_manager, self.stage, self.player_name)
+        self.initialize_dust()
+        self.start()
+
+    # Method to end the session, writing the rest of it to its file and saving its typing telemetry
+    def end_session(self):
+        if self.session is not None:
+            self.session.finish(self.session_steps, self.score, self.health)
+            self.session = None
+        if self.telemetry is not None:
+            self.telemetry.finish(self.score)
+            self.telemetry = None
+
+    # Method to seed the random number generators of the words, their positions, the dust and the particles
+    def seed_random(self, seed):
+        self.rng = random.Random(seed)
+        self.game.set_rng(random.Random(seed))
+        effects_rng = np.random.default_rng(seed)
+        self.dust.set_rng(effects_rng)
+        self.particles.rng = effects_rng
 
     # Method to start the game
     def start(self):
         # Set in_game to True to indicate that the game is now in progress
         self.in_game = True
 
-        # Stop the menu background music
-        self.main_menu.stop_menu_bgm()
-
-        # Initialize a new round in the game
-        self.game.grab_new_word()
-
-        # Clear existing characters and particles
-        self.characters = []
-        self.particles = []
-
-        # Initialize starting positions for characters
-        x = self.width
-        y = random.randint(self.height / 4, self.height / 4 * 3)
-
-        # Create labels for each character in the current game word and position them
-        # Create labels for each character in the current game word and position them
-        for t in self.game.word:
-            bright_yellow_color = (255, 255, 0, 255)  # Bright yellow color
-            character_label = Label(t, font_name="Impact", font_size=30, x=x, y=y, anchor_x="center",
-                                    color=bright_yellow_color)
-            self.characters.append(character_label)
-
-            # Distance between character labels
-            x = x + 40
-
-        # Check if the stage background music player is not already playing
-        if not self.stage_bgm_player.playing:
-            # Queue the corresponding stage BGM based on the current stage
-            if self.stage == 1:
-                self.stage_bgm_player.queue(AudioLoad.stage1_bgm)
-            elif self.stage == 2:
-                self.stage_bgm_player.queue(AudioLoad.stage2_bgm)
-            elif self.stage == 3:
-                self.stage_bgm_player.queue(AudioLoad.stage3_bgm)
-
-            # Set the BGM player to loop and play the queued music
-            self.stage_bgm_player.loop = True
-            self.stage_bgm_player.play()
-
-    # Generator for yielding random colors
-    def color_generator(self, stage):
-        if stage == 1:
-            # Shades of purple
-            yield (
-                random.randint(100, 180),
-                random.randint(50, 120),
-                random.randint(150, 220),
-                255
-            )
-        elif stage == 2:
-            # Shades of blue
-            yield (
-                random.randint(50, 120),
-                random.randint(100, 180),
-                random.randint(150, 220),
-                255
-            )
-        elif stage == 3:
-            # Shades of red
-            yield (
-                random.randint(150, 220),
-                random.randint(50, 120),
-                random.randint(100, 180),
-                255
-            )
-
-    # Method to create an array of dust depending on the stage
+        # Clear existing characters (hit particles keep flying into the new round)
+        self.clear_characters()
+        self.word_step_distance = 0
+        self.travelled = 0.0
+
+        # Initialize a new round in the game with a wave of words, one after the other (harder ones as the player
+        # scores)
+        band = self.game.get_band(self.score)
+        for i in range(self.wave_size):
+            word = self.game.grab_new_word(band)
+            word_id = self.game.add_word(word)
+
+            # Initialize starting positions for characters
+            x = self.width + i * self.wave_spacing
+            y = self.rng.randint(self.height // 4, self.height // 4 * 3)
+            self.word_fronts[word_id] = x
+            heapq.heappush(self.word_queue, (x, word_id))
+
+            # Get a sprite from the glyph atlas for each character in the word and position them
+            sprites = deque()
+            for t in word:
+                character_sprite = self.glyph_atlas.acquire(t, x, y, WORD_COLOR)
+                sprites.append(character_sprite)
+
+                # Distance between character sprites
+                x = x + 40
+            self.word_sprites[word_id] = sprites
+
+        # Crossfade from the menu background music to the stage's (nothing changes if it's already playing)
+        if self.music is not None:
+            self.music.play(f"stage{self.stage}")
+
+    # Method to add a burst of hit particles at the given position
+    def spawn_particles(self, x, y):
+        self.particles.spawn(x, y)
+
+    # Method to remove a word from the screen
+    def remove_word(self, word_id):
+        for character in self.word_sprites.pop(word_id):
+            self.release_character(character)
+        del self.word_fronts[word_id]
+        self.game.remove_word(word_id)
+
+    # Method to put back the first characters of a word the lock moved away from, in front of its other characters
+    # (if they'd land on or past the limit line, the whole word moves right instead, so its front stays where it was
+    # and no health is lost for characters the player never missed)
+    def restore_characters(self, word_id, count):
+        sprites = self.word_sprites[word_id]
+        if sprites[0].x - 40 * count - self.travelled < self.limitLine_x + 12:
+            for character in sprites:
+                character.x += 40 * count
+        x, y = sprites[0].x, sprites[0].y
+        for character in reversed(self.game.active_words[word_id][:count]):
+            x -= 40
+            sprites.appendleft(self.glyph_atlas.acquire(character, x, y, WORD_COLOR))
+        self.word_fronts[word_id] = x
+        heapq.heappush(self.word_queue, (x, word_id))
+
+    # Method to give a character sprite back to the glyph atlas
+    def release_character(self, character):
+        if character is self.shaken_sprite:
+            self.shaken_sprite = None
+        self.glyph_atlas.release(character)
+
+    # Method to get the first character of the target word, or of the word closest to the limit line
+    def get_front_character(self):
+        word_id = self.game.target
+        if word_id is None:
+            while self.word_queue and self.word_fronts.get(self.word_queue[0][1]) != self.word_queue[0][0]:
+                heapq.heappop(self.word_queue)
+            if not self.word_queue:
+                return None
+            word_id = self.word_queue[0][1]
+        return self.word_sprites[word_id][0]
+
+    # Method to get the number of word characters on screen
+    def get_character_count(self):
+        return sum(len(sprites) for sprites in self.word_sprites.values())
+
+    # Method to remove the word characters from the screen
+    def clear_characters(self):
+        for sprites in self.word_sprites.values():
+            for character in sprites:
+                self.release_character(character)
+        self.word_sprites.clear()
+        self.word_queue.clear()
+        self.word_fronts.clear()
+        self.game.clear_words()
+
+    # Method to get the counters of the objects reused across rounds (hits are reused objects, misses new ones)
+    def get_pool_stats(self):
+        return {
+            "characters": self.glyph_atlas.sprites.get_stats(),
+            "particles": self.particles.get_stats(),
+            "dust": self.dust.get_stats()
+        }
+
+    # Method to remove the hit particles from the screen
+    def clear_particles(self):
+        self.particles.clear()
+
+    # Method to scatter the dust again with the shapes and colors of the current stage
     def initialize_dust(self):
-        self.dust = []
-        for _ in range(20):
-            dust_size = (10, 10)
-            # Add some variation to the size
-            size_variation = random.uniform(0.8, 1.2)
-            dust_size = (int(dust_size[0] * size_variation), int(dust_size[1] * size_variation))
-
-            # Show different types of particles depending on the stage
-            if self.stage == 1:
-                dust = Rectangle(
-                    x=random.randint(0, self.width),
-                    y=random.randint(0, self.height),
-                    width=dust_size[0],
-                    height=dust_size[1],
-                    color=next(self.color_generator(self.stage))
-                )
-            elif self.stage == 2:
-                dust = Circle(
-                    x=random.randint(0, self.width),
-                    y=random.randint(0, self.height),
-                    radius=dust_size[0] // 2,
-                    color=next(self.color_generator(self.stage))
-                )
-            elif self.stage == 3:
-                dust = Star(
-                    x=random.randint(0, self.width),
-                    y=random.randint(0, self.height),
-                    outer_radius=12,
-                    inner_radius=6,
-                    num_spikes=5,
-                    color=next(self.color_generator(self.stage))
-                )
-            self.dust.append(dust)
+        self.dust.set_stage(self.stage)
@@ -0,0 +1,76 @@
+import string
+
+import numpy as np
+from pyglet import font
+from pyglet.image import ImageData
+from pyglet.image.atlas import TextureAtlas
+from pyglet.sprite import Sprite
+
+from object_pool import ObjectPool
+
+
+# Class that renders the letters of the falling words into a texture atlas once, at startup, and hands out pooled
+# sprites showing them (so spawning a word needs no font lookup, text layout or new vertex list)
+class GlyphAtlas:
+    def __init__(self, font_name="Impact", font_size=30, characters=string.ascii_uppercase, batch=None, group=None):
+        # Batch and group the character sprites are added to
+        self.batch = batch
+        self.group = group
+        # Texture atlas holding one white image per character (sprites tint them with their color)
+        self.texture_atlas = TextureAtlas(512, 512)
+        # Dictionary whose keys are the characters and the values are their regions of the atlas
+        self.glyphs = {}
+        # Pool of character sprites, reused from one word to the next
+        self.sprites = ObjectPool(self.create_sprite, self.reuse_sprite, self.hide_sprite)
+
+        # The font keeps its glyphs as alpha-only images in its own textures, so copy their coverage into white
+        # images in the atlas (each font texture is only read back once)
+        game_font = font.load(font_name, font_size)
+        font_textures = {}
+        for character, glyph in zip(characters, game_font.get_glyphs(characters)):
+            texture = glyph.owner
+            if texture not in font_textures:
+                texture_data = texture.get_image_data().get_data("RGBA", texture.width * 4)
+                font_textures[texture] = np.frombuffer(texture_data, dtype=np.uint8).reshape(
+                    texture.height, texture.width, 4)
+            pixels = font_textures[texture][glyph.y:glyph.y + glyph.height, glyph.x:glyph.x + glyph.width].copy()
+            pixels[:, :, :3] = 255
+            # Some font renderers store their glyphs upside down and flip them through the texture coordinates
+            # (the bottom left vertex then samples the top row of the region)
+            if glyph.tex_coords[1] > glyph.tex_coords[7]:
+                pixels = pixels[::-1]
+
+            region = self.texture_atlas.add(ImageData(glyph.width, glyph.height, "RGBA", pixels.tobytes()), border=1)
+            # Anchor the glyph like a label with anchor_x="center": centered on its advance, standing on the baseline
+            region.anchor_x = round(glyph.advance / 2 - glyph.vertices[0])
+            region.anchor_y = -glyph.vertices[1]
+            self.glyphs[character] = region
+
+    # Method to get a sprite showing a character at the given position, reusing a released one when possible
+    def acquire(self, character, x, y, color):
+        return self.sprites.acquire(character, x, y, color)
+
+    # Method to hide a sprite and keep it for later
+    def release(self, sprite):
+        self.sprites.release(sprite)
+
+    # Method to create a new character sprite (when the pool has none to reuse)
+    def create_sprite(self, character, x, y, color):
+        sprite = Sprite(self.glyphs[character], x=x, y=y, batch=self.batch, group=self.group)
+        sprite.color = color[:3]
+        sprite.opacity = color[3]
+        return sprite
+
+    # Method to show a released sprite again with another character
+    def reuse_sprite(self, sprite, character, x, y, color):
+        sprite.image = self.glyphs[character]
+        sprite.update(x=x, y=y, rotation=0)
+        if tuple(sprite.color) != color[:3]:
+            sprite.color = color[:3]
+        sprite.opacity = color[3]
+        sprite.visible = True
+
+    # Method to hide a released sprite
+    @staticmethod
+    def hide_sprite(sprite):
+        sprite.visible = False
@@ -1,18 +1,198 @@
+import heapq
+import queue
+import random
 import sqlite3
+import threading
+import time
 
+# Version of the database layout this game saves (kept in the database's user_version, so older databases are
+# upgraded when opened)
+SCHEMA_VERSION = 2
+# Default longest time a saved score waits before it's committed (the scores an abrupt exit can lose)
+FLUSH_INTERVAL = 0.5
+# Default number of scores that can wait to be written (scores saved while it's full are dropped)
+QUEUE_SIZE = 1024
+# Number of scores on a stage's leaderboard
+LEADERBOARD_SIZE = 10
 
-# Class for handling DB operations
+# Statements the writer thread runs: a saved score, a batch of a session's keystrokes, a session's rollup and the
+# running totals of every letter of a stage (kept up to date as sessions end, so they're never summed from the
+# keystrokes)
+INSERT_HIGHSCORE = "INSERT INTO highscores (stage, player_name, score) VALUES (?, ?, ?)"
+INSERT_KEYSTROKE = '''
+    INSERT INTO keystrokes (session_id, number, stage, word, expected, typed, latency)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+INSERT_SESSION = '''
+    INSERT INTO sessions (id, stage, player_name, started, duration, score, keystrokes, correct, wpm, accuracy,
+                          latency_p50, latency_p90, latency_p99)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+UPDATE_LETTER_TOTALS = '''
+    INSERT INTO letter_totals (stage, letter, keystrokes, misses, latency_total, latency_count)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (stage, letter) DO UPDATE SET
+        keystrokes = keystrokes + excluded.keystrokes,
+        misses = misses + excluded.misses,
+        latency_total = latency_total + excluded.latency_total,
+        latency_count = latency_count + excluded.latency_count
+'''
+
+
+# Class for the thread writing the saved scores and the typing telemetry to the database through its own connection:
+# it takes them from a bounded queue and commits everything that arrived within the flush interval at once, in the
+# order it was queued
+class ScoreWriter:
+    def __init__(self, db_file, flush_interval=FLUSH_INTERVAL, queue_size=QUEUE_SIZE):
+        self.db_file = db_file
+        self.flush_interval = flush_interval
+        # Writes waiting to be run as (statement, rows, on_refused) tuples, where on_refused is called by the thread
+        # if the database refuses the rows (None tells the thread to stop)
+        self.records = queue.Queue(queue_size)
+        # Counters of the rows written, the commits that wrote them, the rows dropped because the queue was full and
+        # the rows the database refused, with the last error it gave
+        self.written = 0
+        self.commits = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_error = None
+
+        self.thread = threading.Thread(target=self.run, name="score-writer", daemon=True)
+        self.thread.start()
+
+    # Method to queue rows to be written with a statement, returning whether they were queued (it never waits: the
+    # rows are dropped if the queue is full), with an optional function the writer thread calls if they're refused
+    def put(self, statement, rows, on_refused=None):
+        try:
+            self.records.put_nowait((statement, rows, on_refused))
+        except queue.Full:
+            self.dropped += len(rows)
+            return False
+        return True
+
+    # Method run by the writer thread: wait for a write, gather the ones arriving within the flush interval and
+    # commit them together (one executemany per statement, in the order they first came), until it's told to stop
+    def run(self):
+        connection = sqlite3.connect(self.db_file)
+        # (the synchronous setting is per connection, the journal mode was already set by the manager)
+        connection.execute("PRAGMA synchronous=NORMAL")
+        closing = False
+        while not closing:
+            record = self.records.get()
+            batch = []
+            deadline = time.perf_counter() + self.flush_interval
+            while record is not None:
+                batch.append(record)
+                try:
+                    record = self.records.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+            closing = record is None
+
+            try:
+                if batch:
+                    self.write_batch(connection, batch)
+            finally:
+                # Mark the writes (and the stop request) as done, for flush, even if they couldn't be written
+                for i in range(len(batch) + closing):
+                    self.records.task_done()
+        connection.close()
+
+    # Method to commit a batch of writes at once, or each write on its own if the database refuses the batch (so a
+    # write it can't take doesn't lose the others), counting the rows it refused
+    def write_batch(self, connection, batch):
+        statements = {}
+        for statement, rows, on_refused in batch:
+            statements.setdefault(statement, []).extend(rows)
+        try:
+            with connection:
+                for statement, rows in statements.items():
+                    connection.executemany(statement, rows)
+            self.written += sum(len(rows) for rows in statements.values())
+            self.commits += 1
+            return
+        except sqlite3.Error:
+            pass
+
+        for statement, rows, on_refused in batch:
+            try:
+                with connection:
+                    connection.executemany(statement, rows)
+                self.written += len(rows)
+                self.commits += 1
+            except sqlite3.Error as error:
+                self.failed += len(rows)
+                self.last_error = error
+                if on_refused is not None:
+                    on_refused()
+
+    # Method to wait until every queued write is committed
+    def flush(self):
+        self.records.join()
+
+    # Method to commit the queued writes and stop the thread
+    def close(self):
+        if self.thread.is_alive():
+            self.records.put(None)
+            self.thread.join()
+
+
+# Class for handling DB operations (one is created by the game window and shared by everything reading or saving
+# highscores and typing telemetry: it reads through its connection and saves through the writer thread's, which in
+# WAL mode never block each other) - each stage's leaderboard is read from the database once and then kept up to
+# date in memory
 class HighscoreManager:
-    def __init__(self, db_file):
+    def __init__(self, db_file, flush_interval=FLUSH_INTERVAL, queue_size=QUEUE_SIZE):
         # Connect to a SQLite3 file saved within the project
+        self.db_file = db_file
         self.connection = sqlite3.connect(db_file)
+        # Write-ahead logging: a commit appends to the log instead of rewriting the pages and syncing the file twice
+        # (a normal sync keeps the database consistent, only the last scores can be lost on a power cut)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
         # Create a cursor from the connection to execute queries and statements
         self.cursor = self.connection.cursor()
-        # Start off by calling the following method to create a table if it doesn't yet exist
+        # Start off by calling the following method to create the table (or upgrade an older one)
         self.create_highscores_table()
+        # Thread writing the saved scores, so saving never waits for the disk
+        self.writer = ScoreWriter(db_file, flush_interval, queue_size)
+        # Dictionary whose keys are the stage numbers and the values are min-heaps of their best scores as
+        # (score, -id, player name) tuples, so the first entry is the one a better score pushes out (the latest among
+        # the lowest)
+        self.leaderboards = {}
+        # Id of the last score saved (scores waiting for the writer thread don't have theirs yet, so it's counted
+        # here the same way the database will count it)
+        self.last_id = self.connection.execute("SELECT MAX(id) FROM highscores").fetchone()[0] or 0
+        # Ids of the saved scores the database refused (put there by the writer thread, and taken off the
+        # leaderboards by this one the next time they're read)
+        self.refused_scores = queue.SimpleQueue()
+        # Random source of the session ids: a session's keystrokes are saved before its rollup, so its id is given out
+        # when it starts instead of by the database, and another game sharing the database must not give out the same
+        # one (the operating system's randomness, since the game seeds the random module to replay sessions)
+        self.session_ids = random.SystemRandom()
 
-    # Method to create the highscores table if it doesn't exist yet
+    # Method to create the highscores and telemetry tables and their indexes if they don't exist yet, and upgrade
+    # databases saved by older versions of the game one version at a time
     def create_highscores_table(self):
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"{self.db_file} was saved by a newer version of the game (schema {version})")
+        if version == SCHEMA_VERSION:
+            return
+
+        # The sqlite3 module runs table changes and pragmas outside of its own transactions, so the upgrade opens one
+        # itself: it's applied whole or not at all, and another game opening the database meanwhile waits for it
+        with self.connection:
+            self.cursor.execute("BEGIN IMMEDIATE")
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                self.create_leaderboard_tables()
+            if version < 2:
+                self.create_telemetry_tables()
+            self.cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    # Method to create the highscores table and the index of the leaderboards (schema 1)
+    def create_leaderboard_tables(self):
         self.cursor.execute('''
             CREATE TABLE IF NOT EXISTS highscores (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -21,27 +201,176 @@ class HighscoreManager:
                 score INTEGER
             )
         ''')
-        self.connection.commit()
+        # Index holding every column the leaderboard reads, in the order it reads them (the best scores of a stage
+        # are its first entries, so the query reads ten entries instead of sorting the stage's scores)
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS highscores_leaderboard
+            ON highscores (stage, score DESC, id, player_name)
+        ''')
+
+    # Method to create the typing telemetry tables (schema 2)
+    def create_telemetry_tables(self):
+        # Every keystroke of every session (latency in milliseconds since the session's previous keystroke, NULL for
+        # the first one), stored in session order so reading a session's keystrokes needs no other index
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS keystrokes (
+                session_id INTEGER,
+                number INTEGER,
+                stage INTEGER,
+                word TEXT,
+                expected TEXT,
+                typed TEXT,
+                latency REAL,
+                PRIMARY KEY (session_id, number)
+            ) WITHOUT ROWID
+        ''')
+        # One rollup per session, computed when it ends (start time in seconds since the epoch, duration in seconds
+        # spent typing, which leaves out the breaks, and latency percentiles in milliseconds)
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                stage INTEGER,
+                player_name TEXT,
+                started REAL,
+                duration REAL,
+                score INTEGER,
+                keystrokes INTEGER,
+                correct INTEGER,
+                wpm REAL,
+                accuracy REAL,
+                latency_p50 REAL,
+                latency_p90 REAL,
+                latency_p99 REAL
+            )
+        ''')
+        # Index of the sessions by stage and time, so a summary of a period reads only its sessions
+        self.cursor.execute('''
+            CREATE INDEX IF NOT EXISTS sessions_by_stage
+            ON sessions (stage, started, wpm, accuracy, keystrokes)
+        ''')
+        # Running totals of every expected letter of every stage
+        self.cursor.execute('''
+            CREATE TABLE IF NOT EXISTS letter_totals (
+                stage INTEGER,
+                letter TEXT,
+                keystrokes INTEGER,
+                misses INTEGER,
+                latency_total REAL,
+                latency_count INTEGER,
+                PRIMARY KEY (stage, letter)
+            ) WITHOUT ROWID
+        ''')
 
-    # Method to save a new highscore into the table
+    # Method to save a new highscore into the table (it's queued for the writer thread, which commits it within the
+    # flush interval) and onto the stage's leaderboard in O(log K)
     def save_highscore(self, stage, player_name, score):
+        # The leaderboard is read before the score is queued, so it can't already hold it
+        leaderboard = self.get_leaderboard(stage)
+        # A score dropped because the writer's queue is full never reaches the database, so it isn't shown either
+        # (and one the database refuses is taken back off the leaderboard once the writer thread reports it)
+        score_id = self.last_id + 1
+        if not self.writer.put(INSERT_HIGHSCORE, [(stage, player_name, score)],
+                               lambda: self.refused_scores.put(score_id)):
+            return
+        self.last_id = score_id
+        entry = (score, -score_id, player_name)
+        if len(leaderboard) < LEADERBOARD_SIZE:
+            heapq.heappush(leaderboard, entry)
+        elif entry > leaderboard[0]:
+            heapq.heapreplace(leaderboard, entry)
+
+    # Method to get the leaderboard of a stage, reading it from the database the first time
+    def get_leaderboard(self, stage):
+        self.discard_refused_scores()
+        leaderboard = self.leaderboards.get(stage)
+        if leaderboard is None:
+            leaderboard = [(score, -score_id, player_name)
+                           for score_id, player_name, score in self.read_highscores(stage)]
+            heapq.heapify(leaderboard)
+            self.leaderboards[stage] = leaderboard
+        return leaderboard
+
+    # Method to take the scores the database refused off the leaderboards: a refused score never took an id in the
+    # database, so the scores saved after it have one less than they were given here, and a full leaderboard it's
+    # taken off gets back the score it had pushed off from the database
+    def discard_refused_scores(self):
+        while not self.refused_scores.empty():
+            refused_id = self.refused_scores.get()
+            self.last_id -= 1
+            for stage, leaderboard in self.leaderboards.items():
+                entries = [(score, negative_id + 1 if -negative_id > refused_id else negative_id, player_name)
+                           for score, negative_id, player_name in leaderboard if negative_id != -refused_id]
+                if len(entries) < len(leaderboard) == LEADERBOARD_SIZE:
+                    entries = heapq.nlargest(LEADERBOARD_SIZE, set(entries).union(
+                        (score, -score_id, player_name)
+                        for score_id, player_name, score in self.read_highscores(stage)))
+                leaderboard[:] = entries
+                heapq.heapify(leaderboard)
+
+    # Method to read the best scores of a stage from the database, ordered in descending order (the earliest score
+    # first among equal ones)
+    def read_highscores(self, stage):
         self.cursor.execute('''
-            INSERT INTO highscores (stage, player_name, score)
-            VALUES (?, ?, ?)
-        ''', (stage, player_name, score))
-        self.connection.commit()
+            SELECT id, player_name, score
+            FROM highscores
+            WHERE stage = ?
+            ORDER BY score DESC, id
+            LIMIT ?
+        ''', (stage, LEADERBOARD_SIZE))
+        return self.cursor.fetchall()
 
-    # Method to retrieve highscores from a certain stage, limited to 10 and ordered in descending order
+    # Method to retrieve highscores from a certain stage, limited to 10 and ordered in descending order (from the
+    # leaderboard kept in memory, so only the first call for a stage reads the database)
     def get_highscores(self, stage):
+        return [(player_name, score) for score, negative_id, player_name in
+                sorted(self.get_leaderboard(stage), reverse=True)]
+
+    # Method to get the id of a new session (a random 63-bit integer, the largest a SQLite integer key holds, so two
+    # games are as good as certain never to pick the same one)
+    def new_session_id(self):
+        return self.session_ids.getrandbits(63)
+
+    # Method to save a batch of a session's keystrokes, as rows of the keystrokes table (queued for the writer
+    # thread like the scores)
+    def save_keystrokes(self, rows):
+        self.writer.put(INSERT_KEYSTROKE, rows)
+
+    # Method to save a session's rollup and add its letters to the stage's totals (the rollup is queued last, so
+    # once a session is in the database its keystrokes and letters are too)
+    def save_session(self, session, letter_totals):
+        self.writer.put(UPDATE_LETTER_TOTALS, letter_totals)
+        self.writer.put(INSERT_SESSION, [session])
+
+    # Method to summarize the sessions of a stage started within a period (seconds since the epoch), as a dictionary
+    # of the number of sessions, their keystrokes, and the average and best WPM and average accuracy (from the
+    # sessions' rollups, through the index holding their columns)
+    def get_session_summary(self, stage, since=0.0, until=float("inf")):
         self.cursor.execute('''
-            SELECT player_name, score
-            FROM highscores
+            SELECT COUNT(*), TOTAL(keystrokes), AVG(wpm), MAX(wpm), AVG(accuracy)
+            FROM sessions
+            WHERE stage = ? AND started >= ? AND started < ?
+        ''', (stage, since, until))
+        sessions, keystrokes, average_wpm, best_wpm, accuracy = self.cursor.fetchone()
+        return {"sessions": sessions, "keystrokes": int(keystrokes), "average_wpm": average_wpm or 0.0,
+                "best_wpm": best_wpm or 0.0, "accuracy": accuracy or 0.0}
+
+    # Method to get the totals of every letter of a stage as (letter, keystrokes, miss rate, average latency in
+    # milliseconds) tuples, the most missed first
+    def get_letter_totals(self, stage):
+        self.cursor.execute('''
+            SELECT letter, keystrokes, CAST(misses AS REAL) / keystrokes AS miss_rate,
+                   latency_total / NULLIF(latency_count, 0)
+            FROM letter_totals
             WHERE stage = ?
-            ORDER BY score DESC
-            LIMIT 10
+            ORDER BY miss_rate DESC, letter
         ''', (stage,))
         return self.cursor.fetchall()
 
-    # Close the connection on object deletion
+    # Method to commit the writes still queued, stop the writer thread and close the connection
+    def close(self):
+        self.writer.close()
+        self.connection.close()
+
+    # Close the connection on object deletion (the writes still queued are only committed by close)
     def __del__(self):
-        self.connection.close()
\ No newline at end of file
+        self.connection.close()
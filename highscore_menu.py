@@ -1,11 +1,8 @@
-from pyglet.media import Player
 from pyglet.shapes import Circle
 from pyglet.sprite import Sprite
 from pyglet.window import key
 from pyglet.text import Label
 
-from audio_load import AudioLoad
-from highscore_manager import HighscoreManager
 from image_load import ImageLoad
 
 # Constants for colors
@@ -27,10 +24,12 @@ class HighscoreMenu:
         self.selected_stage = 1
         # To help navigate through the different stages
         self.stages = [1, 2, 3]
-        # Initialize an HighscoreManager object with the database to be used to show the highscores
-        self.highscore_manager = HighscoreManager('highscores.db')
-        # Dictionary whose keys are the stage numbers and the values are the list of highscores saved for each
-        self.highscores = {stage: self.load_highscores_from_db(stage) for stage in self.stages}
+        # The window's HighscoreManager, which keeps each stage's leaderboard in memory (read from the database once
+        # here, and updated by the game as it saves scores), None when the window has no database
+        self.highscore_manager = window.highscore_manager
+        if self.highscore_manager is not None:
+            for stage in self.stages:
+                self.highscore_manager.get_leaderboard(stage)
         # Creation and positioning of the different labels
         self.back_label = Label("Back", font_size=24, x=window.width // 2, y=window.height // 2 - 250,
                                 anchor_x="center", color=YELLOW)
@@ -46,17 +45,6 @@ class HighscoreMenu:
         stage_image = ImageLoad.stage_previews[self.selected_stage - 1]
         self.stage_preview = Sprite(stage_image, x=window.width // 2 - 127, y=window.height - 210)
 
-        # Load the different menu sounds
-        AudioLoad.load_menu_sounds()
-        self.menu_click_player = Player()
-        self.menu_click_player.queue(AudioLoad.menu_click_sound)
-
-        self.menu_select_player = Player()
-        self.menu_select_player.queue(AudioLoad.menu_select_sound)
-
-        self.stage_select_player = Player()
-        self.stage_select_player.queue(AudioLoad.stage_select_sound)
-
         self.stage_label.color = WHITE
 
         # Blue circle properties (will be shown next to the selected option)
@@ -65,15 +53,17 @@ class HighscoreMenu:
         selected_label = self.get_selected_label()
         self.blue_circle_x = selected_label.x - selected_label.content_width / 2 - self.blue_circle_radius - 10
         self.blue_circle_y = selected_label.y + 12
+        # The circle and the arrows are created once (the circle is moved when the selection changes)
+        self.blue_circle = Circle(self.blue_circle_x, self.blue_circle_y, self.blue_circle_radius,
+                                  color=self.blue_circle_color)
+        self.left_arrow_label = Label("◄", font_size=24, x=self.stage_label.x - 80, y=self.stage_label.y,
+                                      anchor_x="center", color=BLUE)
+        self.right_arrow_label = Label("►", font_size=24, x=self.stage_label.x + 80, y=self.stage_label.y,
+                                       anchor_x="center", color=BLUE)
 
         # Load and display highscores for the selected stage (first one by default)
         self.update_stage_selection(0)
 
-    # Method to retrieve scores from the DB for a given stage
-    def load_highscores_from_db(self, stage):
-        # Load highscores from the database for the specified stage
-        return self.highscore_manager.get_highscores(stage)
-
     # Method for creating the different highscore labels, coloring them accordingly
     def create_score_labels(self):
         # Array to contain the different labels
@@ -106,47 +96,40 @@ class HighscoreMenu:
 
         # Draw arrows when the stage label is selected
         if self.stage_label.color == WHITE:
-            # Draw left arrow
-            left_arrow_label = Label("◄", font_size=24, x=self.stage_label.x - 80, y=self.stage_label.y,
-                                     anchor_x="center", color=BLUE)
-            left_arrow_label.draw()
-
-            # Draw right arrow
-            right_arrow_label = Label("►", font_size=24, x=self.stage_label.x + 80,
-                                      y=self.stage_label.y, anchor_x="center", color=BLUE)
-            right_arrow_label.draw()
+            self.left_arrow_label.draw()
+            self.right_arrow_label.draw()
 
         # Draw blue circle only when the "Back" label is selected
         if self.back_label.color == WHITE:
-            blue_circle = Circle(self.blue_circle_x, self.blue_circle_y, self.blue_circle_radius,
-                                 color=self.blue_circle_color)
-            blue_circle.draw()
-
-        self.stage_label.draw()
+            self.blue_circle.draw()
 
         # Draw stage preview image
         self.stage_preview.draw()
         for label in self.score_labels:
             label.draw()
 
+    # Method to check whether the menu changes without any input (it doesn't, so it's only redrawn after a key press)
+    def is_animated(self):
+        return False
+
     # Method to handle user input in this menu
     def handle_key_press(self, symbol):
         # Confirm the user's choice (will only work when the "Back" label is selected)
         if symbol == key.ENTER:
             if self.back_label.color == WHITE:
                 self.window.current_menu = self.window.main_menu
-                self.get_menu_select_player().play()
+                self.window.sfx.play("select")
             elif self.stage_label.color == WHITE:
                 pass
         # Move the selection upwards or downwards
         elif symbol == key.UP or symbol == key.DOWN:
             self.toggle_selection()
-            self.get_menu_click_player().play()
+            self.window.sfx.play("click")
         # Move the selection high or left (will only work when the "Stage" label is selected)
         elif symbol == key.LEFT or symbol == key.RIGHT:
             if self.stage_label.color == WHITE:
                 self.update_stage_selection(1 if symbol == key.RIGHT else -1)
-                self.get_stage_select_player().play()
+                self.window.sfx.play("select")
 
     # Method to change the selected option by switching the label colors between "Stage" and "Back"
     def toggle_selection(self):
@@ -186,9 +169,6 @@ class HighscoreMenu:
         stage_preview = ImageLoad.stage_previews[self.selected_stage - 1]
         self.stage_preview.image = stage_preview
 
-        # Load and display highscores for the updated selected stage
-        self.highscores[self.selected_stage] = self.load_highscores_from_db(self.selected_stage)
-
         # Call display_highscores to update the displayed scores
         self.display_highscores()
 
@@ -205,35 +185,19 @@ class HighscoreMenu:
 
         self.blue_circle_x = selected_label.x - selected_label.content_width / 2 - self.blue_circle_radius - 10
         self.blue_circle_y = selected_label.y + 12
+        self.blue_circle.position = (self.blue_circle_x, self.blue_circle_y)
 
     # Method to get the currently selected label by checking the colors
     def get_selected_label(self):
         return self.back_label if self.back_label.color == WHITE else self.stage_label
 
-    # Method to update
+    # Method to update the score labels with the highscores of the selected stage (from the leaderboard kept in
+    # memory, so the database isn't touched)
     def display_highscores(self):
         # Display highscores for the selected stage
         # The notation [:10] makes it extract the top 10 scores from the list
-        for i, (player_name, score) in enumerate(self.highscores[self.selected_stage][:10]):
+        highscores = []
+        if self.highscore_manager is not None:
+            highscores = self.highscore_manager.get_highscores(self.selected_stage)
+        for i, (player_name, score) in enumerate(highscores[:10]):
             self.score_labels[i].text = f"{i + 1}. {player_name}: {score}"
-
-    # Method to re-initialize the menu click sound player
-    def get_menu_click_player(self):
-        self.menu_click_player = Player()
-        self.menu_click_player.queue(AudioLoad.menu_click_sound)
-        self.menu_click_player.seek(0)
-        return self.menu_click_player
-
-    # Method to re-initialize the menu select sound player
-    def get_menu_select_player(self):
-        self.menu_select_player = Player()
-        self.menu_select_player.queue(AudioLoad.menu_select_sound)
-        self.menu_select_player.seek(0)
-        return self.menu_select_player
-
-    # Method to re-initialize the stage select sound player
-    def get_stage_select_player(self):
-        self.stage_select_player = Player()
-        self.stage_select_player.queue(AudioLoad.menu_select_sound)
-        self.stage_select_player.seek(0)
-        return self.stage_select_player
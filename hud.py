@@ -0,0 +1,124 @@
+import time
+
+from pyglet.graphics import Batch
+from pyglet.sprite import Sprite
+from pyglet.text import Label
+
+
+# Class that keeps the in-game HUD (score, health, pause hint and pause labels) and the game over overlay alive
+# between frames, laying out text again only when the score, the health or the game state actually change
+class Hud:
+    def __init__(self, window, health_image, max_health, batch=None, group=None, overlay_group=None):
+        # Reference to the main window
+        self.window = window
+
+        # Values currently shown (None forces the first refresh to lay everything out)
+        self.score = None
+        self.health = max_health
+        self.paused = None
+        # Flag to track whether the shown values changed since the last refresh
+        self.dirty = True
+
+        # Number of text layouts performed so far, and how many happened during the last second
+        self.layout_count = 0
+        self.layouts_per_second = 0
+        self.layout_window_count = 0
+        self.layout_window_start = time.perf_counter()
+
+        # Player's score
+        self.score_label = Label("", font_size=18, x=10, y=window.height - 40, anchor_x="left",
+                                 color=(255, 255, 255, 255), batch=batch, group=group)
+        # Reminder of how to pause the game
+        self.pause_hint_label = Label("Esc → Pause", font_size=14, x=window.width - 10, y=window.height - 15,
+                                      anchor_x="right", anchor_y="top", color=(210, 255, 80, 255),
+                                      batch=batch, group=group)
+        self.layout_count += 2
+
+        # Sprites for the player's health, shown or hidden depending on the remaining health
+        health_width = 25
+        health_height = 25
+        self.health_sprites = []
+        for i in range(max_health):
+            health_sprite = Sprite(health_image,
+                                   x=(window.width - health_width * (i + 1)) // 2 + health_width * i,
+                                   y=window.height - health_height - 20, batch=batch, group=group)
+            self.health_sprites.append(health_sprite)
+
+        # Pause labels, drawn on top of the game while it's paused
+        self.pause_label = Label("Pause", font_size=36, x=window.width // 2, y=window.height // 2,
+                                 anchor_x="center", anchor_y="center", color=(255, 0, 0, 255),
+                                 batch=batch, group=overlay_group)
+        self.resume_label = Label("Press Esc to resume or Enter to return to main menu", font_size=12,
+                                  x=window.width // 2, y=window.height // 2 - 50,
+                                  anchor_x="center", anchor_y="center", color=(255, 255, 255, 255),
+                                  batch=batch, group=overlay_group)
+        self.pause_labels = [self.pause_label, self.resume_label]
+        self.layout_count += 2
+
+        # Game over labels, kept in their own batch since the game over screen shows nothing else
+        self.game_over_batch = Batch()
+        self.game_over_labels = [
+            Label("GAME OVER", font_size=48, x=window.width // 2, y=window.height // 2,
+                  anchor_x="center", anchor_y="center", color=(255, 0, 0, 255), batch=self.game_over_batch),
+            Label("Press R to retry", font_size=24, x=window.width // 2, y=window.height // 2 - 50,
+                  anchor_x="center", anchor_y="center", color=(255, 255, 255, 255), batch=self.game_over_batch),
+            Label("Press Esc to return to the main menu", font_size=24,
+                  x=window.width // 2, y=window.height // 2 - 100, anchor_x="center", anchor_y="center",
+                  color=(255, 255, 255, 255), batch=self.game_over_batch)
+        ]
+        self.layout_count += 3
+
+    # Method to update the values the HUD shows, marking it dirty only if something changed
+    def set_state(self, score, health, paused):
+        if score != self.score or health != self.health or paused != self.paused:
+            self.dirty = True
+        self.score = score
+        self.health = health
+        self.paused = paused
+
+    # Method to apply the changed values to the labels and sprites (does nothing if the HUD isn't dirty)
+    def refresh(self):
+        if self.dirty:
+            # Setting the same text again doesn't trigger a new layout, so only count the labels that really change
+            score_text = f"Score: {self.score}"
+            if self.score_label.text != score_text:
+                self.score_label.text = score_text
+                self.layout_count += 1
+
+            for i, health_sprite in enumerate(self.health_sprites):
+                health_sprite.visible = i < self.health
+
+            # Showing a hidden label lays it out again
+            for label in self.pause_labels:
+                if label.visible != self.paused:
+                    label.visible = self.paused
+                    if self.paused:
+                        self.layout_count += 1
+
+            self.dirty = False
+
+        # Keep track of how many layouts happened during the last second
+        now = time.perf_counter()
+        if now - self.layout_window_start >= 1.0:
+            self.layouts_per_second = (self.layout_count - self.layout_window_count) / (now - self.layout_window_start)
+            self.layout_window_count = self.layout_count
+            self.layout_window_start = now
+
+    # Method to draw the HUD elements one by one (used when the game isn't drawn through the batch)
+    def draw(self):
+        self.refresh()
+        self.score_label.draw()
+        for health_sprite in self.health_sprites:
+            if health_sprite.visible:
+                health_sprite.draw()
+        self.pause_hint_label.draw()
+
+    # Method to draw the pause labels one by one (used when the game isn't drawn through the batch)
+    def draw_pause(self):
+        for label in self.pause_labels:
+            label.draw()
+
+    # Method to draw the game over overlay
+    def draw_game_over(self):
+        self.refresh()
+        self.game_over_batch.draw()
@@ -1,21 +1,67 @@
-
 from pyglet.resource import image
 
+from asset_loader import AssetLoader
+from frame_cache import FrameCache
+
 
 # Class to handle image asset loading
 class ImageLoad:
-    # Array to store the different stage background images
-    stage_images = []
+    # Paths of the stage background images (only loaded once the stage is picked in the stage select menu)
+    stage_paths = ["images/stage1.jpg", "images/stage2.gif", "images/stage3.gif"]
+    # Dictionary whose keys are the stage numbers and the values are their loaded background images
+    stage_images = {}
     # Array to store the different stage background previews
     stage_previews = []
-    # Class-level flag to track whether resources are loaded or not
+    # Class-level flag to track whether the previews are loaded or not
     loaded = False
+    # Cache holding the decoded frames of the animated stage backgrounds
+    frame_cache = None
 
-    # Class method to load the images in case they're not loaded already
+    # Class method to load the preview images in case they're not loaded already
     # (note to self: class methods can be called without instantiating the class)
     @classmethod
     def load_images(cls):
         if not cls.loaded:
-            cls.stage_images = [image("images/stage1.jpg"), image("images/stage2.gif"), image("images/stage3.gif")]
             cls.stage_previews = [image("images/preview1.png"), image("images/preview2.png"), image("images/preview3.png")]
             cls.loaded = True
+
+    # Class method to get the cache of decoded animation frames
+    @classmethod
+    def get_frame_cache(cls):
+        if cls.frame_cache is None:
+            cls.frame_cache = FrameCache()
+        return cls.frame_cache
+
+    # Class method to check whether a stage's background is animated
+    @classmethod
+    def is_stage_animated(cls, stage):
+        return cls.stage_paths[stage - 1].endswith(".gif")
+
+    # Class method to start preparing a stage's background on a worker thread (animated backgrounds are decoded into
+    # the frame cache there, while the texture upload is left for the main thread)
+    @classmethod
+    def prefetch_stage_image(cls, stage):
+        path = cls.stage_paths[stage - 1]
+        if cls.is_stage_animated(stage):
+            AssetLoader.submit(f"stage{stage}_image", cls.get_frame_cache().prepare, path)
+
+    # Class method to check whether a stage's background can be loaded without waiting for a worker thread
+    @classmethod
+    def stage_image_ready(cls, stage):
+        return (stage in cls.stage_images or not cls.is_stage_animated(stage)
+                or AssetLoader.is_ready(f"stage{stage}_image"))
+
+    # Class method to load a stage's background image in case it's not loaded already (waiting for its frames to be
+    # decoded if they're still being decoded)
+    @classmethod
+    def load_stage_image(cls, stage):
+        if stage not in cls.stage_images:
+            path = cls.stage_paths[stage - 1]
+            if cls.is_stage_animated(stage):
+                # The animated backgrounds are decoded once and then loaded from the frame cache on later launches
+                cls.prefetch_stage_image(stage)
+                AssetLoader.get(f"stage{stage}_image")
+                cls.stage_images[stage] = cls.get_frame_cache().load_animation(path)
+            else:
+                cls.stage_images[stage] = image(path)
+        return cls.stage_images[stage]
@@ -0,0 +1,50 @@
+import time
+
+
+# Class that keeps the characters typed between two game updates, with the time each one was typed, in preallocated
+# slots (the game consumes the whole burst at once on its next update and empties the queue)
+class InputQueue:
+    def __init__(self, capacity=256):
+        # Maximum number of characters kept until the next update (any further ones are dropped)
+        self.capacity = capacity
+        self.characters = [""] * capacity
+        self.timestamps = [0.0] * capacity
+        # Number of characters waiting
+        self.count = 0
+
+        # Counters of the characters processed and dropped, and of the time they waited to be processed (seconds)
+        self.processed_count = 0
+        self.dropped_count = 0
+        self.delay_total = 0.0
+        self.delay_max = 0.0
+
+    # Method to add a typed character, returning False if there was no room left for it
+    def push(self, character, timestamp=None):
+        if self.count == self.capacity:
+            self.dropped_count += 1
+            return False
+        self.characters[self.count] = character
+        self.timestamps[self.count] = time.perf_counter() if timestamp is None else timestamp
+        self.count += 1
+        return True
+
+    # Method to empty the queue once its characters were processed, keeping track of how long they waited
+    def consume(self):
+        now = time.perf_counter()
+        for i in range(self.count):
+            delay = now - self.timestamps[i]
+            self.delay_total += delay
+            if delay > self.delay_max:
+                self.delay_max = delay
+        self.processed_count += self.count
+        self.count = 0
+
+    # Method to drop the characters waiting without processing them
+    def clear(self):
+        self.count = 0
+
+    # Method to get the counters (delays in milliseconds)
+    def get_stats(self):
+        mean_delay = self.delay_total / self.processed_count if self.processed_count else 0.0
+        return {"processed": self.processed_count, "dropped": self.dropped_count,
+                "mean_delay": mean_delay * 1000, "max_delay": self.delay_max * 1000}
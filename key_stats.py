@@ -0,0 +1,168 @@
+import json
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Longest time between two keystrokes counted as typing (anything longer is a break, not a slow key), in seconds
+MAX_INTERVAL = 2.0
+# How much a key's error rate adds to its weight compared to how much slower than average it is typed
+ERROR_WEIGHT = 4.0
+
+
+# Class for the statistics of one letter or bigram, updated one keystroke at a time (Welford's algorithm keeps the
+# mean and variance of the intervals exact without storing them)
+class KeyStat:
+    def __init__(self, attempts=0, errors=0, count=0, mean=0.0, m2=0.0):
+        # Number of times the key was expected and how many of those times a wrong key was typed
+        self.attempts = attempts
+        self.errors = errors
+        # Number of timed keystrokes, their mean interval and the sum of squared differences from the mean
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    # Method to add a correct keystroke (with the time since the previous one when it was part of the same word)
+    def add_hit(self, interval):
+        self.attempts += 1
+        if interval is not None:
+            self.count += 1
+            delta = interval - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (interval - self.mean)
+
+    # Method to add a wrong keystroke
+    def add_miss(self):
+        self.attempts += 1
+        self.errors += 1
+
+    # Method to get the variance of the intervals
+    def get_variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    # Method to get the error rate, pulled towards zero while there are few attempts so a single slip doesn't make a
+    # key look weak
+    def get_error_rate(self):
+        return self.errors / (self.attempts + 2)
+
+    # Method to get the statistics as the list saved to the file
+    def to_list(self):
+        return [self.attempts, self.errors, self.count, self.mean, self.m2]
+
+
+# Class keeping the typing statistics of every letter and bigram, saved between sessions as the running sums
+# themselves (so loading them doesn't replay any keystrokes)
+class KeyStats:
+    def __init__(self, path=None):
+        # File the statistics are saved to (None to keep them for this session only)
+        self.path = path
+        # Dictionaries whose keys are the letters (and bigrams) and the values are their statistics
+        self.letters = {}
+        self.bigrams = {}
+        # Statistics of every keystroke together, which the letters' mean intervals are compared with
+        self.overall = KeyStat()
+        # Weights of the letters and bigrams, recomputed only after new keystrokes
+        self.weights = {}
+        self.weights_dirty = True
+        # Thread saving the statistics in the background (created by the first background save, with a single worker
+        # so the saves are written in order)
+        self.saver = None
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    # Method to add a correct keystroke (previous is the letter typed before it in the same word, and interval the
+    # time since it)
+    def record_hit(self, letter, previous=None, interval=None):
+        if interval is not None and interval > MAX_INTERVAL:
+            interval = None
+        self.letters.setdefault(letter, KeyStat()).add_hit(interval)
+        self.overall.add_hit(interval)
+        if previous is not None:
+            self.bigrams.setdefault(previous + letter, KeyStat()).add_hit(interval)
+        self.weights_dirty = True
+
+    # Method to add a wrong keystroke while the player was expected to type a letter
+    def record_miss(self, letter, previous=None):
+        self.letters.setdefault(letter, KeyStat()).add_miss()
+        self.overall.add_miss()
+        if previous is not None:
+            self.bigrams.setdefault(previous + letter, KeyStat()).add_miss()
+        self.weights_dirty = True
+
+    # Method to get how weak the player is at every letter and bigram: 0 for keys typed as fast as average without
+    # errors, growing with the error rate and with how much slower than average they're typed
+    def get_weights(self):
+        if self.weights_dirty:
+            self.weights = {}
+            for stats in (self.letters, self.bigrams):
+                for key, stat in stats.items():
+                    slowness = 0.0
+                    if stat.count and self.overall.mean > 0:
+                        slowness = max(0.0, stat.mean / self.overall.mean - 1)
+                    self.weights[key] = ERROR_WEIGHT * stat.get_error_rate() + slowness
+            self.weights_dirty = False
+        return self.weights
+
+    # Method to rate how much a word trains the player's weak keys (the summed weight of its letters and bigrams)
+    def rate_word(self, word):
+        weights = self.get_weights()
+        total = 0.0
+        for i, letter in enumerate(word):
+            total += weights.get(letter, 0.0)
+            if i:
+                total += weights.get(word[i - 1:i + 1], 0.0)
+        return total
+
+    # Method to check if any keystroke was recorded
+    def has_data(self):
+        return self.overall.attempts > 0
+
+    # Method to get the statistics as a dictionary of lists (what's saved, and what a recorded session starts with)
+    def get_data(self):
+        return {"overall": self.overall.to_list(),
+                "letters": {key: stat.to_list() for key, stat in self.letters.items()},
+                "bigrams": {key: stat.to_list() for key, stat in self.bigrams.items()}}
+
+    # Method to set the statistics from a dictionary made by get_data
+    def set_data(self, data):
+        self.overall = KeyStat(*data["overall"])
+        self.letters = {key: KeyStat(*values) for key, values in data["letters"].items()}
+        self.bigrams = {key: KeyStat(*values) for key, values in data["bigrams"].items()}
+        self.weights_dirty = True
+
+    # Method to read the saved statistics
+    def load(self):
+        try:
+            with open(self.path) as stats_file:
+                self.set_data(json.load(stats_file))
+        except (OSError, ValueError, KeyError, TypeError):
+            # Start over if the file is unreadable
+            self.overall = KeyStat()
+            self.letters = {}
+            self.bigrams = {}
+        self.weights_dirty = True
+
+    # Method to save the statistics on a background thread, so the game never waits for the disk (they're copied
+    # now, so the keystrokes recorded meanwhile aren't written half-way)
+    def save_in_background(self):
+        if self.path is None:
+            return
+        if self.saver is None:
+            self.saver = ThreadPoolExecutor(max_workers=1, thread_name_prefix="key-stats-saver")
+        self.saver.submit(self.write, self.get_data())
+
+    # Method to save the statistics, once the background saves still running are done
+    def save(self):
+        if self.path is None:
+            return
+        if self.saver is not None:
+            self.saver.shutdown(wait=True)
+            self.saver = None
+        self.write(self.get_data())
+
+    # Method to write statistics to the file (written to a temporary file first, so a crash never leaves half a file)
+    def write(self, data):
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w") as stats_file:
+            json.dump(data, stats_file)
+        os.replace(temporary_path, self.path)
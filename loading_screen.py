@@ -0,0 +1,65 @@
+import time
+
+from pyglet.shapes import Rectangle
+from pyglet.text import Label
+
+# Constants for colors
+WHITE = (255, 255, 255, 255)
+YELLOW = (255, 199, 95, 255)
+DARK_BLUE = (20, 20, 60, 255)
+
+
+# Class that shows a loading screen while assets load on worker threads, and moves on once they're loaded
+class LoadingScreen:
+    def __init__(self, window):
+        # Reference to the main window
+        self.window = window
+
+        # Label with the text and the bar showing how much of the assets already loaded
+        self.loading_label = Label("Loading", font_size=24, x=window.width // 2, y=window.height // 2 + 20,
+                                   anchor_x="center", color=WHITE)
+        self.bar_width = 300
+        self.bar_x = (window.width - self.bar_width) // 2
+        self.bar_background = Rectangle(self.bar_x, window.height // 2 - 20, self.bar_width, 12, color=DARK_BLUE)
+        self.bar = Rectangle(self.bar_x, window.height // 2 - 20, 0, 12, color=YELLOW)
+
+        # Functions to check whether the assets are loaded, to get the share loaded so far and to call once they are
+        self.is_ready = None
+        self.get_progress = None
+        self.on_ready = None
+        # Time the loading screen was shown
+        self.start_time = 0.0
+
+    # Method to show the loading screen until is_ready returns True, and then call on_ready
+    def show(self, is_ready, get_progress, on_ready):
+        self.is_ready = is_ready
+        self.get_progress = get_progress
+        self.on_ready = on_ready
+        self.start_time = time.perf_counter()
+        self.window.current_menu = self
+
+    # Method to check whether the assets are loaded (called every update while the loading screen is shown)
+    def update(self):
+        if self.on_ready is not None and self.is_ready():
+            on_ready = self.on_ready
+            self.is_ready = self.get_progress = self.on_ready = None
+            on_ready()
+
+    # Method to draw the label (with dots counting up, so the screen shows it's not stuck) and the progress bar
+    def draw(self):
+        dots = int((time.perf_counter() - self.start_time) * 3) % 4
+        text = "Loading" + "." * dots + " " * (3 - dots)
+        if self.loading_label.text != text:
+            self.loading_label.text = text
+        self.bar.width = self.bar_width * (self.get_progress() if self.get_progress is not None else 1.0)
+        self.loading_label.draw()
+        self.bar_background.draw()
+        self.bar.draw()
+
+    # Method to check whether the screen changes without any input (it does, until the assets are loaded)
+    def is_animated(self):
+        return True
+
+    # Method to handle key presses (they're ignored while loading)
+    def handle_key_press(self, symbol):
+        pass
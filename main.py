@@ -1,12 +1,43 @@
-from pyglet import clock
+import argparse
+import sys
+
 from pyglet.app import run
 
 from game_window import GameWindow
+from key_stats import KeyStats
+from session_log import SESSION_DIR
+from simulation_clock import SimulationClock
+from word_corpus import WordCorpus
 from word_manager import WordManager
 
 # Entry point to the program
 if __name__ == "__main__":
-    wordManager = WordManager(1)
-    mainWindow = GameWindow(wordManager, 1)
-    clock.schedule(mainWindow.on_update)
-    run()
+    parser = argparse.ArgumentParser(description="Space Words")
+    parser.add_argument("--fps", type=int, default=60, help="maximum frames drawn per second (0 for no cap)")
+    parser.add_argument("--tick-rate", type=int, default=60, help="game updates per second")
+    parser.add_argument("--wave", type=int, default=1, help="number of words falling at the same time")
+    parser.add_argument("--words", help="word file (one word per line) to use instead of the built-in word lists")
+    parser.add_argument("--music-budget", type=float, default=2,
+                        help="memory for background music decoded ahead of playback, in MiB")
+    args = parser.parse_args()
+
+    # Open the word file's index (compiled on the first launch with that file), before anything is shown
+    try:
+        wordCorpus = WordCorpus(args.words) if args.words else None
+    except (OSError, ValueError) as error:
+        sys.exit(f"Can't use the word file: {error}")
+    # Typing statistics of the player, carried over from the previous sessions
+    keyStats = KeyStats("key_stats.json")
+    wordManager = WordManager(1, corpus=wordCorpus, key_stats=keyStats)
+    # Every session played is recorded (the latest ones are kept, to be played again with replay.py)
+    mainWindow = GameWindow(wordManager, 1, wave_size=args.wave, music_budget=int(args.music_budget * 1024 * 1024),
+                            session_dir=SESSION_DIR)
+    # Step the game at a fixed rate and redraw the window at the capped frame rate
+    # (the clock does the redrawing, so the event loop isn't given a redraw interval of its own)
+    simulationClock = SimulationClock(mainWindow, step_rate=args.tick_rate, frame_rate=args.fps)
+    simulationClock.start()
+    try:
+        run(None)
+    finally:
+        # Write the end of the session being played, even if the game crashed
+        mainWindow.end_session()
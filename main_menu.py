@@ -1,8 +1,6 @@
-from pyglet.media import Player
 from pyglet.window import key
 from pyglet.text import Label
 from pyglet.shapes import Circle
-from audio_load import AudioLoad
 
 
 # Class that shows the main menu and handles logic related to navigating it
@@ -29,52 +27,17 @@ class MainMenu:
         self.circle_color = (0, 0, 255, 255)
         self.circle_x = self.labels[self.selected_option].x - 30
         self.circle_y = self.labels[self.selected_option].y
+        # The circle is created once and moved when the selection changes
+        self.circle = Circle(self.circle_x, self.circle_y, self.circle_radius, color=self.circle_color)
 
         # Call the update_selection method to highlight an initial option and also draw the blue circle
         self.update_selection(0)
 
-        # Load the menu sounds
-        AudioLoad.load_menu_sounds()
-        # Create players for the sounds
-        self.menu_click_player = Player()
-        self.menu_click_player.queue(AudioLoad.menu_click_sound)
-
-        self.menu_select_player = Player()
-        self.menu_select_player.queue(AudioLoad.menu_select_sound)
-
-        # Create a player for the BGM
-        self.menu_bgm_player = Player()
-        self.menu_bgm_player.queue(AudioLoad.menu_bgm)
-        # Make it loop
-        self.menu_bgm_player.loop = True
-        # Call the play_menu_bgm method to make the BGM player start playing
-        self.play_menu_bgm()
-
-    # Method to re-initialize the click sound player in order to re-use it multiple times
-    def get_menu_click_player(self):
-        # Create and return a new menu click sound player instance
-        self.menu_click_player = Player()
-        self.menu_click_player.queue(AudioLoad.menu_click_sound)
-        self.menu_click_player.seek(0)
-        return self.menu_click_player
-
-    # Method to re-initialize the selection sound player in order to re-use it multiple times
-    def get_menu_select_player(self):
-        # Create and return a new menu select sound player instance
-        self.menu_select_player = Player()
-        self.menu_select_player.queue(AudioLoad.menu_select_sound)
-        self.menu_select_player.seek(0)
-        return self.menu_select_player
-
-    # Method to make the BGM player start playing (useful for being called from the GameWindow class)
+    # Method to make the menu BGM start playing on the window's music player, crossfading from the stage's
+    # (useful for being called from the GameWindow class)
     def play_menu_bgm(self):
-        # Play the menu background music
-        self.menu_bgm_player.play()
-
-    # Method to make the BGM player stop playing (useful for being called from the GameWindow class)
-    def stop_menu_bgm(self):
-        # Pause the menu background music
-        self.menu_bgm_player.pause()
+        if self.window.music is not None:
+            self.window.music.play("menu")
 
     # Method to draw the option labels and the blue circle next to the selected one
     def draw(self):
@@ -83,8 +46,11 @@ class MainMenu:
             label.draw()
 
         # Draw blue circle next to the selected option
-        blue_circle = Circle(self.circle_x, self.circle_y, self.circle_radius, color=self.circle_color)
-        blue_circle.draw()
+        self.circle.draw()
+
+    # Method to check whether the menu changes without any input (it doesn't, so it's only redrawn after a key press)
+    def is_animated(self):
+        return False
 
     # Method to handle player input on the main menu
     def handle_key_press(self, symbol):
@@ -93,22 +59,26 @@ class MainMenu:
             # Show the stage select menu
             if self.selected_option == 0:
                 self.window.current_menu = self.window.stage_select_menu
-                self.get_menu_select_player().play()
+                # Start loading the selected stage while the player looks at it
+                self.window.stage_select_menu.prefetch_selected_stage()
+                self.window.sfx.play("select")
             # Show the highscore menu
             elif self.selected_option == 1:
                 self.window.current_menu = self.window.highscore_menu
-                self.get_menu_select_player().play()
-            # Exit the program
+                # Show the scores saved since the menu was last open
+                self.window.highscore_menu.update_stage_selection(0)
+                self.window.sfx.play("select")
+            # Exit the program (the same way closing the window does, so the scores still queued are committed)
             elif self.selected_option == 2:
-                self.window.close()
+                self.window.dispatch_event("on_close")
         # Update selection (move up)
         elif symbol == key.UP:
             self.update_selection(-1)
-            self.get_menu_click_player().play()
+            self.window.sfx.play("click")
         # Update selection (move down)
         elif symbol == key.DOWN:
             self.update_selection(1)
-            self.get_menu_click_player().play()
+            self.window.sfx.play("click")
 
     # Method to update the selected label depending on the player's input
     def update_selection(self, direction):
@@ -130,3 +100,4 @@ class MainMenu:
         selected_label = self.labels[self.selected_option]
         self.circle_x = selected_label.x - selected_label.content_width / 2 - self.circle_radius - 10
         self.circle_y = selected_label.y + 12
+        self.circle.position = (self.circle_x, self.circle_y)
@@ -0,0 +1,229 @@
+import math
+import threading
+import time
+from collections import deque
+
+from pyglet import clock
+from pyglet.media import Player
+from pyglet.media.codecs.base import AudioData, StreamingSource
+
+# Default memory allowed for the decoded music waiting to be played, shared by the two tracks playing during a
+# crossfade (1 MiB per track holds about six seconds of 44.1 kHz stereo)
+DEFAULT_BUDGET = 2 * 1024 * 1024
+# Size of the pieces the decoder thread decodes at a time
+CHUNK_BYTES = 16 * 1024
+# Longest time the audio thread waits for the decoder before playing silence instead
+UNDERRUN_WAIT = 0.05
+
+
+# Class that streams a track through a bounded buffer of decoded audio, kept filled by a decoder thread, and starts
+# the track over when it ends without the player noticing (so it loops without a gap, and only a track without any
+# audio ever ends)
+class BufferedStream(StreamingSource):
+    def __init__(self, source, buffer_bytes):
+        # Streaming source decoding the track, and the size of the buffer of decoded audio
+        self.source = source
+        self.buffer_bytes = max(buffer_bytes, CHUNK_BYTES)
+        self.audio_format = source.audio_format
+        self.video_format = None
+        # Decoded pieces of audio waiting to be played, their total size and the time of the next byte handed out
+        self.chunks = deque()
+        self.buffered = 0
+        self.timestamp = 0.0
+        # Number of times the audio thread found the buffer empty, and the largest size the buffer reached
+        self.underruns = 0
+        self.max_buffered = 0
+        # Condition shared by the decoder thread and the audio thread, and a lock held while the source is decoding
+        self.condition = threading.Condition()
+        self.decode_lock = threading.Lock()
+        self.closed = False
+        # Flag set by the decoder thread when the track turned out to have no audio to loop (the stream ends once
+        # the audio decoded before that was played)
+        self.ended = False
+
+        self.thread = threading.Thread(target=self.fill, name="music-decoder", daemon=True)
+        self.thread.start()
+
+    # Method run by the decoder thread: decode ahead until the buffer is full, then wait for the player to use it up
+    def fill(self):
+        while True:
+            with self.condition:
+                while self.buffered + CHUNK_BYTES > self.buffer_bytes and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+            with self.decode_lock:
+                audio_data = self.source.get_audio_data(CHUNK_BYTES)
+                if audio_data is None:
+                    # Start the track over, giving up if it has no audio at all
+                    self.source.seek(0)
+                    audio_data = self.source.get_audio_data(CHUNK_BYTES)
+                    if audio_data is None:
+                        with self.condition:
+                            self.ended = True
+                            self.closed = True
+                            self.condition.notify_all()
+                        return
+                data = audio_data.get_string_data()
+            with self.condition:
+                self.chunks.append(data)
+                self.buffered += len(data)
+                self.max_buffered = max(self.max_buffered, self.buffered)
+                self.condition.notify_all()
+
+    # Method called by the audio thread to get the next bytes of the track (silence if the decoder fell behind)
+    def get_audio_data(self, num_bytes, compensation_time=0.0):
+        pieces = []
+        size = 0
+        with self.condition:
+            if not self.chunks and not self.closed:
+                self.condition.wait(UNDERRUN_WAIT)
+            while self.chunks and size < num_bytes:
+                chunk = self.chunks.popleft()
+                # Put back what doesn't fit (cut on a whole sample)
+                room = num_bytes - size
+                room -= room % self.audio_format.bytes_per_sample
+                if len(chunk) > room:
+                    if room == 0:
+                        self.chunks.appendleft(chunk)
+                        break
+                    self.chunks.appendleft(chunk[room:])
+                    chunk = chunk[:room]
+                pieces.append(chunk)
+                size += len(chunk)
+            self.buffered -= size
+            self.condition.notify_all()
+
+        if not pieces:
+            if self.ended or (self.closed and self.source is None):
+                return None
+            self.underruns += 1
+            size = num_bytes - num_bytes % self.audio_format.bytes_per_sample
+            pieces.append(b"\0" * size)
+        duration = size / self.audio_format.bytes_per_second
+        audio_data = AudioData(b"".join(pieces), size, self.timestamp, duration, [])
+        self.timestamp += duration
+        return audio_data
+
+    # Method to move to a time in the track, dropping the audio decoded ahead
+    def seek(self, timestamp):
+        with self.decode_lock:
+            self.source.seek(timestamp)
+            with self.condition:
+                self.chunks.clear()
+                self.buffered = 0
+                self.timestamp = timestamp
+                self.condition.notify_all()
+
+    # Method to stop the decoder thread and release the decoder
+    def delete(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        with self.decode_lock:
+            # (only streaming sources hold a decoder to release)
+            if isinstance(self.source, StreamingSource):
+                self.source.delete()
+            self.source = None
+            self.chunks.clear()
+            self.buffered = 0
+
+
+# Class for one of the two players of the music player, with the track it's holding
+class MusicDeck:
+    def __init__(self):
+        # The player is created once and reused for every track
+        self.player = Player()
+        # Name of the track and its stream (None while the deck is empty)
+        self.track = None
+        self.stream = None
+
+    # Method to put a track on the deck, replacing the one it held
+    def load(self, track, stream):
+        old_stream = self.stream
+        self.player.queue(stream)
+        if old_stream is not None:
+            # Move the player on to the new stream, keeping its audio player
+            self.player.next_source()
+            old_stream.delete()
+        self.track = track
+        self.stream = stream
+
+
+# Class that plays the background music: tracks are streamed (never fully decoded in memory) and the change from one
+# track to another is a crossfade between two reused players, the track faded out being paused so it picks up from
+# where it left off if it comes back next
+class MusicPlayer:
+    def __init__(self, open_track, budget=DEFAULT_BUDGET, fade_time=1.0, volume=1.0):
+        # Function opening a track by its name as a streaming source
+        self.open_track = open_track
+        # Memory allowed for decoded audio (split between the two decks, so it doesn't depend on how many tracks
+        # there are)
+        self.budget = budget
+        # Length of a crossfade in seconds, and the music's volume
+        self.fade_time = fade_time
+        self.volume = volume
+        # The deck playing the current track and the other one (fading out, paused or empty)
+        self.current = MusicDeck()
+        self.other = MusicDeck()
+        # Progress of the crossfade from 0 to 1 (1 when there is none)
+        self.fade = 1.0
+        self.fade_start = 0.0
+
+    # Method to play a track, crossfading from the one playing (nothing happens if it's already the current track)
+    def play(self, track):
+        if self.current.track == track:
+            if not self.current.player.playing:
+                self.current.player.play()
+            return
+
+        # Swap the decks, reusing the other deck's stream if it holds the track (it resumes where it was paused)
+        self.current, self.other = self.other, self.current
+        if self.current.track != track:
+            self.current.load(track, BufferedStream(self.open_track(track), self.budget // 2))
+        self.current.player.volume = 0.0
+        self.current.player.play()
+
+        if self.other.track is None or not self.other.player.playing:
+            self.finish_fade()
+            return
+        if self.fade == 1.0:
+            clock.schedule_interval(self.update_fade, 1 / 60)
+        self.fade = 0.0
+        self.fade_start = time.perf_counter()
+
+    # Method to stop the music (the current track picks up from where it was when played again)
+    def pause(self):
+        self.finish_fade()
+        self.current.player.pause()
+
+    # Method to set the volumes of the two decks during a crossfade (equal power, so the loudness stays even)
+    def update_fade(self, dt=0.0):
+        self.fade = min(1.0, (time.perf_counter() - self.fade_start) / self.fade_time) if self.fade_time else 1.0
+        self.current.player.volume = self.volume * math.sin(self.fade * math.pi / 2)
+        self.other.player.volume = self.volume * math.cos(self.fade * math.pi / 2)
+        if self.fade == 1.0:
+            self.finish_fade()
+
+    # Method to end the crossfade, leaving only the current deck playing
+    def finish_fade(self):
+        clock.unschedule(self.update_fade)
+        self.fade = 1.0
+        self.current.player.volume = self.volume
+        self.other.player.pause()
+
+    # Method to get the number of bytes of decoded audio held by the decks right now
+    def get_buffered_bytes(self):
+        return sum(deck.stream.buffered for deck in (self.current, self.other) if deck.stream is not None)
+
+    # Method to stop the players and the decoder threads
+    def delete(self):
+        clock.unschedule(self.update_fade)
+        for deck in (self.current, self.other):
+            deck.player.pause()
+            deck.player.delete()
+            if deck.stream is not None:
+                deck.stream.delete()
+                deck.stream = None
+            deck.track = None
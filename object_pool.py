@@ -0,0 +1,41 @@
+# Class that keeps released objects around to hand them out again instead of creating new ones
+# (counts how many requests were served with a reused object (hits), how many needed a new one (misses)
+# and how many objects are currently handed out (live))
+class ObjectPool:
+    def __init__(self, create, reuse=None, retire=None):
+        # Function called with the acquire arguments to create a new object
+        self.create = create
+        # Function called with a released object and the acquire arguments to prepare it for reuse
+        self.reuse = reuse
+        # Function called with an object when it's released (e.g. to hide it)
+        self.retire = retire
+        # Released objects waiting to be reused
+        self.free_objects = []
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.live = 0
+
+    # Method to get an object, reusing a released one when there is any
+    def acquire(self, *args):
+        if self.free_objects:
+            pooled_object = self.free_objects.pop()
+            if self.reuse is not None:
+                self.reuse(pooled_object, *args)
+            self.hits += 1
+        else:
+            pooled_object = self.create(*args)
+            self.misses += 1
+        self.live += 1
+        return pooled_object
+
+    # Method to give an object back to the pool
+    def release(self, pooled_object):
+        if self.retire is not None:
+            self.retire(pooled_object)
+        self.free_objects.append(pooled_object)
+        self.live -= 1
+
+    # Method to get the pool's counters
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses, "live": self.live, "free": len(self.free_objects)}
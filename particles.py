@@ -1,81 +1,122 @@
-from pyglet.shapes import Star
-import random
+import numpy as np
+
+from shape_buffers import ShapeBuffer, star_vertices
 
 
 # Class for creating and animating particle effects
-class Particles:
-    def __init__(self, x, y):
-        # Create a list of Rectangle shapes representing particles
-        self.particles = []
-        # Initial y-coordinate for the particles
-        self.y = y + 50
-        # Animation time parameter
-        self.animation_time = -2
-        # X and Y directions for each particle
-        self.directions_x = []
-        self.directions_y = []
-        # Speed for each particle
-        self.speeds = []
-
-        # Create particles with random sizes, rotation angle, and colors
-        for _ in range(3):
-            outer_radius = random.randint(5, 15)
-            inner_radius = outer_radius * 0.5
-            color = self.random_color()
-            rotation = random.uniform(0, 360)
-            particle = Star(x, y, outer_radius, inner_radius, color=color, num_spikes=5, rotation=rotation)
-            self.particles.append(particle)
-
-            # Add corresponding random values for direction and speed
-            self.directions_x.append(random.uniform(-10, 10))
-            self.directions_y.append(random.uniform(5, 15))
-            self.speeds.append(random.uniform(2, 5))
-
-    # Method for drawing each particle on the screen
-    def draw(self):
-        for particle in self.particles:
-            particle.draw()
+# (a fixed number of particle slots whose state is kept in NumPy arrays, so every live particle is updated with one
+# vectorized step per frame and drawn from a single vertex list - slots of dead particles get reused by new ones)
+class ParticlePool:
+    def __init__(self, capacity=4096, batch=None, group=None, width=800, rng=None):
+        # Maximum number of particles alive at the same time
+        self.capacity = capacity
+        # Particles leaving the screen further than this are removed
+        self.max_x = width + 10
+        # Random number generator for the particle properties
+        self.rng = rng if rng is not None else np.random.default_rng()
+        # Number of particles created with each burst
+        self.burst_size = 3
+
+        # Position of each particle (and where it was before the last update, to draw it between the two), plus the
+        # height it falls from (50 pixels above where its burst started)
+        self.positions = np.zeros((capacity, 2), dtype=np.float32)
+        self.previous_positions = np.zeros((capacity, 2), dtype=np.float32)
+        self.start_y = np.zeros(capacity, dtype=np.float32)
+        # X and Y directions, speed and animation time (which goes from -2 upwards and makes it fall) of each particle
+        self.directions = np.zeros((capacity, 2), dtype=np.float32)
+        self.speeds = np.zeros(capacity, dtype=np.float32)
+        self.animation_times = np.zeros(capacity, dtype=np.float32)
+        # Flags for the slots holding a live particle
+        self.alive = np.zeros(capacity, dtype=bool)
+
+        # Stack of free slots (the first free_count entries are free) used to recycle dead particles' slots
+        self.free_slots = np.arange(capacity - 1, -1, -1)
+        self.free_count = capacity
+        # Number of live particles, of particles placed into a free slot (hits) and of particles dropped because
+        # every slot was taken (misses)
+        self.live_count = 0
+        self.hits = 0
+        self.misses = 0
+
+        # Every particle is a five-spiked star drawn from the same vertex list
+        self.shapes = ShapeBuffer(star_vertices(5), capacity, batch=batch, group=group)
 
-    # Method for updating the animation time
+    # Method for creating a burst of particles at the given position (or one burst at each of several positions, when
+    # given arrays), with random sizes, rotations and colors
+    def spawn(self, x, y):
+        bursts = np.repeat(np.column_stack((np.atleast_1d(x), np.atleast_1d(y))), self.burst_size, axis=0)
+        count = min(len(bursts), self.free_count)
+        self.hits += count
+        self.misses += len(bursts) - count
+        if count == 0:
+            return
+        self.free_count -= count
+        slots = self.free_slots[self.free_count:self.free_count + count].copy()
+
+        self.positions[slots] = bursts[:count]
+        self.previous_positions[slots] = bursts[:count]
+        self.start_y[slots] = bursts[:count, 1] + 50
+        self.directions[slots, 0] = self.rng.uniform(-10, 10, count)
+        self.directions[slots, 1] = self.rng.uniform(5, 15, count)
+        self.speeds[slots] = self.rng.uniform(2, 5, count)
+        self.animation_times[slots] = -2
+        self.alive[slots] = True
+        self.live_count += count
+
+        # Outer radius between 5 and 15 (the inner radius is half of it), random opaque color and rotation
+        outer_radii = self.rng.integers(5, 16, count)
+        colors = np.empty((count, 4), dtype=np.uint8)
+        colors[:, :3] = self.rng.integers(0, 256, (count, 3))
+        colors[:, 3] = 255
+        self.shapes.set_shapes(slots, outer_radii, colors, self.rng.uniform(0, 360, count))
+        self.shapes.set_translations(self.positions[slots], slots)
+
+    # Method for moving every live particle and removing the ones that left the screen
     def update(self, elapsed_time):
-        self.animation_time += elapsed_time * 20
-        # List to store indices of particles to be removed
-        particles_to_remove = []
-
-        # Update the position of each particle based on animation time, direction, and speed
-        for i, (particle, direction_x, direction_y, speed) in enumerate(
-            zip(self.particles, self.directions_x, self.directions_y, self.speeds)
-        ):
-            # Random motion
-            particle.y = self.y - self.animation_time ** 2 * speed + direction_y * elapsed_time * 10
-            # Update the x-coordinate based on the particle's direction and the elapsed time
-            particle.x += direction_x * elapsed_time * 10
-
-            # Check if the particle is out of bounds
-            if self.border_collision_check(particle):
-                particles_to_remove.append(i)
-
-        # Remove particles that are out of bounds
-        for index in reversed(particles_to_remove):
-            del self.particles[index]
-            del self.directions_x[index]
-            del self.directions_y[index]
-            del self.speeds[index]
-
-    # Method to check if a particle is out of the visible bounds of the window
-    def border_collision_check(self, particle):
-        return particle.y < -10 or particle.x < -10 or particle.x > 810
-
-    # Generator function for generating a random RGBA color
-    def random_color_generator(self):
-        while True:
-            yield (
-                random.randint(0, 255),
-                random.randint(0, 255),
-                random.randint(0, 255),
-                255  # 255 for full opacity
-            )
-
-    # Method for getting the next random color from the generator
-    def random_color(self):
-        return next(self.random_color_generator())
+        if self.live_count == 0:
+            return
+        alive = self.alive
+        self.previous_positions[:] = self.positions
+
+        # Random motion: the particles rise and then fall faster and faster, drifting sideways
+        self.animation_times[alive] += elapsed_time * 20
+        self.positions[alive, 1] = (self.start_y[alive] - self.animation_times[alive] ** 2 * self.speeds[alive]
+                                    + self.directions[alive, 1] * elapsed_time * 10)
+        self.positions[alive, 0] += self.directions[alive, 0] * elapsed_time * 10
+
+        # Check which particles are out of the visible bounds of the window and give their slots back
+        x = self.positions[:, 0]
+        out_of_bounds = alive & ((self.positions[:, 1] < -10) | (x < -10) | (x > self.max_x))
+        if out_of_bounds.any():
+            self.release(np.flatnonzero(out_of_bounds))
+
+    # Method for placing the particles between their previous and current positions (0 is the previous update and 1
+    # the last one)
+    def interpolate(self, alpha):
+        if self.live_count:
+            self.shapes.set_translations(self.previous_positions + (self.positions - self.previous_positions) * alpha)
+
+    # Method for giving the slots of some particles back to the pool
+    def release(self, slots):
+        self.alive[slots] = False
+        self.shapes.hide(slots)
+        self.free_slots[self.free_count:self.free_count + len(slots)] = slots
+        self.free_count += len(slots)
+        self.live_count -= len(slots)
+
+    # Method for getting the pool's counters
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses, "live": self.live_count, "free": self.free_count}
+
+    # Method for removing every particle
+    def clear(self):
+        if self.live_count:
+            self.release(np.flatnonzero(self.alive))
+
+    # Method for drawing the particles on their own (for when the batch they belong to isn't drawn)
+    def draw(self):
+        self.shapes.draw()
+
+    # Method for removing the particles from video memory
+    def delete(self):
+        self.shapes.delete()
@@ -0,0 +1,46 @@
+# Class for one node of the prefix index: the letters that can follow its prefix, and the words starting with it
+class PrefixNode:
+    def __init__(self):
+        # Dictionary whose keys are the next letters and the values are their nodes
+        self.children = {}
+        # Ids of the words starting with this node's prefix (a dictionary is used as an ordered set, so the word
+        # added first comes first)
+        self.word_ids = {}
+
+
+# Class that indexes the words on screen by their prefixes (a trie), so the word a typed prefix belongs to is found
+# by walking down one node per letter, however many words there are
+class PrefixIndex:
+    def __init__(self):
+        self.root = PrefixNode()
+        # Number of words in the index
+        self.count = 0
+
+    # Method to add a word to the index
+    def add(self, word, word_id):
+        node = self.root
+        for letter in word:
+            node = node.children.setdefault(letter, PrefixNode())
+            node.word_ids[word_id] = None
+        self.count += 1
+
+    # Method to remove a word from the index, dropping the nodes no other word uses
+    def remove(self, word, word_id):
+        node = self.root
+        for letter in word:
+            child = node.children[letter]
+            del child.word_ids[word_id]
+            if not child.word_ids:
+                del node.children[letter]
+                break
+            node = child
+        self.count -= 1
+
+    # Method to get the id of the first word added that starts with a prefix (None if there is none)
+    def find(self, prefix):
+        node = self.root
+        for letter in prefix:
+            node = node.children.get(letter)
+            if node is None:
+                return None
+        return next(iter(node.word_ids), None)
@@ -0,0 +1,58 @@
+from pyglet.graphics import Batch, Group
+from pyglet.math import Mat4, Vec3
+
+
+# Group for one layer of the batch, which can shift its layer horizontally (through the window's view matrix) and
+# tells the frame profiler (when there is one) that its layer was drawn
+# (the batch unsets a group right after drawing everything in it, so the time since the previous layer is its own)
+class LayerGroup(Group):
+    def __init__(self, order, phase, window=None):
+        super().__init__(order=order)
+        # Name of the profiler phase the layer's draw time goes to
+        self.phase = phase
+        self.profiler = None
+        # Window whose view matrix is shifted, the horizontal shift in pixels, and the view to restore afterwards
+        self.window = window
+        self.offset_x = 0
+        self.saved_view = None
+
+    def set_state(self):
+        if self.offset_x:
+            self.saved_view = self.window.view
+            self.window.view = self.saved_view @ Mat4.from_translation(Vec3(self.offset_x, 0, 0))
+
+    def unset_state(self):
+        if self.saved_view is not None:
+            self.window.view = self.saved_view
+            self.saved_view = None
+        if self.profiler is not None:
+            self.profiler.mark(self.phase)
+
+
+# Class that holds every in-game visual in a single batch, split into ordered layers
+# (the batch draws the groups from the lowest order to the highest, so later layers end up on top)
+class RenderLayers:
+    def __init__(self, window=None):
+        # Batch shared by all the in-game shapes, sprites and labels
+        self.batch = Batch()
+
+        # Ordered groups, from the back of the screen to the front
+        self.background = LayerGroup(0, "draw_background")
+        self.dust = LayerGroup(1, "draw_dust")
+        self.limit_line = LayerGroup(2, "draw_limit_line")
+        # (the words can be shifted to draw them between two game steps)
+        self.words = LayerGroup(3, "draw_words", window)
+        self.particles = LayerGroup(4, "draw_particles")
+        self.hud = LayerGroup(5, "draw_hud")
+        # Pause labels, drawn on top of everything else
+        self.overlay = LayerGroup(6, "draw_hud")
+        self.groups = [self.background, self.dust, self.limit_line, self.words, self.particles, self.hud, self.overlay]
+
+    # Method to time the draw of each layer with a frame profiler
+    def set_profiler(self, profiler):
+        for group in self.groups:
+            group.profiler = profiler
+
+    # Method to draw every layer with a single batched call
+    def draw(self):
+        self.batch.draw()
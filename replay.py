@@ -0,0 +1,57 @@
+import argparse
+import sys
+import time
+
+import pyglet
+
+# Headless mode has to be chosen before any window module is imported
+if "--headless" in sys.argv:
+    pyglet.options["headless"] = True
+
+from game_window import GameWindow
+from key_stats import KeyStats
+from session_log import SessionLog, SessionReplay
+from word_corpus import WordCorpus
+from word_manager import WordManager
+
+# Entry point of the replay runner: plays a recorded session again through the game's updates, as fast as they run
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Space Words session replay")
+    parser.add_argument("session", help="session file recorded by the game (in the sessions folder)")
+    parser.add_argument("--headless", action="store_true", help="render offscreen without a display")
+    parser.add_argument("--draw", action="store_true", help="draw every update, as the game would")
+    parser.add_argument("--words", help="word file the session was played with, if it wasn't the built-in word lists")
+    args = parser.parse_args()
+
+    log = SessionLog(args.session)
+    # The session has to be replayed with the words it was played with
+    wordCorpus = WordCorpus(args.words) if args.words else None
+    if log.word_file_hash != (wordCorpus.source_hash if wordCorpus is not None else bytes(20)):
+        sys.exit("The session was played with another word file (pass it with --words)")
+    # Typing statistics the session started with (kept in memory, so the player's own aren't touched)
+    keyStats = None
+    if log.key_stats is not None:
+        keyStats = KeyStats()
+        keyStats.set_data(log.key_stats)
+
+    window = GameWindow(WordManager(log.stage, corpus=wordCorpus, key_stats=keyStats), log.stage, visible=False,
+                        audio=False, database=False)
+    replay = SessionReplay(window, log)
+    start_time = time.perf_counter()
+    replay.run(draw=args.draw)
+    elapsed_time = time.perf_counter() - start_time
+
+    game_time = window.session_steps * log.step_time
+    print(f"Stage {log.stage}, seed {log.seed}: {len(log.events)} events, {window.session_steps} updates "
+          f"({game_time:.1f} s of game time) replayed in {elapsed_time:.2f} s "
+          f"({game_time / elapsed_time if elapsed_time else 0:.0f}x real time)")
+    print(f"Score {window.score}, health {window.health}")
+    matches = replay.matches()
+    if matches is None:
+        print("The recording was cut short, so there's no final state to compare with")
+    elif matches:
+        print("Matches the recorded session")
+    else:
+        print(f"Doesn't match the recorded session (score {log.score}, health {log.health} after {log.steps} updates)")
+    window.close()
+    sys.exit(0 if matches is not False else 1)
@@ -0,0 +1,216 @@
+import json
+import os
+import struct
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+# Folder where the sessions are recorded, and how many of the latest ones are kept there
+SESSION_DIR = "sessions"
+MAX_SESSIONS = 20
+# Header of a session file: magic bytes, format version, seed of the session's random number generators, stage, wave
+# size, elapsed time of every game update, hash of the word file (zeros for the built-in word lists) and length of the
+# typing statistics the session started with (followed by them as JSON, empty if there were none)
+HEADER = struct.Struct("<4sIQBHd20sI")
+MAGIC = b"SWSL"
+VERSION = 1
+# Event of a session: number of game updates run before it, kind, character typed (0 for a pause) and the time it
+# was typed (the game's clock, kept as is so the typing statistics get the same intervals when replayed)
+EVENT = struct.Struct("<IBId")
+KEY = 0
+PAUSE = 1
+# Footer written when the session ends: magic bytes, number of game updates run, final score and health (a session
+# cut short by a crash has none)
+FOOTER = struct.Struct("<4sIiB")
+FOOTER_MAGIC = b"SWSE"
+# Number of game updates (a second at 60 updates per second) the recorded events are kept in memory before they're
+# handed to the writer thread, which appends them to the session file (a crash loses at most the ones not handed yet)
+CHUNK_STEPS = 60
+
+
+# Class that records a session (a stage played from its start until the game is reset) as a compact binary log:
+# everything random in the game comes from the session's seed, so the keystrokes and pauses with the update they
+# arrived before are all it takes to play the session again - the file is only ever touched by a writer thread shared
+# by every recorder, so the game never waits for the disk
+class SessionRecorder:
+    # Writer thread (created when the first session file is written, with a single worker so the writes of every
+    # session are run in order)
+    writer = None
+
+    def __init__(self, seed, stage, wave_size, key_stats=None, word_file_hash=None, session_dir=None):
+        self.seed = seed
+        self.stage = stage
+        self.wave_size = wave_size
+        # Typing statistics the session started with, as JSON (the word choice depends on them)
+        self.key_stats = json.dumps(key_stats).encode() if key_stats is not None else b""
+        self.word_file_hash = word_file_hash or bytes(20)
+        # Elapsed time of every game update (known once the first update runs)
+        self.step_time = 0.0
+        # Events not handed to the writer thread yet, the update they were last handed on (None until the header
+        # is) and the number recorded so far
+        self.events = bytearray()
+        self.handed_step = None
+        self.event_count = 0
+        # Folder and file the session is written to (None to keep it in memory only), and the file once the writer
+        # thread opened it
+        self.session_dir = session_dir
+        self.path = None
+        self.file = None
+        if session_dir is not None:
+            self.path = os.path.join(session_dir, f"session-{time.strftime('%Y%m%d-%H%M%S')}-stage{stage}-"
+                                                  f"{seed & 0xffffffff:08x}.swl")
+
+    # Class method to run a write on the writer thread
+    @classmethod
+    def submit(cls, function, *args):
+        if cls.writer is None:
+            cls.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-writer")
+        cls.writer.submit(function, *args)
+
+    # Class method to wait for the writes still queued and stop the writer thread
+    @classmethod
+    def shutdown(cls):
+        if cls.writer is not None:
+            cls.writer.shutdown(wait=True)
+            cls.writer = None
+
+    # Method to delete the oldest recorded sessions, keeping the latest ones
+    @staticmethod
+    def remove_old_sessions(session_dir):
+        names = sorted(name for name in os.listdir(session_dir) if name.endswith(".swl"))
+        for name in names[:max(0, len(names) - MAX_SESSIONS)]:
+            os.remove(os.path.join(session_dir, name))
+
+    # Method to record a typed character
+    def record_key(self, step, character, timestamp):
+        self.record(step, KEY, ord(character), timestamp)
+
+    # Method to record the game being paused or unpaused
+    def record_pause(self, step, timestamp):
+        self.record(step, PAUSE, 0, timestamp)
+
+    # Method to add an event (kept in memory until it's handed to the writer thread)
+    def record(self, step, kind, character, timestamp):
+        self.event_count += 1
+        if self.path is not None:
+            self.events += EVENT.pack(step, kind, character, timestamp)
+
+    # Method run on every game update: the first one gives the elapsed time of the updates, so the header can be
+    # handed to the writer thread with the events recorded so far, and then the events are handed every CHUNK_STEPS
+    # updates
+    def update(self, step, step_time):
+        if self.handed_step is None:
+            self.step_time = step_time
+            if self.path is not None:
+                self.submit(self.write, HEADER.pack(MAGIC, VERSION, self.seed, self.stage, self.wave_size,
+                                                    self.step_time, self.word_file_hash, len(self.key_stats))
+                            + self.key_stats + self.take_events())
+            self.handed_step = step
+        elif step - self.handed_step >= CHUNK_STEPS:
+            if self.events:
+                self.submit(self.write, self.take_events())
+            self.handed_step = step
+
+    # Method to take the events not handed to the writer thread yet
+    def take_events(self):
+        events = bytes(self.events)
+        self.events.clear()
+        return events
+
+    # Method to end the session: the rest of the events and the footer are handed to the writer thread, which then
+    # closes the file and deletes the oldest sessions
+    def finish(self, steps, score, health):
+        if self.path is None:
+            return
+        self.update(steps, self.step_time)
+        self.submit(self.write_last, self.take_events() + FOOTER.pack(FOOTER_MAGIC, steps, score, max(0, health)))
+
+    # Method run on the writer thread to append to the session file, opening it the first time (written through to
+    # the operating system right away, so the events handed over survive the game crashing)
+    def write(self, data):
+        if self.file is None:
+            os.makedirs(self.session_dir, exist_ok=True)
+            self.file = open(self.path, "wb")
+        self.file.write(data)
+        self.file.flush()
+
+    # Method run on the writer thread to append the end of the session, close the file and delete the oldest sessions
+    def write_last(self, data):
+        self.write(data)
+        self.file.close()
+        self.file = None
+        self.remove_old_sessions(self.session_dir)
+
+
+# Class that reads a recorded session
+class SessionLog:
+    def __init__(self, path):
+        with open(path, "rb") as session_file:
+            data = session_file.read()
+        (magic, version, self.seed, self.stage, self.wave_size, self.step_time, self.word_file_hash,
+         key_stats_length) = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} isn't a session recorded by this version of the game")
+        offset = HEADER.size + key_stats_length
+        key_stats = data[HEADER.size:offset]
+        # Typing statistics the session started with (None if the game had none)
+        self.key_stats = json.loads(key_stats) if key_stats else None
+
+        # Final number of updates, score and health (None if the session was cut short)
+        end = len(data)
+        self.steps = self.score = self.health = None
+        if end - offset >= FOOTER.size and data[end - FOOTER.size:end - FOOTER.size + 4] == FOOTER_MAGIC:
+            end -= FOOTER.size
+            _, self.steps, self.score, self.health = FOOTER.unpack_from(data, end)
+        # Events as (step, kind, character, timestamp) tuples (a half-written last event is left out)
+        end -= (end - offset) % EVENT.size
+        self.events = list(EVENT.iter_unpack(data[offset:end]))
+        if self.steps is None:
+            self.steps = self.events[-1][0] if self.events else 0
+
+
+# Class that plays a recorded session again on a game window, through the same updates as the game (as fast as they
+# run, not at the game's pace)
+class SessionReplay:
+    def __init__(self, window, log):
+        self.window = window
+        self.log = log
+        # Index of the next event to replay
+        self.next_event = 0
+
+    # Method to start the session on the window, with the recorded stage, wave size and seed
+    def start(self):
+        self.window.wave_size = self.log.wave_size
+        self.window.update_stage(self.log.stage)
+        self.window.begin_session(self.log.seed)
+
+    # Method to replay the events due before the next update and run it, returning False once the session is over
+    def step(self):
+        window = self.window
+        events = self.log.events
+        while self.next_event < len(events) and events[self.next_event][0] <= window.session_steps:
+            step, kind, character, timestamp = events[self.next_event]
+            if kind == KEY:
+                window.push_character(chr(character), timestamp)
+            elif kind == PAUSE:
+                window.toggle_pause()
+            self.next_event += 1
+        # (no update runs while paused, so a session left paused is over)
+        if window.paused or (window.session_steps >= self.log.steps and self.next_event == len(events)):
+            return False
+        window.on_update(self.log.step_time)
+        return True
+
+    # Method to replay the whole session, drawing every update if asked to
+    def run(self, draw=False):
+        self.start()
+        while self.step():
+            if draw:
+                self.window.on_draw()
+
+    # Method to check whether the replay ended the way the recorded session did (None if the recording has no end)
+    def matches(self):
+        if self.log.score is None:
+            return None
+        return (self.window.session_steps == self.log.steps and self.window.score == self.log.score
+                and max(0, self.window.health) == self.log.health)
@@ -0,0 +1,117 @@
+import time
+
+from pyglet.media import Player
+
+# Default number of voices (sound effects that can play at the same time)
+DEFAULT_VOICES = 8
+
+
+# Class for one of the mixer's voices: a player kept for the whole session that holds one sound at a time and is only
+# rewound when the sound ends (a plain player drops its audio player once its playlist runs out, so it would have to
+# allocate a new one for the next sound)
+class SfxVoice(Player):
+    def __init__(self):
+        super().__init__()
+        # Sound the voice holds (None while it's empty) and the time it last started playing it
+        self.sound = None
+        self.start_time = 0.0
+
+    # Method to put a sound on the voice, replacing the one it held (the audio player is kept if the formats match)
+    def load(self, sound):
+        had_source = self.source is not None
+        self.queue(sound)
+        if had_source:
+            self.next_source()
+        self.sound = sound
+
+    # Method to create the audio player right away instead of on the first play (it's started and stopped at volume 0)
+    def prepare(self):
+        volume = self.volume
+        self.volume = 0.0
+        self.play()
+        self.pause()
+        self.seek(0.0)
+        self.volume = volume
+
+    # Method to play a sound from its start
+    def trigger(self, sound, now):
+        if self.sound is not sound:
+            self.load(sound)
+        else:
+            self.seek(0.0)
+        self.start_time = now
+        self.play()
+
+    # Method to check whether the voice is still playing its sound (audio drivers can report the end late, or never)
+    def is_busy(self, now):
+        return self.playing and now - self.start_time < self.sound.duration
+
+    # Event handler called when the sound ran out: the voice keeps it, and its audio player, for the next play
+    def on_eos(self):
+        self.pause()
+
+
+# Class that plays the sound effects of the menus and the game through a fixed pool of voices: the sounds are decoded
+# once, and playing one reuses a voice that's done (preferably one already holding it, which only has to be rewound),
+# cutting off the oldest sound if every voice is busy
+class SfxMixer:
+    def __init__(self, voices=DEFAULT_VOICES, volume=1.0):
+        # Voices created once for the whole session
+        self.voices = [SfxVoice() for _ in range(voices)]
+        for voice in self.voices:
+            voice.volume = volume
+        # Dictionary whose keys are the names of the sounds and the values are their decoded (static) sources
+        self.sounds = {}
+        # Counters of the sounds played, the ones that had to replace the sound of a voice and the ones that cut off
+        # an older sound because every voice was busy
+        self.plays = 0
+        self.swaps = 0
+        self.steals = 0
+
+    # Method to add a decoded sound, giving it a voice of its own while some voice is still empty
+    def add(self, name, sound):
+        self.sounds[name] = sound
+        for voice in self.voices:
+            if voice.sound is None:
+                voice.load(sound)
+                voice.prepare()
+                break
+
+    # Method to play a sound by its name (sounds that aren't loaded yet are skipped)
+    def play(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            return
+        now = time.perf_counter()
+        free = None
+        oldest = None
+        for voice in self.voices:
+            if voice.is_busy(now):
+                if oldest is None or voice.start_time < oldest.start_time:
+                    oldest = voice
+            elif voice.sound is sound:
+                free = voice
+                break
+            elif free is None:
+                free = voice
+
+        voice = free
+        if voice is None:
+            voice = oldest
+            self.steals += 1
+        if voice.sound is not sound:
+            self.swaps += 1
+        self.plays += 1
+        voice.trigger(sound, now)
+
+    # Method to get the counters of the voice pool (like the object pools', "hits" are sounds played on a voice that
+    # already held them)
+    def get_stats(self):
+        return {"plays": self.plays, "hits": self.plays - self.swaps, "swaps": self.swaps, "steals": self.steals,
+                "voices": len(self.voices)}
+
+    # Method to stop the voices and release their audio players
+    def delete(self):
+        for voice in self.voices:
+            voice.pause()
+            voice.delete()
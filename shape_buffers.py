@@ -0,0 +1,176 @@
+import math
+
+import numpy as np
+from pyglet.gl import (GL_BLEND, GL_ONE_MINUS_SRC_ALPHA, GL_POINTS, GL_SRC_ALPHA, GL_TRIANGLES, glBlendFunc, glDisable,
+                       glEnable, glPointSize)
+from pyglet.graphics import Group
+from pyglet.shapes import get_default_shader
+
+
+# Group that sets up the same shader program and blending as pyglet's own shapes
+class ShapeBufferGroup(Group):
+    def __init__(self, program, parent=None):
+        super().__init__(parent=parent)
+        self.program = program
+
+    def set_state(self):
+        self.program.bind()
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+
+    def unset_state(self):
+        glDisable(GL_BLEND)
+        self.program.unbind()
+
+
+# Group that also sets the size of the points drawn (groups of different sizes must not share a batch's vertex domain,
+# so the size is part of the group's identity)
+class PointBufferGroup(ShapeBufferGroup):
+    def __init__(self, program, point_size, parent=None):
+        super().__init__(program, parent=parent)
+        self.point_size = point_size
+
+    def set_state(self):
+        super().set_state()
+        glPointSize(self.point_size)
+
+    def unset_state(self):
+        glPointSize(1)
+        super().unset_state()
+
+    def __eq__(self, other):
+        return super().__eq__(other) and self.point_size == other.point_size
+
+    def __hash__(self):
+        return hash((self.order, self.parent, self.point_size))
+
+
+# Function returning the triangles of a star centered on the origin with an outer radius of 1
+# (same layout as pyglet.shapes.Star: one triangle from the center to every pair of neighbouring points)
+def star_vertices(num_spikes, inner_ratio=0.5):
+    d_theta = math.pi / num_spikes
+    points = []
+    for i in range(num_spikes * 2):
+        radius = 1.0 if i % 2 == 0 else inner_ratio
+        points.append((radius * math.cos(i * d_theta), radius * math.sin(i * d_theta)))
+
+    vertices = []
+    for i, point in enumerate(points):
+        vertices.extend(((0.0, 0.0), points[i - 1], point))
+    return np.array(vertices, dtype=np.float32)
+
+
+# Function returning the two triangles of a 1x1 square whose bottom left corner is on the origin
+# (like pyglet.shapes.Rectangle, which is anchored on that corner)
+def rectangle_vertices():
+    return np.array([(0, 0), (1, 0), (1, 1), (0, 0), (1, 1), (0, 1)], dtype=np.float32)
+
+
+# Function returning the triangles of a circle centered on the origin with a radius of 1
+def circle_vertices(segments=12):
+    vertices = []
+    for i in range(segments):
+        start_angle = 2 * math.pi * i / segments
+        end_angle = 2 * math.pi * (i + 1) / segments
+        vertices.extend(((0.0, 0.0), (math.cos(start_angle), math.sin(start_angle)),
+                         (math.cos(end_angle), math.sin(end_angle))))
+    return np.array(vertices, dtype=np.float32)
+
+
+# Class that draws a fixed number of copies of the same shape from a single vertex list, with the position, size,
+# color and rotation of every copy written from NumPy arrays (hidden copies are collapsed into a point)
+class ShapeBuffer:
+    def __init__(self, template, capacity, batch=None, group=None):
+        # Vertices of one shape, and how many shapes the buffer holds
+        self.template = template
+        self.capacity = capacity
+        self.vertices_per_shape = len(template)
+
+        program = get_default_shader()
+        self.group = ShapeBufferGroup(program, group)
+        self.vertex_list = program.vertex_list(capacity * self.vertices_per_shape, GL_TRIANGLES, batch, self.group,
+                                               position="f", colors="Bn", rotation="f", translation="f")
+
+        # Start with every shape hidden and white
+        self.attribute("position")[:] = 0
+        self.attribute("translation")[:] = 0
+        self.attribute("rotation")[:] = 0
+        self.attribute("colors")[:] = 255
+
+    # Method to get a vertex attribute as a NumPy view (shape, vertex, components) of the vertex list's memory
+    # (getting the attribute marks it as changed, so whatever is written to the view is uploaded before drawing)
+    def attribute(self, name):
+        array = np.ctypeslib.as_array(getattr(self.vertex_list, name))
+        return array.reshape(self.capacity, self.vertices_per_shape, -1)
+
+    # Method to set the size, color and rotation of some shapes (sizes are a scale, or a (width, height) pair)
+    def set_shapes(self, indices, sizes, colors, rotations):
+        sizes = np.asarray(sizes, dtype=np.float32).reshape(len(indices), 1, -1)
+        self.attribute("position")[indices] = self.template * sizes
+        self.attribute("colors")[indices] = np.asarray(colors, dtype=np.uint8)[:, None, :]
+        self.attribute("rotation")[indices] = np.asarray(rotations, dtype=np.float32)[:, None, None]
+
+    # Method to hide some shapes by collapsing all their vertices into one point
+    def hide(self, indices):
+        self.attribute("position")[indices] = 0
+
+    # Method to move shapes from an array of (x, y) positions (every shape at once if no indices are given)
+    def set_translations(self, positions, indices=None):
+        if indices is None:
+            self.attribute("translation")[:] = positions[:, None, :]
+        else:
+            self.attribute("translation")[indices] = positions[:, None, :]
+
+    # Method to draw the shapes on their own (for when the batch they belong to isn't drawn)
+    def draw(self):
+        self.group.set_state_recursive()
+        self.vertex_list.draw(GL_TRIANGLES)
+        self.group.unset_state_recursive()
+
+    # Method to remove the shapes from video memory
+    def delete(self):
+        self.vertex_list.delete()
+
+
+# Class that draws a fixed number of square points of the same size from a single vertex list (one vertex per point
+# instead of a whole shape, for dust too small for its shape to show), with the same methods as ShapeBuffer
+class PointBuffer:
+    def __init__(self, capacity, point_size, batch=None, group=None):
+        self.capacity = capacity
+
+        program = get_default_shader()
+        self.group = PointBufferGroup(program, point_size, group)
+        self.vertex_list = program.vertex_list(capacity, GL_POINTS, batch, self.group,
+                                               position="f", colors="Bn", rotation="f", translation="f")
+
+        # The points are placed by their translation only
+        self.attribute("position")[:] = 0
+        self.attribute("translation")[:] = 0
+        self.attribute("rotation")[:] = 0
+        self.attribute("colors")[:] = 255
+
+    # Method to get a vertex attribute as a NumPy view (point, components) of the vertex list's memory
+    def attribute(self, name):
+        array = np.ctypeslib.as_array(getattr(self.vertex_list, name))
+        return array.reshape(self.capacity, -1)
+
+    # Method to set the color of some points (the size of a point is the buffer's, so sizes and rotations are ignored)
+    def set_shapes(self, indices, sizes, colors, rotations):
+        self.attribute("colors")[indices] = np.asarray(colors, dtype=np.uint8)
+
+    # Method to move points from an array of (x, y) positions (every point at once if no indices are given)
+    def set_translations(self, positions, indices=None):
+        if indices is None:
+            self.attribute("translation")[:] = positions
+        else:
+            self.attribute("translation")[indices] = positions
+
+    # Method to draw the points on their own (for when the batch they belong to isn't drawn)
+    def draw(self):
+        self.group.set_state_recursive()
+        self.vertex_list.draw(GL_POINTS)
+        self.group.unset_state_recursive()
+
+    # Method to remove the points from video memory
+    def delete(self):
+        self.vertex_list.delete()
@@ -0,0 +1,51 @@
+import random
+
+
+# Class that hands out every index of a range once, in a random order, before starting over with a new order
+# (instead of shuffling a list of all the indices, the order is a keyed permutation computed one index at a time, so
+# it takes the same memory and time per draw for a hundred words as for millions)
+class ShuffleBag:
+    def __init__(self, size, rng=None):
+        # Number of indices in the bag
+        self.size = size
+        self.rng = rng if rng is not None else random.Random()
+        # The permutation works on an even number of bits covering the range (indices outside of it are skipped,
+        # which takes less than four tries per draw on average)
+        bits = max(2, (size - 1).bit_length())
+        bits += bits % 2
+        self.half_bits = bits // 2
+        self.half_mask = (1 << self.half_bits) - 1
+        # Keys of the current order, position in it and number of indices drawn since the last shuffle
+        self.keys = []
+        self.position = 0
+        self.drawn = 0
+        self.shuffle()
+
+    # Method to start a new random order
+    def shuffle(self):
+        self.keys = [self.rng.getrandbits(32) for _ in range(4)]
+        self.position = 0
+        self.drawn = 0
+
+    # Method to map a position to an index with a four-round Feistel network (a bijection for any keys)
+    def permute(self, value):
+        left = value >> self.half_bits
+        right = value & self.half_mask
+        for key in self.keys:
+            mixed = ((right ^ key) * 0x9E3779B1) & 0xFFFFFFFF
+            mixed ^= mixed >> 16
+            mixed = (mixed * 0x85EBCA6B) & 0xFFFFFFFF
+            mixed ^= mixed >> 13
+            left, right = right, left ^ (mixed & self.half_mask)
+        return (left << self.half_bits) | right
+
+    # Method to draw the next index (every index comes out once before any comes out again)
+    def draw(self):
+        if self.drawn == self.size:
+            self.shuffle()
+        while True:
+            index = self.permute(self.position)
+            self.position += 1
+            if index < self.size:
+                self.drawn += 1
+                return index
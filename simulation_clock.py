@@ -0,0 +1,83 @@
+from pyglet import clock
+
+
+# Class that steps the game at a fixed rate, whatever the frame rate, and redraws the window at a capped rate
+# (after stepping, the window is told how far the clock already is into the next step, so it can draw its moving
+# objects between the last two steps instead of jumping from one to the next - on a static menu it draws one frame and
+# then sleeps until the next input, leaving the event loop idle)
+class SimulationClock:
+    def __init__(self, window, step_rate=60, frame_rate=60, max_steps=10):
+        # Window whose game state is stepped and drawn
+        self.window = window
+        # Fixed elapsed time given to every game update
+        self.step_time = 1 / step_rate
+        # Maximum number of frames drawn per second (0 draws as often as the event loop allows)
+        self.frame_rate = frame_rate
+        # Maximum number of steps run in one frame (after a long stall the game drops the time it's behind
+        # instead of trying to catch up with more and more steps)
+        self.max_steps = max_steps
+        # Time passed that isn't covered by a step yet
+        self.accumulator = 0.0
+        # Number of steps and frames run so far
+        self.step_count = 0
+        self.frame_count = 0
+        # Flag to track whether the clock stopped ticking because nothing on screen can change
+        self.sleeping = False
+
+    # Method to start stepping and drawing the window from the event loop
+    def start(self):
+        # Any input or window exposure can change what's on screen, so it wakes the clock up
+        # (these handlers don't consume the events, so the window still gets them)
+        self.window.push_handlers(on_key_press=self.wake, on_text=self.wake, on_expose=self.wake,
+                                  on_resize=self.wake, on_activate=self.wake)
+        self.schedule()
+
+    # Method to schedule the ticks at the capped frame rate
+    def schedule(self):
+        if self.frame_rate:
+            clock.schedule_interval(self.tick, 1 / self.frame_rate)
+        else:
+            clock.schedule(self.tick)
+
+    # Method to stop stepping and drawing the window
+    def stop(self):
+        clock.unschedule(self.tick)
+        self.window.remove_handlers(on_key_press=self.wake, on_text=self.wake, on_expose=self.wake,
+                                    on_resize=self.wake, on_activate=self.wake)
+
+    # Method to stop ticking until the next input
+    def sleep(self):
+        clock.unschedule(self.tick)
+        self.sleeping = True
+
+    # Method to start ticking again after sleeping (takes and ignores the arguments of the events that call it)
+    def wake(self, *args):
+        if self.sleeping:
+            self.sleeping = False
+            self.schedule()
+
+    # Method to run as many fixed steps as fit in the time passed, returning how many were run
+    def advance(self, elapsed_time):
+        self.accumulator += elapsed_time
+        steps = 0
+        while self.accumulator >= self.step_time and steps < self.max_steps:
+            self.window.on_update(self.step_time)
+            self.accumulator -= self.step_time
+            steps += 1
+        # Drop whatever is left behind after the maximum number of steps
+        if self.accumulator >= self.step_time:
+            self.accumulator %= self.step_time
+        self.step_count += steps
+
+        # Share of a step the clock is into the next one (used to draw between the last two steps)
+        self.window.interpolation = self.accumulator / self.step_time
+        return steps
+
+    # Method called once per frame by the event loop: steps the game, then redraws the window
+    def tick(self, elapsed_time):
+        self.advance(elapsed_time)
+        self.window.draw(elapsed_time)
+        self.frame_count += 1
+        # Nothing changes on a static menu until the next input, so stop waking the event loop up until then
+        if not self.window.is_animated():
+            self.sleep()
@@ -1,10 +1,7 @@
-import pyglet
-from pyglet.media import Player
 from pyglet.shapes import Circle
 from pyglet.window import key
 from pyglet.text import Label
-from pyglet.resource import image
-from audio_load import AudioLoad
+from image_load import ImageLoad
 
 # Constants for colors
 WHITE = (255, 255, 255, 255)
@@ -28,10 +25,8 @@ class StageSelectMenu:
         self.selected_option = 0
         # Selected horizontal option (stage)
         self.selected_stage = 0
-        # Paths to the stage background images
-        self.stage_image_paths = ["images/stage1.jpg", "images/stage2.gif", "images/stage3.gif"]
-        # Selected stage background image
-        self.stage_image = image(self.stage_image_paths[self.selected_option])
+        # Stage background images, cached and scaled by the window's background layer (shared with the game)
+        self.background_layer = window.background_layer
         # Label for the selected stage option
         self.stage_label = Label(self.stage_options[self.selected_option], font_size=24,
                                  x=window.width // 2, y=window.height // 2 + 20, anchor_x="center",
@@ -44,25 +39,20 @@ class StageSelectMenu:
         self.back_label = Label("Back", font_size=24, x=window.width // 2, y=window.height // 2 - 80,
                                 anchor_x="center", color=YELLOW)
 
-        # Loading sounds and initializing the different players
-        AudioLoad.load_menu_sounds()
-        self.menu_click_player = Player()
-        self.menu_click_player.queue(AudioLoad.menu_click_sound)
-
-        self.menu_select_player = Player()
-        self.menu_select_player.queue(AudioLoad.menu_select_sound)
-
-        self.stage_select_player = Player()
-        self.stage_select_player.queue(AudioLoad.stage_select_sound)
+        # Label shown instead of the stage's background while it's still loading
+        self.loading_label = Label("Loading...", font_size=14, x=window.width // 2, y=window.height // 2 + 80,
+                                   anchor_x="center", color=YELLOW)
 
         # Get the selected option
         self.selected_label = self.get_selected_label()
 
-        # Blue circle properties
+        # Blue circle properties (the circle is created once and moved when the selection changes)
         self.blue_circle_radius = 10
         self.blue_circle_color = BLUE
         self.blue_circle_x = self.get_selected_label().x - 30
         self.blue_circle_y = self.get_selected_label().y
+        self.blue_circle = Circle(self.blue_circle_x, self.blue_circle_y, self.blue_circle_radius,
+                                  color=self.blue_circle_color)
 
         # Method call to update the blue circle's position initially
         self.update_blue_circle_position()
@@ -73,36 +63,28 @@ class StageSelectMenu:
         self.arrow_left_x = self.stage_label.x - 180
         self.arrow_right_x = self.stage_label.x + 180
         self.arrow_y = self.stage_label.y
+        self.left_arrow_label = Label("◄", font_size=self.arrow_size, x=self.arrow_left_x, y=self.arrow_y,
+                                      anchor_x="center", color=self.arrow_color)
+        self.right_arrow_label = Label("►", font_size=self.arrow_size, x=self.arrow_right_x, y=self.arrow_y,
+                                       anchor_x="center", color=self.arrow_color)
 
     # Method to draw all the different labels on screen, as well as the preview image
     def draw(self):
-        # Create a sprite for the stage image
-        stage_image_sprite = pyglet.sprite.Sprite(self.stage_image)
-
-        # Scale the sprite to fill the window
-        stage_image_sprite.scale_x = self.window.width / stage_image_sprite.width
-        stage_image_sprite.scale_y = self.window.height / stage_image_sprite.height
-
-        # Draw the stage image sprite
-        stage_image_sprite.draw()
+        # Show the selected stage's background, scaled to fill the window, and draw it (once it's loaded)
+        if ImageLoad.stage_image_ready(self.selected_stage + 1):
+            self.background_layer.show(self.selected_stage + 1, self.window.width, self.window.height)
+            self.background_layer.draw()
+        else:
+            self.loading_label.draw()
 
         # Draw blue circle next to the selected option, excluding the stage label
         if self.selected_label.color == WHITE and self.selected_label != self.stage_label:
-            blue_circle = Circle(self.blue_circle_x, self.blue_circle_y, self.blue_circle_radius,
-                                 color=self.blue_circle_color)
-            blue_circle.draw()
+            self.blue_circle.draw()
 
         # Draw arrows when the stage label is selected
         if self.stage_label.color == WHITE:
-            # Draw left arrow
-            left_arrow_label = Label("◄", font_size=self.arrow_size, x=self.arrow_left_x, y=self.arrow_y,
-                                     anchor_x="center", color=self.arrow_color)
-            left_arrow_label.draw()
-
-            # Draw right arrow
-            right_arrow_label = Label("►", font_size=self.arrow_size, x=self.arrow_right_x, y=self.arrow_y,
-                                      anchor_x="center", color=self.arrow_color)
-            right_arrow_label.draw()
+            self.left_arrow_label.draw()
+            self.right_arrow_label.draw()
 
         # Draw the stage label
         self.stage_label.draw()
@@ -111,6 +93,17 @@ class StageSelectMenu:
         self.start_game_label.draw()
         self.back_label.draw()
 
+    # Method to check whether the menu changes without any input (only when the selected stage's preview is animated
+    # or still loading)
+    def is_animated(self):
+        stage = self.selected_stage + 1
+        return self.background_layer.is_animated(stage) or not ImageLoad.stage_image_ready(stage)
+
+    # Method to start loading the selected stage's background on a worker thread, so it's usually ready by the time
+    # the player starts it
+    def prefetch_selected_stage(self):
+        ImageLoad.prefetch_stage_image(self.selected_stage + 1)
+
     # Method to handle user input in this menu
     def handle_key_press(self, symbol):
         if symbol == key.ENTER:
@@ -119,29 +112,26 @@ class StageSelectMenu:
                 pass
             # Start the game when the start label is selected
             elif self.start_game_label.color == WHITE:
-                # Set the appropriate stage
-                self.window.update_stage(self.selected_stage + 1)
-                # Prepare a new round
-                self.window.game.grab_new_word()
-                # Start the game
-                self.window.start()
+                # Start the game at the appropriate stage (which brings the first wave of words, after the loading
+                # screen if the stage isn't loaded yet)
+                self.window.start_stage(self.selected_stage + 1)
             # Go back to the main menu when the back label is selected
             elif self.back_label.color == WHITE:
                 # Change the current window context back to the main menu
                 self.window.current_menu = self.window.main_menu
-                self.get_menu_select_player().play()
+                self.window.sfx.play("select")
         # For vertical menu traversing
         elif symbol == key.UP or symbol == key.DOWN:
             # Go up or down depending on key input
             self.update_vertical_selection(symbol)
-            self.get_menu_click_player().play()
+            self.window.sfx.play("click")
         # For horizontal menu traversing (stage picking)
         elif symbol == key.LEFT or symbol == key.RIGHT:
             # When the stage label is selected
             if self.stage_label.color == WHITE:
                 # Go left or right depending on key input
                 self.update_horizontal_selection(symbol)
-                self.get_stage_select_player().play()
+                self.window.sfx.play("select")
             # Do nothing when the other options are selected
             elif self.start_game_label.color == WHITE:
                 pass
@@ -156,8 +146,8 @@ class StageSelectMenu:
         self.selected_stage = (self.selected_stage + direction) % len(self.stage_options)
         # Set the appropriate stage text
         self.stage_label.text = self.stage_options[self.selected_stage]
-        # Set the stage's corresponding image
-        self.stage_image = image(self.stage_image_paths[self.selected_stage])
+        # Start loading the newly selected stage
+        self.prefetch_selected_stage()
 
     # # Method to update the horizontal selection (menu traversing)
     def update_vertical_selection(self, symbol):
@@ -181,26 +171,8 @@ class StageSelectMenu:
     def update_blue_circle_position(self):
         self.blue_circle_x = self.selected_label.x - self.selected_label.content_width / 2 - self.blue_circle_radius - 10
         self.blue_circle_y = self.selected_label.y + 12
+        self.blue_circle.position = (self.blue_circle_x, self.blue_circle_y)
 
     # Method to get the currently selected label by checking the colors
     def get_selected_label(self):
         return self.back_label if self.back_label.color == WHITE else self.start_game_label
-
-    # Getter methods for returning the different sound players (useful for being called from the GameWindow class)
-    def get_menu_click_player(self):
-        self.menu_click_player = Player()
-        self.menu_click_player.queue(AudioLoad.menu_click_sound)
-        self.menu_click_player.seek(0)
-        return self.menu_click_player
-
-    def get_menu_select_player(self):
-        self.menu_select_player = Player()
-        self.menu_select_player.queue(AudioLoad.menu_select_sound)
-        self.menu_select_player.seek(0)
-        return self.menu_select_player
-
-    def get_stage_select_player(self):
-        self.stage_select_player = Player()
-        self.stage_select_player.queue(AudioLoad.menu_select_sound)
-        self.stage_select_player.seek(0)
-        return self.stage_select_player
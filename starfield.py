@@ -0,0 +1,157 @@
+import numpy as np
+
+from shape_buffers import PointBuffer, ShapeBuffer, circle_vertices, rectangle_vertices, star_vertices
+
+# Parallax layers, from the furthest to the nearest: number of dust shapes, scrolling speed (pixels per second),
+# size multiplier and opacity (the nearest layer is the original 20 big shapes). Every dust shape drawn costs about as
+# much as the others together under a software GL driver, so the far layers are kept small
+LAYERS = [
+    (160, 5, 0.3, 110),
+    (60, 10, 0.6, 170),
+    (20, 20, 1.0, 255)
+]
+
+# Layers with a smaller size multiplier than this are drawn as square points (one vertex per dust shape instead of up to
+# 30), since their shape hardly shows at a few pixels wide
+POINT_SIZE_LIMIT = 0.8
+# Size of the original dust squares and circles in pixels, which the size multipliers scale
+DUST_SIZE = 10
+
+# Red, green and blue ranges of the dust colors for each stage (shades of purple, blue and red)
+STAGE_COLORS = {
+    1: ((100, 180), (50, 120), (150, 220)),
+    2: ((50, 120), (100, 180), (150, 220)),
+    3: ((150, 220), (50, 120), (100, 180))
+}
+
+
+# Class for one parallax layer of dust, whose positions are advanced and wrapped with one array operation per frame
+class StarfieldLayer:
+    def __init__(self, count, speed, size, opacity, width, height, rng, batch=None, group=None):
+        self.count = count
+        self.speed = speed
+        self.size = size
+        self.opacity = opacity
+        self.width = width
+        self.height = height
+        self.rng = rng
+        self.batch = batch
+        self.group = group
+        # Position of every dust shape, where it's drawn (between the last two updates) and how far the last update
+        # moved it
+        self.positions = np.zeros((count, 2), dtype=np.float32)
+        self.translations = np.zeros((count, 2), dtype=np.float32)
+        self.step_distance = 0.0
+        # Vertex buffer for the layer's shapes (made when the stage is set, since each stage has its own shape),
+        # and the stage it was made for
+        self.shapes = None
+        self.shapes_stage = None
+        # Number of times the vertex buffer was reused for a new scatter (hits) or had to be made again (misses)
+        self.hits = 0
+        self.misses = 0
+
+    # Method to scatter the dust again with the shape and colors of a stage
+    def set_stage(self, stage):
+        # Keep the vertex buffer when the stage (and so the shape) doesn't change
+        if self.shapes is not None and self.shapes_stage == stage:
+            self.hits += 1
+        else:
+            if self.shapes is not None:
+                self.shapes.delete()
+            self.shapes = None
+            self.shapes_stage = stage
+            self.misses += 1
+
+        # Random positions all over the window
+        self.positions[:, 0] = self.rng.integers(0, self.width + 1, self.count)
+        self.positions[:, 1] = self.rng.integers(0, self.height + 1, self.count)
+        self.translations[:] = self.positions
+        self.step_distance = 0.0
+
+        # Show different types of dust depending on the stage (squares, circles or stars) with some size variation
+        size_variation = self.rng.uniform(0.8, 1.2, self.count)
+        if stage == 1:
+            template = rectangle_vertices()
+            sizes = np.floor(DUST_SIZE * size_variation) * self.size
+        elif stage == 2:
+            template = circle_vertices()
+            sizes = np.floor(DUST_SIZE * size_variation) // 2 * self.size
+        else:
+            template = star_vertices(5)
+            sizes = np.full(self.count, 12 * self.size)
+
+        # Random shades of the stage's color
+        colors = np.empty((self.count, 4), dtype=np.uint8)
+        for channel, (low, high) in enumerate(STAGE_COLORS.get(stage, STAGE_COLORS[1])):
+            colors[:, channel] = self.rng.integers(low, high + 1, self.count)
+        colors[:, 3] = self.opacity
+
+        if self.shapes is None:
+            if self.size < POINT_SIZE_LIMIT:
+                self.shapes = PointBuffer(self.count, max(1, round(DUST_SIZE * self.size)), batch=self.batch,
+                                          group=self.group)
+            else:
+                self.shapes = ShapeBuffer(template, self.count, batch=self.batch, group=self.group)
+        self.shapes.set_shapes(np.arange(self.count), sizes, colors, np.zeros(self.count))
+        self.shapes.set_translations(self.positions)
+
+    # Method to scroll the layer to the right, moving the dust that goes beyond the screen width back to the left side
+    def update(self, elapsed_time):
+        x = self.positions[:, 0]
+        self.step_distance = elapsed_time * self.speed
+        x += self.step_distance
+        np.subtract(x, self.width, out=x, where=x > self.width)
+
+    # Method to draw the layer between its last two updates (0 is the previous update and 1 the last one)
+    def interpolate(self, alpha):
+        np.subtract(self.positions[:, 0], (1 - alpha) * self.step_distance, out=self.translations[:, 0])
+        self.shapes.set_translations(self.translations)
+
+
+# Class for the scrolling background dust, made of several parallax layers
+class Starfield:
+    def __init__(self, width, height, batch=None, group=None, layers=LAYERS, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        self.layers = [StarfieldLayer(count, speed, size, opacity, width, height, rng, batch=batch, group=group)
+                       for count, speed, size, opacity in layers]
+        # Stage whose dust is shown (no dust is shown until a stage is set)
+        self.stage = None
+
+    # Total number of dust shapes across the layers
+    @property
+    def count(self):
+        return sum(layer.count for layer in self.layers)
+
+    # Method to get the counters of the layers' vertex buffers (live is the number of dust shapes)
+    def get_stats(self):
+        return {"hits": sum(layer.hits for layer in self.layers), "misses": sum(layer.misses for layer in self.layers),
+                "live": self.count if self.stage is not None else 0, "free": 0}
+
+    # Method to scatter the dust with another random number generator
+    def set_rng(self, rng):
+        for layer in self.layers:
+            layer.rng = rng
+
+    # Method to create the dust of a stage, scattered randomly
+    def set_stage(self, stage):
+        self.stage = stage
+        for layer in self.layers:
+            layer.set_stage(stage)
+
+    # Method to move the dust in the background to create a scrolling effect
+    def update(self, elapsed_time):
+        if self.stage is not None:
+            for layer in self.layers:
+                layer.update(elapsed_time)
+
+    # Method to place the dust between its last two updates (0 is the previous update and 1 the last one)
+    def interpolate(self, alpha):
+        if self.stage is not None:
+            for layer in self.layers:
+                layer.interpolate(alpha)
+
+    # Method to draw the dust on its own (for when the batch it belongs to isn't drawn)
+    def draw(self):
+        if self.stage is not None:
+            for layer in self.layers:
+                layer.shapes.draw()
@@ -0,0 +1,88 @@
+import time
+
+from key_stats import MAX_INTERVAL
+
+# Number of keystrokes kept in memory before they're handed to the database's writer thread at once
+KEYSTROKE_BATCH = 512
+# Number of characters counted as a word in the words per minute
+WORD_LENGTH = 5
+
+
+# Class collecting the typing telemetry of a session: every keystroke is kept as a row of the keystrokes table and
+# handed to the highscore manager in large batches, and the session's rollup (WPM, accuracy and latency percentiles)
+# and its letters' totals are computed once, when it ends
+class SessionTelemetry:
+    def __init__(self, highscore_manager, stage, player_name):
+        self.highscore_manager = highscore_manager
+        self.session_id = highscore_manager.new_session_id()
+        self.stage = stage
+        self.player_name = player_name
+        # Time the session started, in seconds since the epoch
+        self.started = time.time()
+        # Keystrokes not handed to the writer thread yet, and the number recorded so far
+        self.keystrokes = []
+        self.count = 0
+        self.correct = 0
+        # Time of the previous keystroke, and the latencies (in milliseconds) of the keystrokes that weren't a break
+        self.last_time = None
+        self.latencies = []
+        # Dictionary whose keys are the expected letters and the values are lists of their keystrokes, misses, total
+        # latency and timed keystrokes
+        self.letters = {}
+
+    # Method to record a keystroke (expected is None when a wrong key didn't start any word, and word is the word the
+    # key was typed into, if any)
+    def record(self, expected, typed, word, correct, timestamp):
+        latency = None
+        if timestamp is not None:
+            if self.last_time is not None:
+                latency = (timestamp - self.last_time) * 1000
+            self.last_time = timestamp
+        self.count += 1
+        self.keystrokes.append((self.session_id, self.count, self.stage, word, expected, typed, latency))
+        if len(self.keystrokes) >= KEYSTROKE_BATCH:
+            self.flush()
+
+        # A latency longer than a break isn't typing, so it's left out of the rollup (but kept with the keystroke)
+        timed = latency is not None and latency <= MAX_INTERVAL * 1000
+        if timed:
+            self.latencies.append(latency)
+        if correct:
+            self.correct += 1
+        if expected is not None:
+            totals = self.letters.get(expected)
+            if totals is None:
+                totals = self.letters[expected] = [0, 0, 0.0, 0]
+            totals[0] += 1
+            if not correct:
+                totals[1] += 1
+            if timed:
+                totals[2] += latency
+                totals[3] += 1
+
+    # Method to hand the keystrokes kept in memory to the writer thread
+    def flush(self):
+        if self.keystrokes:
+            self.highscore_manager.save_keystrokes(self.keystrokes)
+            self.keystrokes = []
+
+    # Method to end the session, saving its last keystrokes, its rollup and its letters' totals (a session without a
+    # keystroke isn't saved)
+    def finish(self, score):
+        if self.count == 0:
+            return
+        self.flush()
+        self.highscore_manager.save_session(self.get_rollup(score), [
+            (self.stage, letter, keystrokes, misses, latency_total, latency_count)
+            for letter, (keystrokes, misses, latency_total, latency_count) in self.letters.items()])
+
+    # Method to compute the session's rollup as a row of the sessions table: WPM over the time spent typing, accuracy
+    # and the median, 90th and 99th percentiles of the latencies
+    def get_rollup(self, score):
+        latencies = sorted(self.latencies)
+        duration = sum(latencies) / 1000
+        wpm = self.correct / WORD_LENGTH / (duration / 60) if duration > 0 else 0.0
+        percentiles = [latencies[min(len(latencies) - 1, int(len(latencies) * share))] if latencies else None
+                       for share in (0.5, 0.9, 0.99)]
+        return (self.session_id, self.stage, self.player_name, self.started, duration, score, self.count,
+                self.correct, wpm, self.correct / self.count, *percentiles)
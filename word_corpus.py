@@ -0,0 +1,384 @@
+import array
+import bisect
+import hashlib
+import math
+import mmap
+import multiprocessing
+import os
+import struct
+import time
+
+from shuffle_bag import ShuffleBag
+
+# Folder where the compiled word indexes are kept between launches
+CACHE_DIR = os.path.join(".cache", "words")
+# Header of an index file: magic bytes, format version, SHA-1 of the word file it was compiled from, number of words
+# and number of buckets (followed by the bucket table, the band table, the scores of the words as 32-bit floats and
+# then the words of each bucket, one after the other)
+HEADER = struct.Struct("<4sI20sII")
+# Entry of the bucket table: difficulty level, word length, number of words and offset of the bucket's first word
+# from the start of the words
+BUCKET = struct.Struct("<IIIQ")
+MAGIC = b"SWWI"
+VERSION = 4
+# Hash of a word file as saved next to the indexes: size and modification time of the file, and its SHA-1 (it's only
+# computed again once the size or the modification time changed)
+HASH_RECORD = struct.Struct("<QQ20s")
+
+# Number of difficulty levels (one per stage), each an equally sized band of the words sorted by score
+DIFFICULTY_LEVELS = 3
+# Number of bands each difficulty level is split into (equally sized too), which a stage's words move up through
+BAND_STEPS = 4
+# Band table of an index file: the lowest score of every band of every difficulty level, from the easiest
+BANDS = struct.Struct(f"<{DIFFICULTY_LEVELS * BAND_STEPS}f")
+# Most bands of scores whose words and shuffle bags are kept (the ones used least lately are forgotten first, so the
+# game's own bands stay however many others are looked up)
+BAND_CACHE_SIZE = 64
+# Number of words from which the scores are computed by a pool of processes (one per core) instead of in this one
+PARALLEL_WORDS = 50000
+
+# How often each letter appears in English text (in percent), used to rate how hard a word is to type
+LETTER_FREQUENCIES = {
+    "E": 12.7, "T": 9.06, "A": 8.17, "O": 7.51, "I": 6.97, "N": 6.75, "S": 6.33, "H": 6.09, "R": 5.99,
+    "D": 4.25, "L": 4.03, "C": 2.78, "U": 2.76, "M": 2.41, "W": 2.36, "F": 2.23, "G": 2.02, "Y": 1.97,
+    "P": 1.93, "B": 1.29, "V": 0.98, "K": 0.77, "J": 0.15, "X": 0.15, "Q": 0.1, "Z": 0.07
+}
+# Rows of a QWERTY keyboard (top to bottom), and the letters typed by every finger as (hand, finger, letters), the
+# hand being 0 for left and 1 for right and the fingers numbered from the pinky (0) to the index (3)
+ROWS = ("QWERTYUIOP", "ASDFGHJKL", "ZXCVBNM")
+FINGERS = ((0, 0, "QAZ"), (0, 1, "WSX"), (0, 2, "EDC"), (0, 3, "RFVTGB"),
+           (1, 3, "YHNUJM"), (1, 2, "IK"), (1, 1, "OL"), (1, 0, "P"))
+# Dictionary whose keys are the letters and the values are their (hand, finger, row)
+KEYS = {letter: (hand, finger, next(row for row, keys in enumerate(ROWS) if letter in keys))
+        for hand, finger, letters in FINGERS for letter in letters}
+
+# What every part of a word adds to its score: each letter, how rare each letter is (in bits), two different letters
+# typed with the same finger, two letters typed with the same hand, and each row jumped between them
+LETTER_COST = 1.0
+RARITY_COST = 0.25
+SAME_FINGER_COST = 1.5
+SAME_HAND_COST = 0.4
+ROW_JUMP_COST = 0.3
+
+
+# Function rating how hard a word is to type: long words, rare letters and awkward letter pairs (same finger, same
+# hand, jumping rows) score higher, while letters alternating between hands add nothing
+def score_word(word):
+    score = 0.0
+    for letter in word:
+        score += LETTER_COST + RARITY_COST * math.log2(100 / LETTER_FREQUENCIES[letter])
+    for first, second in zip(word, word[1:]):
+        first_hand, first_finger, first_row = KEYS[first]
+        second_hand, second_finger, second_row = KEYS[second]
+        if first == second or first_hand != second_hand:
+            continue
+        score += SAME_HAND_COST + ROW_JUMP_COST * abs(first_row - second_row)
+        if first_finger == second_finger:
+            score += SAME_FINGER_COST
+    return score
+
+
+# Function scoring a chunk of words (run by the worker processes)
+def score_words(words):
+    return [score_word(word) for word in words]
+
+
+# Function getting the SHA-1 of a file's contents
+def hash_file(path):
+    file_hash = hashlib.sha1()
+    with open(path, "rb") as source_file:
+        for chunk in iter(lambda: source_file.read(1 << 20), b""):
+            file_hash.update(chunk)
+    return file_hash.digest()
+
+
+# Class that compiles a word file (one word per line) into an index of the words bucketed by difficulty level and
+# length, sorted by difficulty score within each bucket, and memory-maps it on later launches (nothing is scored at
+# runtime and only the bucket table is read at startup, so a word is only read from the file when it's picked)
+class WordCorpus:
+    def __init__(self, source_path, cache_dir=CACHE_DIR, rng=None, processes=None):
+        # Word file, folder for its compiled index and number of processes used to score the words
+        self.source_path = source_path
+        self.cache_dir = cache_dir
+        self.rng = rng
+        self.processes = processes if processes is not None else os.cpu_count() or 1
+        # Number of words, and the scores of the words (a view of the memory-mapped index)
+        self.word_count = 0
+        self.scores = None
+        # Buckets as (word length, offset of the first word in the file) tuples, with the index range of the words
+        # of each one, and the index range of every difficulty level (its buckets follow each other)
+        self.buckets = []
+        self.bucket_starts = []
+        self.bucket_ranges = []
+        self.level_ranges = {}
+        # Lowest score of every band of the difficulty levels, from the easiest
+        self.band_bounds = []
+        # Index ranges of the bands of scores looked up lately (the keys are the bands)
+        self.band_ranges = {}
+        # Shuffle bags of the index ranges picked from lately, with the position of each range in the bag
+        self.bags = {}
+        # Memory-mapped index file
+        self.index_file = None
+        self.data = None
+        # Time taken to open the corpus and whether its index had to be compiled ("cold") or not ("warm")
+        self.load_time = 0.0
+        self.load_type = "warm"
+
+        start_time = time.perf_counter()
+        # The index is found by the hash of the word file, so it's reused for a copy of the same file and never for
+        # an edited one
+        source_hash = self.get_source_hash()
+        self.source_hash = source_hash
+        index_path = os.path.join(cache_dir, source_hash.hex() + ".idx")
+        try:
+            self.open_index(index_path, source_hash)
+        except (OSError, ValueError, struct.error):
+            # No usable index yet (or one written by an older version of the game), so compile it
+            self.load_type = "cold"
+            self.compile_index(index_path, source_hash)
+            self.open_index(index_path, source_hash)
+        self.load_time = time.perf_counter() - start_time
+        # Every difficulty level (stage) needs words, or the game would run out of them in the middle of a round
+        if self.word_count < DIFFICULTY_LEVELS:
+            self.close()
+            raise ValueError(f"{source_path} has {self.word_count} usable words (at least {DIFFICULTY_LEVELS} are "
+                             f"needed, one per stage)")
+
+    # Method to get the hash of the word file, reading it from the record saved with the indexes while the file's
+    # size and modification time are unchanged (so a launch doesn't read the whole word file)
+    def get_source_hash(self):
+        source_stat = os.stat(self.source_path)
+        path_hash = hashlib.sha1(os.path.abspath(self.source_path).encode()).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(self.source_path))[0]
+        record_path = os.path.join(self.cache_dir, f"{name}-{path_hash}.hash")
+        try:
+            with open(record_path, "rb") as record_file:
+                size, mtime, source_hash = HASH_RECORD.unpack(record_file.read())
+            if size == source_stat.st_size and mtime == source_stat.st_mtime_ns:
+                return source_hash
+        except (OSError, struct.error):
+            pass
+
+        source_hash = hash_file(self.source_path)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temporary_path = record_path + ".tmp"
+        with open(temporary_path, "wb") as record_file:
+            record_file.write(HASH_RECORD.pack(source_stat.st_size, source_stat.st_mtime_ns, source_hash))
+        os.replace(temporary_path, record_path)
+        return source_hash
+
+    # Method to read every word of the word file, score them and write the index file
+    def compile_index(self, index_path, source_hash):
+        # Keep each word once, in capitals, skipping the ones with characters the game can't show
+        words = set()
+        with open(self.source_path, encoding="utf-8", errors="ignore") as source_file:
+            for line in source_file:
+                word = line.strip().upper()
+                if word.isascii() and word.isalpha():
+                    words.add(word)
+        words = sorted(words)
+
+        # Score large word files with one process per core
+        if self.processes > 1 and len(words) >= PARALLEL_WORDS:
+            chunk_size = math.ceil(len(words) / (self.processes * 4))
+            chunks = [words[i:i + chunk_size] for i in range(0, len(words), chunk_size)]
+            with multiprocessing.Pool(self.processes) as pool:
+                scores = [score for chunk_scores in pool.map(score_words, chunks) for score in chunk_scores]
+        else:
+            scores = score_words(words)
+        order = sorted(range(len(words)), key=scores.__getitem__)
+
+        # Split the words into equally sized difficulty levels by their score, and then by length (the words of a
+        # bucket stay sorted by score), and the levels into equally sized bands, kept as the lowest score of each
+        band_count = DIFFICULTY_LEVELS * BAND_STEPS
+        band_bounds = [scores[order[position * len(order) // band_count]] if order else 0.0
+                       for position in range(band_count)]
+        buckets = {}
+        for position, i in enumerate(order):
+            difficulty = position * DIFFICULTY_LEVELS // len(order) + 1
+            buckets.setdefault((difficulty, len(words[i])), []).append(i)
+        buckets = sorted(buckets.items())
+
+        # Every word of a bucket has the same length, so the words are stored back to back without separators or
+        # offsets
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temporary_path = index_path + ".tmp"
+        with open(temporary_path, "wb") as index_file:
+            index_file.write(HEADER.pack(MAGIC, VERSION, source_hash, len(words), len(buckets)))
+            offset = 0
+            for (difficulty, length), bucket_words in buckets:
+                index_file.write(BUCKET.pack(difficulty, length, len(bucket_words), offset))
+                offset += length * len(bucket_words)
+            index_file.write(BANDS.pack(*band_bounds))
+            index_file.write(array.array("f", (scores[i] for key, bucket_words in buckets
+                                               for i in bucket_words)).tobytes())
+            for key, bucket_words in buckets:
+                index_file.write("".join(words[i] for i in bucket_words).encode("ascii"))
+        os.replace(temporary_path, index_path)
+
+    # Method to memory-map an index file and read its bucket table, checking it belongs to the current word file
+    def open_index(self, index_path, source_hash):
+        index_file = open(index_path, "rb")
+        try:
+            data = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            index_file.close()
+            raise
+        try:
+            magic, version, index_hash, word_count, bucket_count = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or version != VERSION or index_hash != source_hash:
+                raise ValueError(f"{index_path} doesn't match {self.source_path}")
+            band_bounds = list(BANDS.unpack_from(data, HEADER.size + BUCKET.size * bucket_count))
+            scores_offset = HEADER.size + BUCKET.size * bucket_count + BANDS.size
+            characters_offset = scores_offset + 4 * word_count
+            buckets = []
+            bucket_starts = []
+            level_ranges = {}
+            start = 0
+            for i in range(bucket_count):
+                difficulty, length, count, offset = BUCKET.unpack_from(data, HEADER.size + BUCKET.size * i)
+                if characters_offset + offset + length * count > len(data):
+                    raise ValueError(f"{index_path} is truncated")
+                buckets.append((length, characters_offset + offset))
+                bucket_starts.append(start)
+                level_start = level_ranges.get(difficulty, (start, start))[0]
+                start += count
+                level_ranges[difficulty] = (level_start, start)
+            if start != word_count:
+                raise ValueError(f"{index_path} is truncated")
+        except (ValueError, struct.error):
+            data.close()
+            index_file.close()
+            raise
+
+        self.index_file = index_file
+        self.data = data
+        self.word_count = word_count
+        self.buckets = buckets
+        self.bucket_starts = bucket_starts
+        self.bucket_ranges = list(zip(bucket_starts, bucket_starts[1:] + [word_count]))
+        self.level_ranges = level_ranges
+        self.band_bounds = band_bounds
+        # The scores are read straight from the mapped file when they're needed
+        view = memoryview(data)
+        self.scores = view[scores_offset:characters_offset].cast("f")
+        view.release()
+
+    # Method to get the number of words of a difficulty level
+    def count(self, difficulty):
+        start, end = self.get_level_range(difficulty)
+        return end - start
+
+    # Method to get the range of indices of the words of a difficulty level
+    def get_level_range(self, difficulty):
+        difficulty = min(max(difficulty, 1), DIFFICULTY_LEVELS)
+        return self.level_ranges.get(difficulty, (0, 0))
+
+    # Method to get the band of scores (lowest, highest) of one of the bands a difficulty level is split into, from
+    # the easiest (0) to the hardest (BAND_STEPS - 1)
+    def get_band(self, difficulty, step):
+        band = (min(max(difficulty, 1), DIFFICULTY_LEVELS) - 1) * BAND_STEPS + min(max(step, 0), BAND_STEPS - 1)
+        highest = self.band_bounds[band + 1] if band + 1 < len(self.band_bounds) else math.inf
+        return self.band_bounds[band], highest
+
+    # Method to get the ranges of indices of the words whose scores are within a band (lowest included, highest not),
+    # one per bucket holding some (found with a binary search in every bucket when the band isn't cached, since the
+    # words are only sorted by score within a bucket)
+    def get_band_ranges(self, lowest, highest):
+        ranges = self.band_ranges.pop((lowest, highest), None)
+        if ranges is None:
+            self.make_room(self.band_ranges)
+            ranges = []
+            for start, end in self.bucket_ranges:
+                band_start = bisect.bisect_left(self.scores, lowest, start, end)
+                band_end = bisect.bisect_left(self.scores, highest, band_start, end)
+                if band_start < band_end:
+                    ranges.append((band_start, band_end))
+        self.band_ranges[(lowest, highest)] = ranges
+        return ranges
+
+    # Method to get the index of the word whose score is the closest to a band
+    def get_closest_word(self, lowest, highest):
+        closest = None
+        closest_distance = 0.0
+        for start, end in self.bucket_ranges:
+            # Only the words on either side of where the band would be in the bucket can be the closest
+            position = bisect.bisect_left(self.scores, lowest, start, end)
+            for index in (position - 1, position):
+                if start <= index < end:
+                    score = self.scores[index]
+                    distance = lowest - score if score < lowest else score - highest
+                    if closest is None or distance < closest_distance:
+                        closest, closest_distance = index, distance
+        return closest
+
+    # Method to read a word by its index (the bucket holding it is found with a binary search over the bucket starts,
+    # and the word is read straight from its offset)
+    def get_word(self, index):
+        bucket = bisect.bisect_right(self.bucket_starts, index) - 1
+        length, offset = self.buckets[bucket]
+        start = offset + (index - self.bucket_starts[bucket]) * length
+        return self.data[start:start + length].decode("ascii")
+
+    # Method to get the difficulty score of a word by its index
+    def get_score(self, index):
+        return self.scores[index]
+
+    # Method to pick a random word of a range of indices, not repeating any until every word of it came out
+    def pick_range(self, start, end):
+        return self.pick_ranges(((start, end),))
+
+    # Method to pick a random word of a few ranges of indices taken together, not repeating any until every word of
+    # them came out
+    def pick_ranges(self, ranges):
+        ranges = tuple(ranges)
+        entry = self.bags.pop(ranges, None)
+        if entry is None:
+            # Position of each range's first word in the bag
+            starts = []
+            count = 0
+            for start, end in ranges:
+                starts.append(count)
+                count += end - start
+            if count == 0:
+                raise ValueError(f"{self.source_path} has no words in that band")
+            self.make_room(self.bags)
+            entry = (ShuffleBag(count, self.rng), starts)
+        # (put back last, as the one used most lately)
+        self.bags[ranges] = entry
+        bag, starts = entry
+        position = bag.draw()
+        i = bisect.bisect_right(starts, position) - 1
+        return self.get_word(ranges[i][0] + position - starts[i])
+
+    # Method to forget the band used least lately once a cache of bands is full (the caches are dictionaries whose
+    # entries are put back last whenever they're used)
+    def make_room(self, cache):
+        if len(cache) >= BAND_CACHE_SIZE:
+            del cache[next(iter(cache))]
+
+    # Method to start drawing the words over with a random number generator (a seeded one draws the same words every
+    # time)
+    def reset(self, rng):
+        self.rng = rng
+        self.bags = {}
+
+    # Method to pick a random word of a difficulty level (one per stage)
+    def pick(self, difficulty):
+        return self.pick_range(*self.get_level_range(difficulty))
+
+    # Method to pick a random word whose score is within a band (when no word is, the closest word to it is used)
+    def pick_band(self, lowest, highest):
+        ranges = self.get_band_ranges(lowest, highest)
+        if not ranges and self.word_count:
+            closest = self.get_closest_word(lowest, highest)
+            ranges = [(closest, closest + 1)]
+        return self.pick_ranges(ranges)
+
+    # Method to close the index file
+    def close(self):
+        if self.data is not None:
+            self.scores.release()
+            self.data.close()
+            self.index_file.close()
+            self.data = None
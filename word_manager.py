@@ -1,11 +1,25 @@
 import random
 
+from prefix_index import PrefixIndex
+
+# Number of words drawn when picking a word that trains the player's weak keys (one of them is chosen, weighted by
+# how many weak keys it has)
+WEAK_KEY_CANDIDATES = 8
+# Number of words typed in a game before its new words move up to the next band of the stage's difficulty level
+WORDS_PER_BAND = 10
+
 
 # Class managing words for the game
 class WordManager:
-    def __init__(self, stage):
+    def __init__(self, stage, corpus=None, key_stats=None, rng=None):
         # Initialize the WordManager with the specified stage and word lists for each stage
         self.stage = stage
+        # External word corpus (a WordCorpus) whose difficulty levels replace the word lists when given
+        self.corpus = corpus
+        # Typing statistics of the player (a KeyStats), which new words are weighted towards the weak keys of
+        self.key_stats = key_stats
+        # Random number generator the words are drawn with (replaced by the game's seeded one for every session)
+        self.rng = rng if rng is not None else random.Random()
         self.word_lists = {
             1: ["SUN", "MOON", "STAR", "COMET", "VENUS", "ROCKET", "RAYS", "ALIENS", "MILKYWAY", "DISTANCE",
                 "SKY", "EARTH", "ORBIT", "SOLAR", "LIGHT", "GALAXY", "PLUTO", "MARS", "NEBULA", "COSMOS",
@@ -27,8 +41,16 @@ class WordManager:
                 "THERMONUCLEAR", "PYROPHOSPHORIC", "STELLARFORMATION"]
         }
 
-        # Initialize with an empty word
-        self.word = ""
+        # Words on screen (the keys are their ids and the values are the words), in the order they were added
+        self.active_words = {}
+        # Prefix index of the words on screen (the target stays in it, since a prefix it doesn't start with is never
+        # looked up while it's locked onto)
+        self.prefix_index = PrefixIndex()
+        # Id of the word the player is typing (locked onto with the prefix typed so far), how many of its letters were
+        # typed, and the id of the next word added
+        self.target = None
+        self.typed_count = 0
+        self.next_word_id = 0
 
         # Speed for the words' traversal across the screen
         self.word_speed = ""
@@ -37,20 +59,97 @@ class WordManager:
     def update_stage(self, stage):
         self.stage = stage
 
-    # Method for checking if the pressed key matches the first character of the current word
+    # Method for drawing the words with another random number generator (the corpus starts drawing its words over)
+    def set_rng(self, rng):
+        self.rng = rng
+        if self.corpus is not None:
+            self.corpus.reset(rng)
+
+    # Method for adding a word to the ones on screen, returning its id
+    def add_word(self, word):
+        word_id = self.next_word_id
+        self.next_word_id += 1
+        self.active_words[word_id] = word
+        self.prefix_index.add(word, word_id)
+        return word_id
+
+    # Method for removing a word from the ones on screen (when it's typed or reaches the limit line)
+    def remove_word(self, word_id):
+        word = self.active_words.pop(word_id)
+        self.prefix_index.remove(word, word_id)
+        if word_id == self.target:
+            self.target = None
+            self.typed_count = 0
+
+    # Method for removing every word
+    def clear_words(self):
+        self.active_words.clear()
+        self.prefix_index = PrefixIndex()
+        self.target = None
+        self.typed_count = 0
+
+    # Method for checking if the pressed key matches the next character of the target word (when there is no target
+    # yet, the first word added starting with the key becomes the target, and when the key doesn't match it, the lock
+    # moves to the first word starting with the typed prefix and the key), returning the id of the word it matched
     def verify_key(self, character):
-        # If it matches, remove the matched character from the current word
-        if character == self.word[0]:
-            self.word = self.word[1:]
-            # Return True if the key is correct
-            return True
-        # Return False if the key is incorrect
-        return False
+        if self.target is None:
+            self.target = self.prefix_index.find(character)
+            # Return None if no word starts with the key
+            if self.target is None:
+                return None
+
+        # If it matches, move on to the target word's next character and return its id
+        word = self.active_words[self.target]
+        if character == word[self.typed_count]:
+            self.typed_count += 1
+            return self.target
+
+        # Look for another word the typed prefix belongs to, returning None if the key is incorrect for every word
+        other = self.prefix_index.find(word[:self.typed_count] + character)
+        if other is None:
+            return None
+        self.target = other
+        self.typed_count += 1
+        return other
+
+    # Method for getting the key the player is expected to press (the next character of the target word, or the
+    # first character of the word added first)
+    def get_expected_key(self):
+        if self.target is not None:
+            return self.active_words[self.target][self.typed_count]
+        for word in self.active_words.values():
+            return word[0]
+        return None
+
+    # Method for getting the band of scores a stage's new words are drawn from once the player typed some words (the
+    # corpus splits every difficulty level into bands, from the easiest, and the words move up a band every
+    # WORDS_PER_BAND words typed), or None without a corpus
+    def get_band(self, words_typed):
+        if self.corpus is None:
+            return None
+        return self.corpus.get_band(self.stage, words_typed // WORDS_PER_BAND)
 
     # Method for getting a new word by randomly selecting a word from the word list corresponding to the stage
-    def grab_new_word(self):
+    # (or from the corpus' difficulty level matching the stage, or its words scored within a (lowest, highest) band
+    # when one is given, without repeats until they run out)
+    def pick_word(self, band=None):
+        if self.corpus is not None and band is not None:
+            return self.corpus.pick_band(*band)
+        if self.corpus is not None:
+            return self.corpus.pick(self.stage)
         word_list = self.word_lists.get(self.stage, [])
-        self.word = random.choice(word_list)
+        return self.rng.choice(word_list)
+
+    # Method for getting a new word, drawing a few and choosing one weighted by how much it trains the player's
+    # weak keys once there are typing statistics (this takes the same time whatever the size of the corpus)
+    def grab_new_word(self, band=None):
+        if self.key_stats is not None and self.key_stats.has_data():
+            candidates = [self.pick_word(band) for _ in range(WEAK_KEY_CANDIDATES)]
+            # Every word keeps some chance of being chosen, even with no weak keys in it
+            weights = [1 + self.key_stats.rate_word(candidate) for candidate in candidates]
+            word = self.rng.choices(candidates, weights)[0]
+        else:
+            word = self.pick_word(band)
 
         # Adjust the rate at which new words appear based on the stage
         if self.stage == 1:
@@ -59,3 +158,5 @@ class WordManager:
             self.word_speed = 150
         elif self.stage == 3:
             self.word_speed = 200
+
+        return word